@@ -2,12 +2,19 @@ import streamlit as st
 import requests
 import json
 import os
+import time
 
 # 设置页面配置
 st.set_page_config(page_title="Multi-Agent AI 研究员 (SSE)", layout="wide", page_icon="🤖")
 
 # API 基础 URL - 从环境变量读取，默认使用 localhost
 API_BASE_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
+# 历史报告每页条数
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "20"))
+# 报告检索返回的条数
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "10"))
+# 生成报告时连接中断的最大重连次数
+STREAM_MAX_RECONNECTS = int(os.getenv("STREAM_MAX_RECONNECTS", "5"))
 
 # 初始化会话状态
 if "logged_in" not in st.session_state:
@@ -47,6 +54,10 @@ def logout():
     st.session_state.username = None
     if "messages" in st.session_state:
         del st.session_state.messages
+    # 清除已加载的历史报告，避免切换账号后看到上一个用户的数据
+    for key in list(st.session_state.keys()):
+        if key.startswith("history_") or key.startswith("report_detail_"):
+            del st.session_state[key]
     st.rerun()
 
 # 登录页面
@@ -169,6 +180,8 @@ def main_page():
             line = line.strip()
             if not line:
                 return None
+            if line.startswith(b"id: "):
+                return {"type": "id", "id": line[4:].decode("utf-8")}
             if line.startswith(b"data: "):
                 data_str = line[6:].decode("utf-8")
                 if data_str == "[DONE]":
@@ -179,6 +192,9 @@ def main_page():
                     return None
             return None
 
+        # 默认复用已有的相同/相似任务报告，勾选后强制重新生成
+        force_refresh = st.checkbox("🔄 强制重新生成（不复用已有报告）", value=False)
+
         # 获取用户输入
         if prompt := st.chat_input("请输入您的研究任务（例如：2025年AI发展趋势）..."):
             # 模拟用户消息并显示
@@ -204,41 +220,80 @@ def main_page():
                         response = make_authenticated_request(
                             "POST",
                             "/report/chat/stream",
-                            json={"query": prompt},
+                            json={"query": prompt, "force_refresh": force_refresh},
                             stream=True
                         )
                         
                         if response and response.status_code == 200:
-                            # 循环读取流式响应
-                            for line in response.iter_lines():
-                                if line:
-                                    event_data = parse_sse_line(line)
-                                    if event_data:
-                                        msg_type = event_data.get("type")
-                                        content = event_data.get("content", "")
-                                        
-                                        if msg_type == "status":
-                                            # 添加到执行历史
-                                            execution_history.append(content)
-                                            # 更新执行历史显示
-                                            with history_container:
-                                                st.markdown("### 执行步骤")
-                                                for idx, step in enumerate(execution_history, 1):
-                                                    st.markdown(f"{idx}. {step}")
-                                            
-                                        elif msg_type == "token":
-                                            # 累加内容并显示（打字机效果）
-                                            full_response += content
-                                            # 在末尾添加光标以增强打字机效果
-                                            content_placeholder.markdown(full_response + "▌")
-                                            
-                                        elif msg_type == "error":
-                                            st.error(f"❌ 发生错误: {content}")
-                                            break
-                                            
-                                        elif msg_type == "done":
-                                            break
-                                            
+                            run_id = response.headers.get("X-Run-Id")
+                            last_event_id = None
+                            reconnects = 0
+                            finished = False
+                            while not finished:
+                                try:
+                                    # 循环读取流式响应
+                                    for line in response.iter_lines():
+                                        if line:
+                                            event_data = parse_sse_line(line)
+                                            if event_data:
+                                                msg_type = event_data.get("type")
+                                                content = event_data.get("content", "")
+
+                                                if msg_type == "id":
+                                                    last_event_id = event_data["id"]
+
+                                                elif msg_type == "status":
+                                                    # 添加到执行历史
+                                                    execution_history.append(content)
+                                                    # 更新执行历史显示
+                                                    with history_container:
+                                                        st.markdown("### 执行步骤")
+                                                        for idx, step in enumerate(execution_history, 1):
+                                                            st.markdown(f"{idx}. {step}")
+                                                    
+                                                elif msg_type == "token":
+                                                    # 累加内容并显示（打字机效果）
+                                                    full_response += content
+                                                    # 在末尾添加光标以增强打字机效果
+                                                    content_placeholder.markdown(full_response + "▌")
+                                                    
+                                                elif msg_type == "draft":
+                                                    # 修订完成，用完整草稿替换已显示的内容
+                                                    full_response = content
+                                                    content_placeholder.markdown(full_response + "▌")
+
+                                                elif msg_type == "cache_hit":
+                                                    # 命中已有报告，提示生成时间
+                                                    st.info(
+                                                        f"♻️ 复用了 {event_data.get('created_at') or ''} 生成的报告「{event_data.get('topic')}」，"
+                                                        f"勾选「强制重新生成」可重新执行研究"
+                                                    )
+
+                                                elif msg_type == "error":
+                                                    st.error(f"❌ 发生错误: {content}")
+                                                    finished = True
+                                                    break
+                                                    
+                                                elif msg_type == "done":
+                                                    finished = True
+                                                    break
+                                    finished = True
+                                except requests.exceptions.RequestException:
+                                    # 连接中断：工作流仍在服务端运行，带上最后收到的事件编号重连，补发错过的内容
+                                    if not run_id or reconnects >= STREAM_MAX_RECONNECTS:
+                                        raise
+                                    reconnects += 1
+                                    status_placeholder.warning(f"⚠️ 连接中断，正在重连（第 {reconnects} 次）...")
+                                    time.sleep(min(2 ** reconnects, 10))
+                                    headers = {"Last-Event-ID": last_event_id} if last_event_id else {}
+                                    response = make_authenticated_request(
+                                        "GET", f"/report/chat/runs/{run_id}/stream", headers=headers, stream=True
+                                    )
+                                    if not response or response.status_code != 200:
+                                        st.error("重连失败，可稍后在历史报告中查看结果")
+                                        break
+                                    status_placeholder.empty()
+                                    
                             # 清除状态信息并展示最终结果（移除光标）
                             status_placeholder.empty()
                             content_placeholder.markdown(full_response)
@@ -246,7 +301,9 @@ def main_page():
                             # 保存助手回复到历史记录
                             if full_response:
                                 st.session_state.messages.append({"role": "assistant", "content": full_response})
-                        else:
+                        elif response and response.status_code == 429:
+                            st.warning("⏳ 当前排队的任务过多，请稍后再试")
+                        elif response:
                             st.error(f"请求失败: {response.status_code}")
                             
                     except Exception as e:
@@ -255,55 +312,115 @@ def main_page():
     elif page == "📚 历史报告":
         st.markdown("## 📚 历史研究报告")
         
-        # 加载历史报告
-        with st.spinner("正在加载历史报告..."):
-            response = make_authenticated_request("GET", "/report/chat/history")
-            
+        # 历史报告按页加载，已加载的列表和下一页游标保存在会话状态中
+        if "history_reports" not in st.session_state:
+            st.session_state.history_reports = None
+            st.session_state.history_cursor = None
+
+        def load_history_page(cursor=None):
+            params = {"limit": HISTORY_PAGE_SIZE}
+            if cursor:
+                params["cursor"] = cursor
+            response = make_authenticated_request("GET", "/report/chat/history", params=params)
             if response and response.status_code == 200:
                 data = response.json()
-                
-                if data.get("success") and data.get("data"):
-                    reports = data["data"]
-                    
-                    if not reports:
-                        st.info("暂无历史报告，快去创建一个吧！")
-                    else:
-                        # 按创建时间倒序排列
-                        reports.sort(key=lambda x: x["created_at"] or "", reverse=True)
-                        
-                        # 显示报告列表
-                        for idx, report in enumerate(reports):
-                            report_id = report["id"]
-                            topic = report["topic"]
-                            content = report["content"]
-                            created_at = report["created_at"]
-                            
-                            # 创建一个可展开的区域
-                            with st.expander(f"📄 {topic}", expanded=False):
-                                # 显示创建时间
-                                if created_at:
-                                    st.caption(f"创建时间: {created_at}")
-                                
-                                # 显示报告内容
-                                st.markdown(content)
-                                
-                                # 添加操作按钮
-                                col1, col2 = st.columns(2)
-                                with col1:
-                                    if st.button("📋 复制内容", key=f"copy_{report_id}"):
-                                        st.code(content, language=None)
-                                        st.success("内容已显示，可以手动复制")
-                                
-                                with col2:
-                                    if st.button("🗑️ 删除报告", key=f"delete_{report_id}"):
-                                        st.warning("删除功能开发中...")
-                                
-                                st.markdown("---")
-                else:
-                    st.info("暂无历史报告")
+                if data.get("success"):
+                    st.session_state.history_reports = (st.session_state.history_reports or []) + data.get("data", [])
+                    st.session_state.history_cursor = data.get("next_cursor")
             elif response:
                 st.error(f"加载失败: {response.status_code}")
 
+        if st.button("🔄 刷新"):
+            st.session_state.history_reports = None
+            st.session_state.history_cursor = None
+
+        search_query = st.text_input("🔍 搜索报告", placeholder="输入关键词，按标题和正文检索")
+        if search_query:
+            response = make_authenticated_request(
+                "GET", "/report/chat/search", params={"q": search_query, "limit": SEARCH_PAGE_SIZE}
+            )
+            if response and response.status_code == 200:
+                results = response.json().get("data", [])
+                if not results:
+                    st.info("没有找到相关报告")
+                for item in results:
+                    report_id = item["id"]
+                    # 标题和摘要中的命中部分已用 markdown 加粗
+                    with st.expander(f"📄 {item['topic_highlight']}", expanded=False):
+                        if item.get("created_at"):
+                            st.caption(f"创建时间: {item['created_at']}")
+                        detail_key = f"report_detail_{report_id}"
+                        if detail_key in st.session_state:
+                            st.markdown(st.session_state[detail_key])
+                        else:
+                            st.markdown(item["snippet"])
+                            if st.button("📖 查看全文", key=f"search_open_{report_id}"):
+                                detail = make_authenticated_request("GET", f"/report/chat/history/{report_id}")
+                                if detail and detail.status_code == 200 and detail.json().get("success"):
+                                    st.session_state[detail_key] = detail.json()["data"]["content"]
+                                    st.rerun()
+                                else:
+                                    st.error("报告加载失败")
+            elif response:
+                st.error(f"检索失败: {response.status_code}")
+        else:
+            if st.session_state.history_reports is None:
+                with st.spinner("正在加载历史报告..."):
+                    load_history_page()
+
+            reports = st.session_state.history_reports or []
+            if not reports:
+                st.info("暂无历史报告，快去创建一个吧！")
+            else:
+                # 显示报告列表（列表只包含摘要，展开后按需加载全文）
+                for report in reports:
+                    report_id = report["id"]
+                    topic = report["topic"]
+                    created_at = report["created_at"]
+                    content_length = report.get("content_length")
+
+                    with st.expander(f"📄 {topic}", expanded=False):
+                        # 显示创建时间和字数
+                        caption = f"创建时间: {created_at}" if created_at else ""
+                        if content_length is not None:
+                            caption += f"  ·  {content_length} 字"
+                        if caption:
+                            st.caption(caption)
+
+                        detail_key = f"report_detail_{report_id}"
+                        if detail_key not in st.session_state:
+                            st.markdown(report.get("preview") or "")
+                            if st.button("📖 查看全文", key=f"open_{report_id}"):
+                                response = make_authenticated_request("GET", f"/report/chat/history/{report_id}")
+                                if response and response.status_code == 200 and response.json().get("success"):
+                                    st.session_state[detail_key] = response.json()["data"]["content"]
+                                    st.rerun()
+                                else:
+                                    st.error("报告加载失败")
+                        else:
+                            content = st.session_state[detail_key]
+                            # 显示报告内容
+                            st.markdown(content)
+
+                            # 添加操作按钮
+                            col1, col2 = st.columns(2)
+                            with col1:
+                                if st.button("📋 复制内容", key=f"copy_{report_id}"):
+                                    st.code(content, language=None)
+                                    st.success("内容已显示，可以手动复制")
+
+                            with col2:
+                                if st.button("🗑️ 删除报告", key=f"delete_{report_id}"):
+                                    st.warning("删除功能开发中...")
+
+                        st.markdown("---")
+
+                if st.session_state.history_cursor:
+                    if st.button("⬇️ 加载更多"):
+                        with st.spinner("正在加载历史报告..."):
+                            load_history_page(st.session_state.history_cursor)
+                        st.rerun()
+
     elif page == "⚙️ 设置":
         st.markdown("## ⚙️ 系统设置")
         st.info("设置功能开发中...")
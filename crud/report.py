@@ -1,31 +1,177 @@
+import base64
+from datetime import datetime
+from typing import Optional
+
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import and_, insert, or_, select
 
 from models.report import Report
+from utils import metrics
+from utils.report_codec import decode_content, encode_content
+from utils.report_search import index_report
+from utils.task_type_cache import make_task_key, normalize_task
+
+# 列表页摘要的最大字符数
+REPORT_PREVIEW_CHARS = 200
+
+
+def make_preview(content: str, max_chars: int = REPORT_PREVIEW_CHARS) -> str:
+    """取正文开头若干字符作为摘要，连续空白合并为一个空格"""
+    return " ".join(content.split())[:max_chars]
+
+
+def make_topic_key(topic: str, task_type: Optional[str]) -> Optional[str]:
+    """任务类型加归一化标题（与分类缓存相同的归一化）取哈希，任务类型未知时返回 None（不参与精确匹配）"""
+    if not task_type:
+        return None
+    return make_task_key(f"{task_type}|{normalize_task(topic)}")
+
+
+def encode_cursor(created_at: datetime, report_id: int) -> str:
+    """将 (created_at, id) 编码为不透明的分页游标"""
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{report_id}".encode("utf-8")).decode("ascii")
 
 
-async def save_report(topic: str, content: str, db: AsyncSession, user_id: int):
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """解析分页游标，格式错误时抛出 ValueError"""
+    try:
+        created_at, report_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(created_at), int(report_id)
+    except Exception as exc:
+        raise ValueError(f"无效的分页游标: {cursor}") from exc
+
+
+def report_content(report: Report) -> str:
+    """读取报告正文，压缩存储的在这里解压"""
+    if report.content_compressed:
+        return decode_content(report.content_compressed)
+    return report.content
+
+
+def build_report_row(topic: str, content: str, user_id: int, write_id: str = None,
+                     created_at: datetime = None, task_type: str = None) -> dict:
+    """生成报告行的各列（压缩正文、摘要、标题键等）"""
+    compressed = encode_content(content)
+    raw_bytes = len(content.encode("utf-8"))
+    metrics.observe("report_storage.raw_bytes", raw_bytes)
+    metrics.observe("report_storage.stored_bytes", len(compressed) if compressed else raw_bytes)
+    return {
+        "topic": topic,
+        "content": "" if compressed else content,
+        "content_compressed": compressed,
+        "content_length": len(content),
+        "preview": make_preview(content),
+        "task_type": task_type,
+        "topic_key": make_topic_key(topic, task_type),
+        "user_id": user_id,
+        "write_id": write_id,
+        "created_at": created_at or datetime.now(),
+    }
+
+
+async def save_report(topic: str, content: str, db: AsyncSession, user_id: int, task_type: str = None):
     """保存报告到数据库"""
-    report = Report(topic=topic, content=content, user_id=user_id)
+    report = Report(**build_report_row(topic, content, user_id, task_type=task_type))
     db.add(report)
+    await db.flush()
+    await index_report(db, report.id, user_id, topic, content)
     await db.commit()
     await db.refresh(report)
     return report
 
-async def get_history_report_list(db: AsyncSession, user_id: int, report_id: int = None):
-    """根据用户ID获取历史报告列表"""
-    if report_id:
-        result = await db.execute(
-            select(Report).where(
-                Report.user_id == user_id,
-                Report.id == report_id
-            )
-        )
-    else:
-        result = await db.execute(
-            select(Report).where(Report.user_id == user_id).order_by(Report.created_at.desc())
+async def save_reports_batch(db: AsyncSession, entries: list[dict]) -> int:
+    """
+    批量保存报告（一条多行 INSERT），已存在相同 write_id 的报告跳过，可安全重放
+
+    Args:
+        entries: [{"write_id", "topic", "content", "user_id", "created_at", "task_type"}]
+
+    Returns:
+        实际写入的报告数
+    """
+    write_ids = [entry["write_id"] for entry in entries]
+    result = await db.execute(select(Report.write_id).where(Report.write_id.in_(write_ids)))
+    existing = set(result.scalars().all())
+    entries = [entry for entry in entries if entry["write_id"] not in existing]
+    if not entries:
+        return 0
+
+    rows = [
+        build_report_row(entry["topic"], entry["content"], entry["user_id"], entry["write_id"], entry["created_at"],
+                         entry.get("task_type"))
+        for entry in entries
+    ]
+    await db.execute(insert(Report).values(rows))
+    # 多行 INSERT 不返回自增 id，按 write_id 取回后写入检索索引
+    result = await db.execute(
+        select(Report.id, Report.write_id).where(Report.write_id.in_([entry["write_id"] for entry in entries]))
+    )
+    report_ids = {write_id: report_id for report_id, write_id in result.all()}
+    for entry in entries:
+        await index_report(db, report_ids[entry["write_id"]], entry["user_id"], entry["topic"], entry["content"])
+    await db.commit()
+    return len(entries)
+
+async def get_history_report_page(db: AsyncSession, user_id: int, limit: int = 20, cursor: str = None):
+    """
+    按创建时间倒序分页获取历史报告列表（只查询列表需要的列）
+
+    Args:
+        limit: 每页条数
+        cursor: 上一页返回的游标，为空时从最新的报告开始
+
+    Returns:
+        (当前页的行, 下一页游标；没有更多时为 None)
+    """
+    query = select(
+        Report.id, Report.topic, Report.created_at, Report.content_length, Report.preview
+    ).where(Report.user_id == user_id)
+    if cursor:
+        created_at, report_id = decode_cursor(cursor)
+        query = query.where(or_(
+            Report.created_at < created_at,
+            and_(Report.created_at == created_at, Report.id < report_id)
+        ))
+    # 多取一条用于判断是否还有下一页
+    result = await db.execute(query.order_by(Report.created_at.desc(), Report.id.desc()).limit(limit + 1))
+    rows = result.all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+async def get_report_by_id(db: AsyncSession, user_id: int, report_id: int):
+    """获取用户的单个报告，不存在时返回 None"""
+    result = await db.execute(
+        select(Report).where(
+            Report.user_id == user_id,
+            Report.id == report_id
         )
-    return result.scalars().all()
+    )
+    return result.scalar_one_or_none()
+
+async def get_report(db: AsyncSession, report_id: int):
+    """按 id 获取报告（不限用户），不存在时返回 None"""
+    return await db.get(Report, report_id)
+
+async def find_report_by_topic_key(db: AsyncSession, topic_key: str, since: datetime, user_id: int = None):
+    """查找 since 之后生成的、归一化标题相同的最新报告，user_id 为空时不限用户"""
+    query = select(Report).where(Report.topic_key == topic_key, Report.created_at >= since)
+    if user_id is not None:
+        query = query.where(Report.user_id == user_id)
+    result = await db.execute(query.order_by(Report.created_at.desc()).limit(1))
+    return result.scalar_one_or_none()
+
+async def get_recent_report_topics(db: AsyncSession, since: datetime, limit: int, task_type: str, user_id: int = None):
+    """获取 since 之后生成的、指定任务类型的最近若干份报告的 id、标题和生成时间"""
+    query = select(Report.id, Report.topic, Report.created_at).where(
+        Report.task_type == task_type, Report.created_at >= since
+    )
+    if user_id is not None:
+        query = query.where(Report.user_id == user_id)
+    result = await db.execute(query.order_by(Report.created_at.desc()).limit(limit))
+    return result.all()
 
 async def get_all_topics(db: AsyncSession, user_id: int):
     """获取所有报告的标题（topic）"""
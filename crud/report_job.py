@@ -0,0 +1,117 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.report_job import (
+    JOB_CANCELLED,
+    JOB_FINISHED_STATUSES,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    ReportJob,
+)
+
+
+async def create_job(db: AsyncSession, user_id: int, task: str, force_refresh: bool, owner: str,
+                     lease_expires_at: datetime) -> ReportJob:
+    job = ReportJob(id=uuid.uuid4().hex, user_id=user_id, task=task, force_refresh=force_refresh, status=JOB_QUEUED,
+                    owner=owner, lease_expires_at=lease_expires_at)
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+async def get_job(db: AsyncSession, job_id: str, user_id: Optional[int] = None) -> Optional[ReportJob]:
+    """按 id 查询任务，指定 user_id 时只能查到该用户的任务"""
+    query = select(ReportJob).where(ReportJob.id == job_id)
+    if user_id is not None:
+        query = query.where(ReportJob.user_id == user_id)
+    result = await db.execute(query)
+    return result.scalar_one_or_none()
+
+
+async def count_queued_jobs(db: AsyncSession) -> int:
+    """所有进程排队中的任务总数"""
+    result = await db.execute(select(func.count()).select_from(ReportJob).where(ReportJob.status == JOB_QUEUED))
+    return result.scalar_one()
+
+
+async def mark_job_running(db: AsyncSession, job_id: str, owner: str) -> bool:
+    """本进程持有的排队中任务标记为运行中；任务已被取消或已被其他进程接管时返回 False"""
+    result = await db.execute(
+        update(ReportJob)
+        .where(ReportJob.id == job_id, ReportJob.status == JOB_QUEUED, ReportJob.owner == owner)
+        .values(status=JOB_RUNNING, started_at=datetime.now())
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+
+async def finish_job(db: AsyncSession, job_id: str, status: str, report_id: Optional[int] = None,
+                     error: Optional[str] = None) -> bool:
+    """记录任务结果；任务已结束（如已被取消）时不覆盖，返回 False"""
+    result = await db.execute(
+        update(ReportJob)
+        .where(ReportJob.id == job_id, ReportJob.status.not_in(JOB_FINISHED_STATUSES))
+        .values(status=status, report_id=report_id, error=error, finished_at=datetime.now())
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+
+async def cancel_job(db: AsyncSession, job_id: str, user_id: int) -> bool:
+    """取消排队中或运行中的任务，任务不存在或已结束时返回 False"""
+    result = await db.execute(
+        update(ReportJob)
+        .where(ReportJob.id == job_id, ReportJob.user_id == user_id, ReportJob.status.in_((JOB_QUEUED, JOB_RUNNING)))
+        .values(status=JOB_CANCELLED, finished_at=datetime.now())
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+
+async def renew_job_leases(db: AsyncSession, job_ids: list[str], owner: str, lease_expires_at: datetime) -> set[str]:
+    """为本进程持有的未结束任务续约，返回续约成功的任务 id（其余已被取消、已结束或已被其他进程接管）"""
+    if not job_ids:
+        return set()
+    owned = (ReportJob.id.in_(job_ids), ReportJob.owner == owner, ReportJob.status.in_((JOB_QUEUED, JOB_RUNNING)))
+    await db.execute(update(ReportJob).where(*owned).values(lease_expires_at=lease_expires_at))
+    await db.commit()
+    result = await db.execute(select(ReportJob.id).where(*owned))
+    return set(result.scalars().all())
+
+
+async def claim_expired_jobs(db: AsyncSession, owner: str, lease_expires_at: datetime, now: datetime) -> list[str]:
+    """
+    接管租约已过期（持有进程已退出）或没有租约的未结束任务，重新置为排队中，按提交顺序返回接管的任务 id
+    逐个条件更新，多个进程同时接管时每个任务只会被一个进程接管
+    """
+    expired = or_(ReportJob.lease_expires_at.is_(None), ReportJob.lease_expires_at < now)
+    unfinished = ReportJob.status.in_((JOB_QUEUED, JOB_RUNNING))
+    result = await db.execute(select(ReportJob.id).where(unfinished, expired).order_by(ReportJob.created_at))
+    claimed = []
+    for job_id in result.scalars().all():
+        updated = await db.execute(
+            update(ReportJob)
+            .where(ReportJob.id == job_id, unfinished, expired)
+            .values(status=JOB_QUEUED, started_at=None, owner=owner, lease_expires_at=lease_expires_at)
+        )
+        if updated.rowcount == 1:
+            claimed.append(job_id)
+    await db.commit()
+    return claimed
+
+
+async def release_jobs(db: AsyncSession, job_ids: list[str], owner: str):
+    """应用关闭时释放本进程持有的未结束任务，其他进程可立即接管"""
+    if not job_ids:
+        return
+    await db.execute(
+        update(ReportJob)
+        .where(ReportJob.id.in_(job_ids), ReportJob.owner == owner, ReportJob.status.in_((JOB_QUEUED, JOB_RUNNING)))
+        .values(status=JOB_QUEUED, started_at=None, owner=None, lease_expires_at=None)
+    )
+    await db.commit()
@@ -0,0 +1,109 @@
+from sqlalchemy import and_, func, inspect, select, text
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.report import Report
+
+# SQLite FTS5 索引表：不保存原文（content=''），只保存分词后的倒排索引
+FTS_TABLE = "reports_fts"
+# MySQL 全文索引，使用 ngram 解析器以支持中文
+MYSQL_FULLTEXT_INDEX = "ft_reports_topic_content"
+
+
+def mysql_fulltext_exists(conn) -> bool:
+    return any(index["name"] == MYSQL_FULLTEXT_INDEX for index in inspect(conn).get_indexes(Report.__tablename__))
+
+
+async def create_fts_table(db: AsyncSession):
+    """创建 SQLite FTS5 索引表（标题权重在查询时设置）"""
+    await db.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+        f"USING fts5(topic, body, content='', tokenize='unicode61')"
+    ))
+    await db.commit()
+
+
+async def create_mysql_fulltext_index(db: AsyncSession) -> bool:
+    """创建 MySQL 全文索引，已存在时返回 False"""
+    conn = await db.connection()
+    if await conn.run_sync(mysql_fulltext_exists):
+        return False
+    await db.execute(text(
+        f"ALTER TABLE {Report.__tablename__} ADD FULLTEXT INDEX {MYSQL_FULLTEXT_INDEX} "
+        f"(topic, content) WITH PARSER ngram"
+    ))
+    await db.commit()
+    return True
+
+
+async def insert_fts_document(db: AsyncSession, report_id: int, topic_terms: str, body_terms: str):
+    """写入 FTS5 索引（不提交，随调用方的事务一起提交）"""
+    await db.execute(
+        text(f"INSERT INTO {FTS_TABLE}(rowid, topic, body) VALUES (:rowid, :topic, :body)"),
+        {"rowid": report_id, "topic": topic_terms, "body": body_terms}
+    )
+
+
+async def count_fts_documents(db: AsyncSession) -> int:
+    result = await db.execute(text(f"SELECT count(*) FROM {FTS_TABLE}"))
+    return result.scalar()
+
+
+async def search_fts(db: AsyncSession, user_id: int, fts_query: str, limit: int, offset: int,
+                     topic_weight: float = 2.0) -> list[tuple[int, float]]:
+    """
+    在 FTS5 索引中检索用户的报告
+
+    Returns:
+        [(报告 id, 得分)]，得分越高越相关
+    """
+    result = await db.execute(
+        text(
+            f"SELECT {FTS_TABLE}.rowid, -bm25({FTS_TABLE}, :topic_weight, 1.0) AS score "
+            f"FROM {FTS_TABLE} JOIN {Report.__tablename__} r ON r.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH :query AND r.user_id = :user_id "
+            f"ORDER BY bm25({FTS_TABLE}, :topic_weight, 1.0) LIMIT :limit OFFSET :offset"
+        ),
+        {"query": fts_query, "user_id": user_id, "topic_weight": topic_weight, "limit": limit, "offset": offset}
+    )
+    return [(row[0], float(row[1])) for row in result.all()]
+
+
+async def search_mysql_fulltext(db: AsyncSession, user_id: int, query: str, limit: int,
+                                offset: int) -> list[tuple[int, float]]:
+    """使用 MySQL 全文索引检索用户的报告"""
+    score = match(Report.topic, Report.content, against=query)
+    result = await db.execute(
+        select(Report.id, score.label("score"))
+        .where(and_(Report.user_id == user_id, score > 0))
+        .order_by(score.desc(), Report.id.desc())
+        .limit(limit)
+        .offset(offset)
+    )
+    return [(row.id, float(row.score)) for row in result.all()]
+
+
+async def get_user_report_documents(db: AsyncSession, user_id: int):
+    """读取用户全部报告的 id、标题和正文，用于构建进程内索引"""
+    result = await db.execute(
+        select(Report.id, Report.topic, Report.content, Report.content_compressed)
+        .where(Report.user_id == user_id)
+        .order_by(Report.id)
+    )
+    return result.all()
+
+
+async def get_reports_for_highlight(db: AsyncSession, user_id: int, report_ids: list[int]):
+    """读取一页检索结果的完整信息，用于生成高亮摘要"""
+    if not report_ids:
+        return []
+    result = await db.execute(
+        select(Report.id, Report.topic, Report.content, Report.content_compressed, Report.created_at)
+        .where(Report.user_id == user_id, Report.id.in_(report_ids))
+    )
+    return result.all()
+
+
+async def get_max_report_id(db: AsyncSession, user_id: int) -> int:
+    result = await db.execute(select(func.max(Report.id)).where(Report.user_id == user_id))
+    return result.scalar() or 0
@@ -0,0 +1,33 @@
+import json
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.search_cache import SearchCacheEntry
+
+
+async def get_search_results(db: AsyncSession, cache_key: str, min_created_at: datetime = None):
+    """查询未过期的缓存搜索结果"""
+    query = select(SearchCacheEntry.results).where(SearchCacheEntry.cache_key == cache_key)
+    if min_created_at:
+        query = query.where(SearchCacheEntry.created_at >= min_created_at)
+    result = await db.execute(query)
+    results = result.scalar_one_or_none()
+    return json.loads(results) if results else None
+
+async def save_search_results(db: AsyncSession, cache_key: str, query: str, results: list[str]):
+    """写入或刷新缓存的搜索结果"""
+    result = await db.execute(select(SearchCacheEntry).where(SearchCacheEntry.cache_key == cache_key))
+    entry = result.scalar_one_or_none()
+    payload = json.dumps(results, ensure_ascii=False)
+    if entry:
+        entry.results = payload
+        entry.created_at = datetime.now()
+    else:
+        db.add(SearchCacheEntry(cache_key=cache_key, query=query[:255], results=payload))
+    try:
+        await db.commit()
+    except IntegrityError:
+        # 其他 worker 已并发写入同一条目
+        await db.rollback()
@@ -0,0 +1,30 @@
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.task_type_cache import TaskTypeEntry
+
+
+async def get_task_type(db: AsyncSession, task_key: str, min_created_at: datetime = None):
+    """根据任务键查询已缓存的任务类型"""
+    query = select(TaskTypeEntry.task_type).where(TaskTypeEntry.task_key == task_key)
+    if min_created_at:
+        query = query.where(TaskTypeEntry.created_at >= min_created_at)
+    result = await db.execute(query)
+    return result.scalar_one_or_none()
+
+async def save_task_type(db: AsyncSession, task_key: str, task: str, task_type: str):
+    """写入或更新任务类型缓存"""
+    result = await db.execute(select(TaskTypeEntry).where(TaskTypeEntry.task_key == task_key))
+    entry = result.scalar_one_or_none()
+    if entry:
+        entry.task_type = task_type
+        entry.created_at = datetime.now()
+    else:
+        db.add(TaskTypeEntry(task_key=task_key, task=task[:255], task_type=task_type))
+    try:
+        await db.commit()
+    except IntegrityError:
+        # 其他 worker 已并发写入同一条目
+        await db.rollback()
@@ -1,12 +1,19 @@
+import os
 import uuid
 from datetime import datetime, timedelta
 from fastapi import HTTPException
-from sqlalchemy import select
+from sqlalchemy import delete, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from models.users import User, Token
 from schema.user import LoginRequest, RegisterRequest
-from utils.security import hash_password, verify_password
+from utils.security import ahash_password, averify_and_update_password
+from utils.auth_cache import cache_user, get_cached_user
+
+# token 有效期（天）
+TOKEN_EXPIRE_DAYS = int(os.getenv("TOKEN_EXPIRE_DAYS", "7"))
+# 剩余有效期低于该值（小时）时才顺延过期时间，避免每次鉴权都写库
+TOKEN_REFRESH_THRESHOLD_HOURS = float(os.getenv("TOKEN_REFRESH_THRESHOLD_HOURS", "144"))
 
 
 async def get_user_by_username(username: str, db: AsyncSession):
@@ -16,7 +23,7 @@ async def get_user_by_username(username: str, db: AsyncSession):
 
 async def create_user(request: RegisterRequest, db: AsyncSession):
     """创建用户"""
-    password = hash_password(request.password)
+    password = await ahash_password(request.password)
     new_user = User(
     username=request.username,
     password=password  
@@ -30,11 +37,15 @@ async def login_user(request: LoginRequest, db: AsyncSession):
     user = await get_user_by_username(request.username, db)
     if not user:
         raise HTTPException(status_code=400, detail="用户名不存在")
-    if not verify_password(request.password, user.password):
+    verified, new_hash = await averify_and_update_password(request.password, user.password)
+    if not verified:
         raise HTTPException(status_code=400, detail="密码错误")
+    if new_hash:
+        # 成本因子调整后，顺带用新配置重新哈希，随本次登录一起提交
+        user.password = new_hash
     
     token = uuid.uuid4().hex
-    expires_at = datetime.now() + timedelta(days=7)
+    expires_at = datetime.now() + timedelta(days=TOKEN_EXPIRE_DAYS)
     
     new_token = Token(
         token=token,
@@ -49,13 +60,42 @@ async def login_user(request: LoginRequest, db: AsyncSession):
 
 async def get_current_user(token: str, db: AsyncSession):
     """根据token获取当前用户"""
-    result = await db.execute(select(Token).where(Token.token == token))
-    token_obj = result.scalar_one_or_none()
-    if not token_obj:
+    cached = get_cached_user(token)
+    if cached:
+        return User(id=cached["user_id"], username=cached["username"])
+    
+    # 一次联表查询同时取出 token 过期时间和用户
+    result = await db.execute(
+        select(Token.expires_at, User)
+        .join(User, User.id == Token.user_id)
+        .where(Token.token == token)
+    )
+    row = result.first()
+    if not row:
         raise HTTPException(status_code=401, detail="token不存在")
-    if token_obj.expires_at < datetime.now():
+    expires_at, user = row
+    now = datetime.now()
+    if expires_at < now:
         raise HTTPException(status_code=401, detail="token已过期")
-    result = await db.execute(select(User).where(User.id == token_obj.user_id))
-    token_obj.expires_at = datetime.now() + timedelta(days=7)
+    
+    # 滑动过期：仅在剩余有效期不足阈值时才写库顺延
+    if expires_at - now < timedelta(hours=TOKEN_REFRESH_THRESHOLD_HOURS):
+        expires_at = now + timedelta(days=TOKEN_EXPIRE_DAYS)
+        await db.execute(update(Token).where(Token.token == token).values(expires_at=expires_at))
+        await db.commit()
+    
+    cache_user(token, user.id, user.username, expires_at)
+    return user
+
+async def delete_expired_tokens(db: AsyncSession, batch_size: int, now: datetime = None) -> int:
+    """删除一批已过期的token，返回删除行数"""
+    now = now or datetime.now()
+    result = await db.execute(
+        select(Token.id).where(Token.expires_at < now).order_by(Token.id).limit(batch_size)
+    )
+    token_ids = result.scalars().all()
+    if not token_ids:
+        return 0
+    await db.execute(delete(Token).where(Token.id.in_(token_ids)))
     await db.commit()
-    return result.scalar_one_or_none()
+    return len(token_ids)
@@ -9,10 +9,13 @@ class AgentState(TypedDict):
     task: str                      #用户提出的任务
     task_type: str                 #任务类型（code/data/standard）
     search_results: List[str]      #搜索工具返回的结果
+    packed_context: dict           #按节点 token 预算打包后的参考资料
     draft: str                     #草稿内容
+    revision_changes: List[str]    #增量修订时发生变化的章节，整篇重写时为空
     code: str                      #代码内容
     data_analysis: dict            #数据分析结果
     critique: str                  #审稿提出的意见
     revision_count: int            #修订次数
     messages: Annotated[List[BaseMessage], operator.add]   #消息列表，用于存储所有交互消息
     agent_history: List[dict]      #Agent执行历史
+    stage_timings: Annotated[List[dict], operator.add]     #各节点耗时，并行节点可同时写入
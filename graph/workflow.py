@@ -1,49 +1,47 @@
-from functools import lru_cache
-from langgraph.graph import StateGraph, END
+import time
+from functools import wraps
+from langgraph.graph import StateGraph, START, END
 from graph.state import AgentState
 from nodes.research import research_node
+from nodes.classifier import classifier_node
+from nodes.context_packer import context_packer_node
 from nodes.code_generator import code_generator_node
 from nodes.data_analyst import data_analyst_node
 from nodes.write import writer_node
 from nodes.reviewer import reviewer_node
-from utils.my_llm import llm
-from langchain_core.prompts import ChatPromptTemplate
+from utils import metrics
 
-@lru_cache(maxsize=128)
-def determine_task_type_cached(task:str):
+def timed_node(name: str, node):
     """
-    使用 LLM 识别任务类型
-    返回: 'code' | 'data' | 'standard'
+    为节点记录执行耗时：写入 stage_timings 状态，并上报到 metrics
     """
-    
-    prompt = ChatPromptTemplate.from_template("""请分析以下任务，判断它属于哪种类型。
-
-任务：{task}
-
-类型定义：
-- code：涉及代码编写、算法实现、编程、函数开发等
--  data：涉及数据分析、统计、趋势分析、图表制作、可视化等
-- standard：普通文章写作、内容创作、知识总结等
+    @wraps(node)
+    async def wrapper(state: AgentState):
+        start = time.perf_counter()
+        update = await node(state)
+        duration_ms = (time.perf_counter() - start) * 1000
+        metrics.observe(f"workflow.stage.{name}_ms", duration_ms)
+        return {**update, "stage_timings": [{"stage": name, "duration_ms": round(duration_ms, 1)}]}
+    return wrapper
 
-只返回类型名称（code/data/standard），不要其他内容。""")
-    
-    chain = prompt | llm
-    response = chain.invoke({"task": task})
-    
-    task_type = response.content.strip().lower()
-    
-    # 确保返回的是有效类型
-    if task_type not in ['code', 'data', 'standard']:
-        task_type = 'standard'
-    
-    return task_type
+def dispatcher_node(state: AgentState):
+    """
+    汇合节点:等待搜索与分类都完成后再路由，并记录并行节省的时间
+    """
+    durations = {
+        timing["stage"]: timing["duration_ms"]
+        for timing in state.get("stage_timings", [])
+    }
+    if "classifier" in durations and "researcher" in durations:
+        research_ms = durations["researcher"] + durations.get("context_packer", 0)
+        metrics.observe("workflow.stage.overlap_saved_ms", min(research_ms, durations["classifier"]))
+    return {}
 
 def determine_task_type(state: AgentState):
     """
-    包装缓存函数，用于LangGraph调用
+    读取分类节点写入的任务类型，用于LangGraph路由
     """
-    task = state.get('task', '')
-    return determine_task_type_cached(task)
+    return state.get('task_type') or 'standard'
     
 def check_critique(state: AgentState):
     """
@@ -57,18 +55,28 @@ def check_critique(state: AgentState):
 workflow = StateGraph(AgentState)
 
 # 添加节点
-workflow.add_node("researcher", research_node)
-workflow.add_node("writer", writer_node)
-workflow.add_node("reviewer", reviewer_node)
-workflow.add_node("code_generator", code_generator_node)
-workflow.add_node("data_analyst", data_analyst_node)
+workflow.add_node("researcher", timed_node("researcher", research_node))
+workflow.add_node("context_packer", timed_node("context_packer", context_packer_node))
+workflow.add_node("classifier", timed_node("classifier", classifier_node))
+workflow.add_node("dispatcher", dispatcher_node)
+workflow.add_node("writer", timed_node("writer", writer_node))
+workflow.add_node("reviewer", timed_node("reviewer", reviewer_node))
+workflow.add_node("code_generator", timed_node("code_generator", code_generator_node))
+workflow.add_node("data_analyst", timed_node("data_analyst", data_analyst_node))
+
+# 设置入口：搜索与任务分类互不依赖，并行执行
+workflow.add_edge(START, "researcher")
+workflow.add_edge(START, "classifier")
+
+# 搜索完成后按节点预算打包参考资料
+workflow.add_edge("researcher", "context_packer")
 
-# 设置入口
-workflow.set_entry_point("researcher")
+# 两条分支都完成后汇合
+workflow.add_edge(["context_packer", "classifier"], "dispatcher")
 
 # 添加条件边：根据任务类型选择不同路径
 workflow.add_conditional_edges(
-    "researcher",
+    "dispatcher",
     determine_task_type,
     {
         "code": "code_generator",    # 代码任务 → 代码生成Agent
@@ -1,9 +1,17 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from config.db_conf import init_db
+from config.db_conf import AsyncSessionLocal, init_db
+from utils.context_packer import preload_tokenizer
+from utils.report_search import ensure_search_index
+from utils.report_jobs import report_job_runner
+from utils.report_writer import start_report_writer, stop_report_writer
+from utils.stream_runs import run_registry
+from utils.token_reaper import start_token_reaper, stop_token_reaper
 from routers import report
 from models.users import User, Token
 from routers import user
+from routers import metrics
+from routers import job
 
 
 
@@ -12,7 +20,18 @@ async def lifespan(app: FastAPI):
     """应用生命周期管理"""
     await init_db()
     print("✅ 数据库初始化完成")
+    async with AsyncSessionLocal() as db:
+        await ensure_search_index(db)
+    await preload_tokenizer()
+    await start_report_writer()
+    await report_job_runner.start()
+    start_token_reaper()
     yield
+    await stop_token_reaper()
+    await run_registry.shutdown()
+    await report_job_runner.stop()
+    # 写完队列中的报告后再关闭
+    await stop_report_writer()
     print("👋 应用关闭")
 
 # 初始化 FastAPI 应用
@@ -20,6 +39,8 @@ app = FastAPI(lifespan=lifespan)
 
 app.include_router(report.router)
 app.include_router(user.router)
+app.include_router(metrics.router)
+app.include_router(job.router)
 
 
 
@@ -1,5 +1,7 @@
 from datetime import datetime
-from sqlalchemy import DateTime, ForeignKey, Integer, String, Text
+from typing import Optional
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, LargeBinary, String, Text
+from sqlalchemy.dialects.mysql import MEDIUMBLOB
 from sqlalchemy.orm import Mapped, mapped_column
 from config.db_conf import Base
 from models.users import User
@@ -7,9 +9,24 @@ from models.users import User
 
 class Report(Base):
     __tablename__ = "reports"
+    # 历史列表按 (user_id, created_at) 倒序分页
+    __table_args__ = (Index("ix_reports_user_id_created_at", "user_id", "created_at"),)
 
     id:Mapped[int] = mapped_column(Integer, autoincrement=True, primary_key=True, index=True)
     user_id:Mapped[int] = mapped_column(Integer, ForeignKey(User.id),index=True)
     topic:Mapped[str] = mapped_column(String(255), index=True)
     content:Mapped[str] = mapped_column(Text)
-    created_at:Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    # 开启压缩时正文存放在这里（首字节为格式版本），content 置为空串
+    content_compressed:Mapped[Optional[bytes]] = mapped_column(
+        LargeBinary().with_variant(MEDIUMBLOB(), "mysql"), nullable=True
+    )
+    # 列表页只读取长度和摘要，不加载完整正文
+    content_length:Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    preview:Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    # 生成报告时的任务类型（code/data/standard），复用报告时只匹配同类型的报告
+    task_type:Mapped[Optional[str]] = mapped_column(String(16), nullable=True)
+    # 任务类型加归一化标题的哈希，用于按标题复用已有报告
+    topic_key:Mapped[Optional[str]] = mapped_column(String(64), nullable=True, index=True)
+    # 异步写入队列为每份报告生成的唯一 id，重放时据此去重
+    write_id:Mapped[Optional[str]] = mapped_column(String(32), nullable=True, unique=True, index=True)
+    created_at:Mapped[datetime] = mapped_column(DateTime, default=datetime.now, index=True)
@@ -0,0 +1,37 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import Boolean, DateTime, ForeignKey, Index, Integer, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+from config.db_conf import Base
+from models.report import Report
+from models.users import User
+
+# 任务状态
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+JOB_FINISHED_STATUSES = (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED)
+
+
+class ReportJob(Base):
+    """后台报告生成任务"""
+    __tablename__ = "report_jobs"
+    __table_args__ = (Index("ix_report_jobs_user_id_created_at", "user_id", "created_at"),)
+
+    id: Mapped[str] = mapped_column(String(32), primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey(User.id), index=True)
+    task: Mapped[str] = mapped_column(Text)
+    force_refresh: Mapped[bool] = mapped_column(Boolean, default=False)
+    status: Mapped[str] = mapped_column(String(16), default=JOB_QUEUED, index=True)
+    # 成功后生成（或复用）的报告
+    report_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey(Report.id), nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    # 持有该任务（排队中或运行中）的进程及其租约到期时间，持有进程定期续约；
+    # 租约过期（进程已退出）的任务由其他进程接管，未过期的任务不会被重复执行
+    owner: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    lease_expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True, index=True)
@@ -0,0 +1,14 @@
+from datetime import datetime
+from sqlalchemy import DateTime, Integer, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+from config.db_conf import Base
+
+
+class SearchCacheEntry(Base):
+    __tablename__ = "search_cache"
+
+    id: Mapped[int] = mapped_column(Integer, autoincrement=True, primary_key=True, index=True)
+    cache_key: Mapped[str] = mapped_column(String(64), unique=True, index=True)  # 搜索参数的 sha256
+    query: Mapped[str] = mapped_column(String(255))
+    results: Mapped[str] = mapped_column(Text)                                    # JSON 格式的搜索结果
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, index=True)
@@ -0,0 +1,14 @@
+from datetime import datetime
+from sqlalchemy import DateTime, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+from config.db_conf import Base
+
+
+class TaskTypeEntry(Base):
+    __tablename__ = "task_type_cache"
+
+    id: Mapped[int] = mapped_column(Integer, autoincrement=True, primary_key=True, index=True)
+    task_key: Mapped[str] = mapped_column(String(64), unique=True, index=True)  # 归一化任务的 sha256
+    task: Mapped[str] = mapped_column(String(255))                               # 归一化后的任务（截断，便于排查）
+    task_type: Mapped[str] = mapped_column(String(16))
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
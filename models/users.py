@@ -16,7 +16,7 @@ class Token(Base):
 
     id: Mapped[int] = mapped_column(Integer, autoincrement=True, primary_key=True, index=True)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey(User.id), index=True)
-    token: Mapped[str] = mapped_column(String(255))
-    expires_at: Mapped[datetime] = mapped_column(DateTime)
+    token: Mapped[str] = mapped_column(String(255), unique=True, index=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
 
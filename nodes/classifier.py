@@ -0,0 +1,74 @@
+from typing import Optional
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from graph.state import AgentState
+from utils.my_llm import llm
+from utils.task_type_cache import task_type_cache
+from utils.task_classifier import pre_classify, PRE_CLASSIFIER_THRESHOLD
+from utils import metrics
+
+
+async def classify_task_type(task:str):
+    """
+    使用 LLM 识别任务类型
+    返回: 'code' | 'data' | 'standard'
+    """
+    
+    prompt = ChatPromptTemplate.from_template("""请分析以下任务，判断它属于哪种类型。
+
+任务：{task}
+
+类型定义：
+- code：涉及代码编写、算法实现、编程、函数开发等
+-  data：涉及数据分析、统计、趋势分析、图表制作、可视化等
+- standard：普通文章写作、内容创作、知识总结等
+
+只返回类型名称（code/data/standard），不要其他内容。""")
+    
+    chain = prompt | llm
+    response = await chain.ainvoke({"task": task})
+    
+    task_type = response.content.strip().lower()
+    
+    # 确保返回的是有效类型
+    if task_type not in ['code', 'data', 'standard']:
+        task_type = 'standard'
+    
+    return task_type
+
+async def determine_task_type_local(task:str) -> Optional[str]:
+    """
+    只用本地关键词预分类和分类缓存（内存/数据库）识别任务类型，不调用 LLM，都无法确定时返回 None
+    """
+    task_type, confidence = pre_classify(task)
+    if confidence >= PRE_CLASSIFIER_THRESHOLD:
+        metrics.incr("task_classifier.local_hits")
+        return task_type
+    return await task_type_cache.get(task)
+
+async def determine_task_type_cached(task:str):
+    """
+    依次尝试本地关键词预分类、分类缓存（内存/数据库），都未命中时调用 LLM 并写回缓存
+    """
+    task_type = await determine_task_type_local(task)
+    if task_type:
+        return task_type
+    
+    metrics.incr("task_classifier.llm_fallbacks")
+    task_type = await classify_task_type(task)
+    await task_type_cache.set(task, task_type)
+    return task_type
+
+
+async def classifier_node(state: AgentState):
+    """
+    分类节点:识别任务类型，与搜索节点并行执行
+    """
+    if state.get('task_type'):
+        # 查找缓存报告时已在本地识别出任务类型
+        return {"task_type": state['task_type']}
+    print("--- Classifier: 正在识别任务类型 ---")
+    task = state.get('task', '')
+    task_type = await determine_task_type_cached(task)
+    return {"task_type": task_type}
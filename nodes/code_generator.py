@@ -3,17 +3,17 @@ from datetime import datetime
 from langchain_core.prompts import ChatPromptTemplate
 from utils.my_llm import llm
 from graph.state import AgentState
+from utils.context_packer import get_node_context
 from utils.content_cleaner import clean_code_output
 
 
-def code_generator_node(state: AgentState):
+async def code_generator_node(state: AgentState):
     """
     代码生成节点:根据任务生成代码
     """
     print("--- Code Generator: 正在生成代码 ---")
     
     task = state.get('task', '')
-    search_results = state.get('search_results', [])
     
     prompt_text = """你是一名资深软件工程师。请根据以下任务生成Python代码。
 
@@ -34,9 +34,9 @@ def code_generator_node(state: AgentState):
     prompt = ChatPromptTemplate.from_template(prompt_text)
     chain = prompt | llm
     
-    response = chain.invoke({
+    response = await chain.ainvoke({
         "task": task,
-        "search_results": "\n".join(search_results)
+        "search_results": get_node_context(state, "code_generator", task)
     })
     
     code = response.content
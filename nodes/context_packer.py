@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from graph.state import AgentState
+from utils.context_packer import pack_node_contexts
+
+
+async def context_packer_node(state: AgentState):
+    """
+    上下文打包节点:按各节点的 token 预算对搜索结果去重、排序、截断，
+    结果写入状态，后续节点（包括每轮修订）直接复用；bm25 模式下只预先构建检索索引
+    """
+    print("--- Context Packer: 正在整理参考资料 ---")
+
+    task = state.get('task', '')
+    search_results = state.get('search_results', [])
+    packed_context = pack_node_contexts(search_results, task)
+
+    # 记录Agent执行历史
+    history = state.get('agent_history', [])
+    history.append({
+        "agent": "context_packer",
+        "action": "pack_context",
+        "timestamp": datetime.now().isoformat(),
+        "input_count": len(search_results),
+        "packed_lengths": {name: len(context) for name, context in packed_context.items()}
+    })
+
+    return {"packed_context": packed_context, "agent_history": history}
@@ -2,17 +2,17 @@ from datetime import datetime
 from langchain_core.prompts import ChatPromptTemplate
 
 from graph.state import AgentState
+from utils.context_packer import get_node_context
 from utils.my_llm import llm
 
 
-def data_analyst_node(state: AgentState):
+async def data_analyst_node(state: AgentState):
     """
     数据分析节点:分析搜索结果中的数据
     """
     print("--- Data Analyst: 正在分析数据 ---")
     
     task = state.get('task', '')
-    search_results = state.get('search_results', [])
     
     prompt_text = """你是一名数据分析师。请分析以下信息中的数据。
 
@@ -47,9 +47,9 @@ def data_analyst_node(state: AgentState):
     prompt = ChatPromptTemplate.from_template(prompt_text)
     chain = prompt | llm
     
-    response = chain.invoke({
+    response = await chain.ainvoke({
         "task": task,
-        "search_results": "\n".join(search_results)
+        "search_results": get_node_context(state, "data_analyst", task)
     })
     
     analysis_report = response.content
@@ -1,23 +1,101 @@
+import asyncio
+import os
+import re
 from datetime import datetime
+import dotenv
 from graph.state import AgentState
 from utils.agent_tools import tavily_search
 from utils.content_cleaner import clean_search_query
+from utils.text_dedup import dedupe_texts, normalize_text
 
+dotenv.load_dotenv()
 
-def research_node(state: AgentState):
+# 搜索模式：single（单次搜索）| multi（拆分为多个子查询并行搜索）
+RESEARCH_MODE = os.getenv("RESEARCH_MODE", "single")
+RESEARCH_MAX_QUERIES = int(os.getenv("RESEARCH_MAX_QUERIES", "4"))
+RESEARCH_CONCURRENCY = int(os.getenv("RESEARCH_CONCURRENCY", "3"))
+RESEARCH_MAX_RESULTS = int(os.getenv("RESEARCH_MAX_RESULTS", "20"))
+RESEARCH_DEDUP_THRESHOLD = float(os.getenv("RESEARCH_DEDUP_THRESHOLD", "0.7"))
+
+# 子查询的补充角度
+RESEARCH_QUERY_ASPECTS = ["最新进展", "应用案例", "原理与方法"]
+
+# 子主题分隔：顿号、逗号、分号，或两侧有空白的连接词；中文连接词不能直接切分，
+# "参与""涉及""和平"等词本身就包含这些字
+_SUBTOPIC_SPLIT_PATTERN = re.compile(r"[、,，;；]|\s+(?:和|与|及|以及|vs\.?|and)\s+", re.IGNORECASE)
+# 子主题至少包含的有效字符数（不计空白和标点），过短的片段不单独搜索
+SUBTOPIC_MIN_CHARS = 2
+
+
+def expand_search_queries(task: str, max_queries: int = RESEARCH_MAX_QUERIES) -> list[str]:
+    """
+    将任务拆分为多个子查询：主查询、并列的子主题、补充角度
+    """
+    base = clean_search_query(task)
+    queries = [base]
+
+    # 按分隔符拆出子主题
+    parts = [
+        part.strip() for part in _SUBTOPIC_SPLIT_PATTERN.split(base)
+        if len(normalize_text(part)) >= SUBTOPIC_MIN_CHARS
+    ]
+    if len(parts) > 1:
+        queries.extend(parts)
+
+    for aspect in RESEARCH_QUERY_ASPECTS:
+        queries.append(f"{base} {aspect}")
+
+    # 去重并保持顺序
+    unique = list(dict.fromkeys(queries))
+    return unique[:max_queries]
+
+
+def merge_search_results(results_per_query: list[list[str]], max_results: int = RESEARCH_MAX_RESULTS) -> list[str]:
+    """
+    轮流取各子查询的结果，使每个子查询排名靠前的结果优先保留，再去除近似重复
+    """
+    interleaved = []
+    longest = max((len(results) for results in results_per_query), default=0)
+    for i in range(longest):
+        for results in results_per_query:
+            if i < len(results):
+                interleaved.append(results[i])
+    return dedupe_texts(interleaved, threshold=RESEARCH_DEDUP_THRESHOLD)[:max_results]
+
+
+async def multi_query_search(queries: list[str]) -> list[str]:
+    """
+    以有限并发执行多个子查询并合并结果
+    """
+    semaphore = asyncio.Semaphore(RESEARCH_CONCURRENCY)
+
+    async def search(query: str) -> list[str]:
+        async with semaphore:
+            return await tavily_search.ainvoke(query)
+
+    results_per_query = await asyncio.gather(*(search(query) for query in queries))
+    return merge_search_results(results_per_query)
+
+
+async def research_node(state: AgentState):
     """
     搜索节点:通过搜索工具来获取信息
     """
     print("--- Researcher: 正在搜索信息 ---")
     task = state.get('task', '')
-    
-    # 清理搜索查询
-    search_query = clean_search_query(task)
-    
-    print(f"搜索查询: {search_query}")
-    
-    results = tavily_search.invoke(search_query)
-    
+
+    if RESEARCH_MODE == "multi":
+        search_queries = expand_search_queries(task)
+        print(f"搜索查询: {search_queries}")
+        results = await multi_query_search(search_queries)
+        search_query = search_queries[0]
+    else:
+        # 清理搜索查询
+        search_query = clean_search_query(task)
+        search_queries = [search_query]
+        print(f"搜索查询: {search_query}")
+        results = await tavily_search.ainvoke(search_query)
+
     # 记录Agent执行历史
     history = state.get('agent_history', [])
     history.append({
@@ -26,7 +104,8 @@ def research_node(state: AgentState):
         "timestamp": datetime.now().isoformat(),
         "input": task,
         "search_query": search_query,
+        "search_queries": search_queries,
         "output_count": len(results)
     })
-    
+
     return {"search_results": results, "agent_history": history}
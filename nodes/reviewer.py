@@ -3,10 +3,14 @@ from datetime import datetime
 from langchain_core.prompts import ChatPromptTemplate
 
 from graph.state import AgentState
+from utils.context_packer import get_node_context
+from utils.markdown_sections import format_outline, split_sections
 from utils.my_llm import llm
+from utils.quality_gate import QUALITY_GATE_ENABLED, evaluate_draft
+from utils import metrics
 
 
-def reviewer_node(state: AgentState):
+async def reviewer_node(state: AgentState):
     """
     审核节点:根据草稿内容和任务要求进行审核
     """
@@ -14,7 +18,6 @@ def reviewer_node(state: AgentState):
     
     draft = state.get('draft', '')
     task = state.get('task', '')
-    search_results = state.get('search_results', [])
     revision_count = state.get('revision_count', 0)
 
     # Allow maximum 3 revisions to prevent infinite loops
@@ -33,7 +36,58 @@ def reviewer_node(state: AgentState):
         
         return {"critique": "APPROVE", "agent_history": history}
     
-    prompt_text = """你是一名严格的主编。请审核以下关于 "{task}" 的文章草稿。
+    # 本地质量检查：明显合格直接通过，明显不合格直接退回，都不调用 LLM
+    if QUALITY_GATE_ENABLED:
+        gate = evaluate_draft(draft, state.get('task_type', 'standard'), state.get('search_results', []))
+        if gate["decision"] in ("approve", "reject"):
+            metrics.incr("quality_gate.approved" if gate["decision"] == "approve" else "quality_gate.rejected")
+            print(f"--- Reviewer: 本地质量检查结果 {gate['decision']}，跳过 LLM 审核 ---")
+            
+            # 记录Agent执行历史
+            history = state.get('agent_history', [])
+            history.append({
+                "agent": "reviewer",
+                "action": "quality_gate",
+                "timestamp": datetime.now().isoformat(),
+                "result": gate["critique"],
+                "checks": gate["checks"],
+                "revision_count": revision_count
+            })
+            
+            return {"critique": gate["critique"], "agent_history": history}
+        metrics.incr("quality_gate.reviewed")
+    
+    revision_changes = state.get('revision_changes') or []
+    
+    if revision_changes:
+        # 增量修订：只审核发生变化的章节
+        prompt_text = """你是一名严格的主编。你上一轮对关于 "{task}" 的文章提出了以下审核意见：
+{critique}
+
+文章目录：
+{outline}
+
+参考资料：
+{search_results}
+
+根据意见修改后的章节：
+{changes}
+
+要求：
+1. 检查修改后的章节是否解决了审核意见指出的问题，内容是否充实，逻辑是否严密。
+2. 如果文章质量合格，请只输出 "APPROVE" (不带引号)。
+3. 如果需要修改，请给出具体的修改建议（critique），不要太长，直接指出问题。
+"""
+        changes = "\n\n".join(revision_changes)
+        invoke_params = {
+            "task": task,
+            "critique": state.get('critique', ''),
+            "outline": format_outline(split_sections(draft)),
+            "changes": changes,
+            "search_results": get_node_context(state, "reviewer", changes)
+        }
+    else:
+        prompt_text = """你是一名严格的主编。请审核以下关于 "{task}" 的文章草稿。
 
 参考资料：
 {search_results}
@@ -46,15 +100,16 @@ def reviewer_node(state: AgentState):
 2. 如果文章质量合格，请只输出 "APPROVE" (不带引号)。
 3. 如果需要修改，请给出具体的修改建议（critique），不要太长，直接指出问题。
 """
+        invoke_params = {
+            "task": task,
+            "draft": draft,
+            "search_results": get_node_context(state, "reviewer", draft)
+        }
     
     prompt = ChatPromptTemplate.from_template(prompt_text)
     chain = prompt | llm
     
-    response = chain.invoke({
-        "task": task,
-        "draft": draft,
-        "search_results": "\n".join(search_results)
-    })
+    response = await chain.ainvoke(invoke_params)
     
     critique = response.content.strip()
     
@@ -71,7 +126,8 @@ def reviewer_node(state: AgentState):
         "action": "review",
         "timestamp": datetime.now().isoformat(),
         "result": result,
-        "revision_count": revision_count
+        "revision_count": revision_count,
+        "reviewed_sections": len(revision_changes) if revision_changes else "all"
     })
     
     return {"critique": result, "agent_history": history}
@@ -1,12 +1,77 @@
 from datetime import datetime
 import json
+import os
+import dotenv
 from langchain_core.prompts import ChatPromptTemplate
 from graph.state import AgentState
+from utils.context_packer import get_node_context
 from utils.my_llm import llm
 from utils.content_cleaner import clean_article_output
+from utils.markdown_sections import (
+    apply_section_edits, format_numbered_sections, parse_section_edits, split_sections
+)
 
+dotenv.load_dotenv()
 
-def writer_node(state: AgentState):
+# 修订模式：incremental（只改审核意见涉及的章节）| full（整篇重写）
+REVISION_MODE = os.getenv("REVISION_MODE", "incremental")
+# 增量修订调用的标签：其输出是章节补丁标记，流式接口据此不推送给前端，修订完成后改推完整草稿
+REVISE_SECTIONS_TAG = "revise_sections"
+
+
+async def revise_sections(state: AgentState):
+    """
+    增量修订：把上一版草稿按章节编号后连同审核意见交给 LLM，只输出需要修改的章节并回填到原文
+    
+    Returns:
+        (修订后的草稿, 发生变化的章节列表)；LLM 未按格式输出时返回 None，由调用方整篇重写
+    """
+    task = state.get('task', '')
+    critique = state.get('critique', '')
+    sections = split_sections(state.get('draft', ''))
+
+    prompt_text = """你是一名专业的技术撰稿人。请根据审核意见修订以下关于 "{task}" 的文章。
+
+参考资料：
+{search_results}
+
+审核意见：{critique}
+
+文章按章节编号如下：
+{sections}
+
+要求：
+1. 只修改审核意见涉及的章节，未涉及的章节不要输出
+2. 每个修改后的章节使用原编号，按以下格式完整输出该章节（包括标题行）：
+<<<SECTION 编号>>>
+修改后的章节内容
+<<<END>>>
+3. 如需新增章节，编号写 NEW
+4. 使用markdown格式，不要输出其他说明文字
+"""
+
+    prompt = ChatPromptTemplate.from_template(prompt_text)
+    chain = prompt | llm
+
+    response = await chain.ainvoke({
+        "task": task,
+        "search_results": get_node_context(state, "writer", f"{task}\n{critique}"),
+        "critique": critique,
+        "sections": format_numbered_sections(sections)
+    }, config={"tags": [REVISE_SECTIONS_TAG]})
+
+    edits = parse_section_edits(response.content)
+    if not edits:
+        return None
+    try:
+        draft, changed = apply_section_edits(state.get('draft', ''), edits)
+    except ValueError as e:
+        print(f"[WARN] 增量修订结果无效: {e}")
+        return None
+    return clean_article_output(draft), changed
+
+
+async def writer_node(state: AgentState):
     """
     写节点:根据搜索内容和修改意见撰写草稿
     """
@@ -16,11 +81,36 @@ def writer_node(state: AgentState):
     new_revision_count = current_revision + 1
     
     task = state.get('task', '')
-    search_results = state.get('search_results', [])
     critique = state.get('critique', '')
     data_analysis = state.get('data_analysis', {})
     code = state.get('code', '')
 
+    # 已有本节点写出的草稿且收到修改意见时，优先增量修订
+    if REVISION_MODE == "incremental" and critique and current_revision > 0 and state.get('draft'):
+        revised = await revise_sections(state)
+        if revised is not None:
+            draft, changed = revised
+            
+            # 记录Agent执行历史
+            history = state.get('agent_history', [])
+            history.append({
+                "agent": "writer",
+                "action": "revise_sections",
+                "timestamp": datetime.now().isoformat(),
+                "input": task,
+                "revision": new_revision_count,
+                "changed_sections": len(changed),
+                "draft_length": len(draft)
+            })
+            
+            return {
+                "draft": draft,
+                "revision_count": new_revision_count,
+                "revision_changes": changed,
+                "agent_history": history
+            }
+        print("--- Writer: 增量修订结果无法解析，改为整篇重写 ---")
+
     prompt_text = """你是一名专业的技术撰稿人。请根据以下信息撰写一篇技术文章。
 
 任务：{task}
@@ -55,12 +145,12 @@ def writer_node(state: AgentState):
     # 准备参数
     invoke_params = {
         "task": task,
-        "search_results": "\n".join(search_results),
+        "search_results": get_node_context(state, "writer", f"{task}\n{critique}" if critique else task),
         "revision_count": new_revision_count,
         "critique": critique
     }
     
-    response = chain.invoke(invoke_params)
+    response = await chain.ainvoke(invoke_params)
     
     # 后处理清理
     draft = clean_article_output(response.content)
@@ -79,5 +169,6 @@ def writer_node(state: AgentState):
     return {
         "draft": draft,
         "revision_count": new_revision_count,
+        "revision_changes": [],
         "agent_history": history
     }
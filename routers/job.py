@@ -0,0 +1,98 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.db_conf import get_db
+from crud.report import get_report_by_id, report_content
+from crud.report_job import get_job
+from models.report_job import JOB_SUCCEEDED, ReportJob
+from models.users import User
+from routers.report import get_current_user_dependency
+from schema.report import ChatRequest
+from utils.report_jobs import JobQueueFull, report_job_runner
+
+
+router = APIRouter(prefix="/report/jobs", tags=["后台任务"])
+
+def job_to_dict(job: ReportJob) -> dict:
+    return {
+        "job_id": job.id,
+        "task": job.task,
+        "status": job.status,
+        "report_id": job.report_id,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None
+    }
+
+async def get_user_job(job_id: str, current_user: User, db: AsyncSession) -> ReportJob:
+    job = await get_job(db, job_id, current_user.id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job
+
+@router.post("", status_code=202)
+async def submit_job(
+    request: ChatRequest,
+    current_user: User = Depends(get_current_user_dependency)
+):
+    """
+    提交后台报告生成任务，立即返回任务 id，之后轮询任务状态并获取结果
+    """
+    try:
+        job = await report_job_runner.submit(current_user.id, request.query, request.force_refresh)
+    except JobQueueFull:
+        raise HTTPException(status_code=429, detail="排队任务已满，请稍后再试")
+    return {"success": True, "message": "任务已提交", "data": job_to_dict(job)}
+
+@router.get("/{job_id}")
+async def get_job_status(
+    job_id: str,
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    查询任务状态：queued / running / succeeded / failed / cancelled
+    """
+    job = await get_user_job(job_id, current_user, db)
+    return {"success": True, "data": job_to_dict(job)}
+
+@router.get("/{job_id}/result")
+async def get_job_result(
+    job_id: str,
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    获取任务生成的报告，任务未成功完成时返回 409
+    """
+    job = await get_user_job(job_id, current_user, db)
+    if job.status != JOB_SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"任务尚未完成，当前状态: {job.status}")
+    report = await get_report_by_id(db, current_user.id, job.report_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="报告不存在")
+    return {
+        "success": True,
+        "data": {
+            "job_id": job.id,
+            "report_id": report.id,
+            "topic": report.topic,
+            "content": report_content(report),
+            "created_at": report.created_at.isoformat() if report.created_at else None
+        }
+    }
+
+@router.post("/{job_id}/cancel")
+async def cancel_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    取消排队中或运行中的任务
+    """
+    job = await get_user_job(job_id, current_user, db)
+    if not await report_job_runner.cancel(job.id, current_user.id):
+        raise HTTPException(status_code=409, detail=f"任务已结束，当前状态: {job.status}")
+    return {"success": True, "message": "任务已取消"}
@@ -0,0 +1,52 @@
+import os
+import secrets
+
+import dotenv
+from fastapi import APIRouter, Depends, HTTPException
+
+from config.db_conf import pool_stats
+from routers.report import get_current_user_dependency, get_token_from_header
+from utils import metrics
+from utils.admission import admission
+from utils.llm_rate_limiter import llm_limiter
+from utils.quality_gate import gate_stats
+from utils.report_jobs import report_job_runner
+from utils.report_writer import report_writer
+from utils.search_cache import search_cache
+from utils.stream_runs import run_registry
+from utils.task_type_cache import task_type_cache
+
+dotenv.load_dotenv()
+
+# 监控系统抓取 /metrics 使用的专用 token；未设置时只允许已登录用户访问
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+
+router = APIRouter(prefix="/metrics", tags=["监控"])
+
+async def verify_metrics_access(token: str = Depends(get_token_from_header)):
+    """
+    指标中包含进程内部状态（连接池、队列、准入、后台任务持有者的主机名和进程号等），不对匿名请求开放：
+    配置了 METRICS_TOKEN 时只接受该 token，否则要求已登录用户的 token
+    """
+    if METRICS_TOKEN:
+        if not secrets.compare_digest(token.encode("utf-8"), METRICS_TOKEN.encode("utf-8")):
+            raise HTTPException(status_code=403, detail="无权访问监控指标")
+        return
+    await get_current_user_dependency(token)
+
+@router.get("", dependencies=[Depends(verify_metrics_access)])
+async def get_metrics():
+    """获取进程内运行指标"""
+    return {
+        **metrics.snapshot(),
+        "task_type_cache": task_type_cache.stats(),
+        "search_cache": search_cache.stats(),
+        "quality_gate": gate_stats(),
+        "db_pool": pool_stats(),
+        "report_writer": report_writer.stats(),
+        "stream_runs": run_registry.stats(),
+        "report_jobs": report_job_runner.stats(),
+        "admission": admission.stats(),
+        "llm_limiter": llm_limiter.stats(),
+    }
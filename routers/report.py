@@ -1,83 +1,174 @@
-import json
-from fastapi import APIRouter, Depends, Header, HTTPException
+import time
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.responses import StreamingResponse
-from config.db_conf import get_db
-from crud.report import save_report
-from crud.report import get_history_report_list
+from config.db_conf import AsyncSessionLocal, get_db
+from crud.report import get_history_report_page, get_report_by_id, report_content
 from crud.user import get_current_user
 from models.users import User
 from schema.report import ChatRequest
 from graph.workflow import app as workflow_app
+from nodes.classifier import determine_task_type_local
+from nodes.write import REVISE_SECTIONS_TAG
+from utils.report_cache import REPORT_CACHE_COPY_SHARED, REPORT_CACHE_ENABLED, find_cached_report
+from utils.report_writer import persist_report
+from utils.report_search import search_reports
+from utils import metrics
+from utils.admission import WORKFLOW_QUEUE_STATUS_INTERVAL, AdmissionRejected, admission
+from utils.sse import DONE_FRAME, TokenCoalescer, encode_event, status_frame, token_frame, with_flush_deadline
+from utils.stream_runs import WorkflowRun, parse_last_event_id, run_registry
 
 
 router = APIRouter(prefix="/report/chat",tags=["报告"])
 
+# 复用缓存报告时每个 token 事件包含的字符数
+CACHED_REPORT_CHUNK_CHARS = 200
+
+# 工作流节点开始时推送的状态
+NODE_STATUS = {
+    "researcher": "🔍 研究员正在搜集信息...",
+    "classifier": "🧭 正在识别任务类型...",
+    "code_generator": "💻 代码生成器正在编写代码...",
+    "data_analyst": "📊 数据分析师正在分析数据...",
+    "writer": "✍️ 撰稿人正在撰写初稿...",
+    "reviewer": "👀 审稿人正在审核文章...",
+}
+
+def saved_status(saved: bool) -> str:
+    """保存报告后的状态文案：异步写入队列只是提交保存，稍后才会出现在历史记录中"""
+    return '💾 报告已保存' if saved else '💾 报告已提交保存，稍后可在历史记录中查看'
+
 async def get_token_from_header(authorization: str = Header(...)):
     """从请求头中提取 token"""
     if not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="无效的认证格式")
     return authorization[7:]
 
-async def get_current_user_dependency(
-    token: str = Depends(get_token_from_header),
-    db: AsyncSession = Depends(get_db)
-):
-    """获取当前用户（依赖注入版本）"""
-    return await get_current_user(token, db)
+async def get_current_user_dependency(token: str = Depends(get_token_from_header)):
+    """
+    获取当前用户（依赖注入版本）
+    鉴权使用独立的短会话，查询结束即归还连接，不随请求（尤其是长时间的流式响应）一直占用
+    """
+    async with AsyncSessionLocal() as db:
+        return await get_current_user(token, db)
 
 @router.post("/stream")
 async def chat_stream(
     request: ChatRequest,
-    current_user: User = Depends(get_current_user_dependency),
-    db: AsyncSession = Depends(get_db)
+    current_user: User = Depends(get_current_user_dependency)
 ):
     """
     使用 Server-Sent Events (SSE) 流式返回生成结果，并保存到数据库
+    工作流可能运行数分钟，只在查询缓存报告和保存报告时短暂取用数据库连接；
+    工作流在后台运行，连接断开后可通过 /runs/{run_id}/stream 带 Last-Event-ID 重连，补发错过的事件
+    工作流执行名额有限，超出时排队并推送排队位置，排队已满时直接返回 429
     """
+    try:
+        ticket = admission.enqueue(current_user.id)
+    except AdmissionRejected:
+        raise HTTPException(status_code=429, detail="当前排队的任务过多，请稍后再试", headers={"Retry-After": "30"})
     
     async def event_generator():
         task = request.query
         print(f"收到用户任务: {task}")
         
         # 发送初始状态
-        yield f"data: {json.dumps({'type': 'status', 'content': '任务已接收，正在启动工作流...'}, ensure_ascii=False)}\n\n"
+        yield status_frame('任务已接收，正在启动工作流...')
+
+        # 等待执行名额，排队位置变化时推送
+        last_position = None
+        while not ticket.granted:
+            position = ticket.position()
+            if position != last_position:
+                yield encode_event({'type': 'status', 'content': f'⏳ 当前排队中，前面还有 {position - 1} 个任务...', 'queue_position': position})
+                last_position = position
+            await ticket.wait(WORKFLOW_QUEUE_STATUS_INTERVAL)
+        if last_position is not None:
+            yield status_frame('🚀 排队结束，开始执行工作流...')
+
+        # 取得名额后再查找可以直接复用的相同/相似任务报告。只复用同类型的报告，这里只用本地预分类和
+        # 分类缓存识别任务类型、不调用 LLM，无法确定时不复用，由与搜索并行的分类节点调用 LLM
+        cache_hit = None
+        task_type = None
+        if REPORT_CACHE_ENABLED and not request.force_refresh:
+            try:
+                task_type = await determine_task_type_local(task)
+                async with AsyncSessionLocal() as db:
+                    cache_hit = await find_cached_report(db, task, current_user.id, task_type)
+            except Exception as cache_e:
+                print(f"[WARN] 查找缓存报告失败: {cache_e}")
+        if cache_hit:
+            # 复用报告不需要执行工作流，立即归还名额
+            ticket.release()
+            report = cache_hit["report"]
+            created_at = report.created_at.isoformat() if report.created_at else None
+            match_label = "相同" if cache_hit["match"] == "exact" else f"相似（相似度 {cache_hit['similarity']:.0%}）"
+            yield encode_event({'type': 'cache_hit', 'report_id': report.id, 'topic': report.topic, 'created_at': created_at, 'match': cache_hit['match'], 'similarity': cache_hit['similarity']})
+            yield encode_event({'type': 'status', 'content': f'♻️ 找到{match_label}任务的已有报告「{report.topic}」，直接返回（如需重新生成请开启强制刷新）'})
+            content = report_content(report)
+            for start in range(0, len(content), CACHED_REPORT_CHUNK_CHARS):
+                yield token_frame(content[start:start + CACHED_REPORT_CHUNK_CHARS])
+            # 复用其他用户的报告时，只有显式开启后才为当前用户保存一份，出现在其历史记录中
+            if report.user_id != current_user.id and REPORT_CACHE_COPY_SHARED:
+                try:
+                    saved = await persist_report(topic=task, content=content, user_id=current_user.id, task_type=report.task_type)
+                    yield status_frame(saved_status(saved))
+                except Exception as db_e:
+                    print(f"数据库保存失败: {db_e}")
+                    yield encode_event({'type': 'error', 'content': f'数据库保存失败: {str(db_e)}'})
+            yield DONE_FRAME
+            return
         
-        # 初始化状态
+        # 初始化状态（查找缓存时已在本地识别出的任务类型直接带入，分类节点不再重复识别）
         initial_state = {
             "task": task,
             "revision_count": 0,
             "search_results": [],
             "messages": []
         }
+        if task_type:
+            initial_state["task_type"] = task_type
         
         final_state = None
         current_draft_content = ""
+        token_buffer = TokenCoalescer()
         
+        started_at = time.perf_counter()
         try:
             # 使用 astream_events 允许细粒度的事件流式传输
-            async for event in workflow_app.astream_events(initial_state, version="v2"):
+            # 上游停顿时按合并窗口推送已缓冲的 token，不等下一个事件到达
+            events = workflow_app.astream_events(initial_state, version="v2")
+            async for event in with_flush_deadline(events, token_buffer):
+                if event is None:
+                    pending = token_buffer.flush()
+                    if pending:
+                        yield pending
+                    continue
                 kind = event["event"]
                 name = event.get("name", "")
                 metadata = event.get("metadata", {})
+
+                # 其他事件到达时先推送缓冲中的 token，保证顺序且不会滞留
+                if kind != "on_chat_model_stream":
+                    pending = token_buffer.flush()
+                    if pending:
+                        yield pending
                 
                 # --- 处理 LangGraph 节点开始事件 ---
                 if kind == "on_chain_start":
-                    if name == "researcher":
-                        yield f"data: {json.dumps({'type': 'status', 'content': '🔍 研究员正在搜集信息...'}, ensure_ascii=False)}\n\n"
-                    elif name == "code_generator":
-                        yield f"data: {json.dumps({'type': 'status', 'content': '💻 代码生成器正在编写代码...'}, ensure_ascii=False)}\n\n"
-                    elif name == "data_analyst":
-                        yield f"data: {json.dumps({'type': 'status', 'content': '📊 数据分析师正在分析数据...'}, ensure_ascii=False)}\n\n"
-                    elif name == "writer":
-                        yield f"data: {json.dumps({'type': 'status', 'content': '✍️ 撰稿人正在撰写初稿...'}, ensure_ascii=False)}\n\n"
+                    # 任务类型已带入时分类节点直接返回，不推送"正在识别任务类型"
+                    if name in NODE_STATUS and not (name == "classifier" and "task_type" in initial_state):
+                        yield status_frame(NODE_STATUS[name])
+                    if name == "writer":
                         # 重置当前草稿内容（新的一版）
                         current_draft_content = ""
-                    elif name == "reviewer":
-                        yield f"data: {json.dumps({'type': 'status', 'content': '👀 审稿人正在审核文章...'}, ensure_ascii=False)}\n\n"
                 
                 # --- 处理 LLM 的流式输出 ---
                 elif kind == "on_chat_model_stream":
+                    # 增量修订输出的是章节补丁标记，不推送给前端，Writer 结束后推送回填后的完整草稿
+                    if REVISE_SECTIONS_TAG in event.get("tags", []):
+                        continue
                     data = event["data"]
                     chunk = data.get("chunk")
                     if chunk and hasattr(chunk, "content") and chunk.content:
@@ -87,43 +178,103 @@ async def chat_stream(
                         # 如果是 Writer 节点，收集草稿内容
                         if "writer" in node_name.lower():
                             current_draft_content += content_chunk
-                        yield f"data: {json.dumps({'type': 'token', 'content': content_chunk}, ensure_ascii=False)}\n\n"
+                        frame = token_buffer.add(content_chunk)
+                        if frame:
+                            yield frame
                         
                 # --- 处理工具结束事件 ---
                 elif kind == "on_tool_end":
-                    yield f"data: {json.dumps({'type': 'status', 'content': '✅ 搜索完成，正在整理结果...'}, ensure_ascii=False)}\n\n"
+                    yield status_frame('✅ 搜索完成，正在整理结果...')
+
+                # --- 修订后的完整草稿，前端用它替换已显示的内容 ---
+                elif kind == "on_chain_end" and name == "writer":
+                    output = event["data"].get("output") or {}
+                    if output.get("revision_count", 0) > 1 and output.get("draft"):
+                        yield encode_event({'type': 'draft', 'content': output['draft']})
+
+                # --- 记录工作流最终状态 ---
+                elif kind == "on_chain_end" and name == "LangGraph":
+                    final_state = event["data"].get("output")
 
             # 工作流结束
-            yield f"data: {json.dumps({'type': 'status', 'content': '🎉 工作流执行完毕！'}, ensure_ascii=False)}\n\n"
+            pending = token_buffer.flush()
+            if pending:
+                yield pending
+            metrics.observe("workflow.total_ms", (time.perf_counter() - started_at) * 1000)
+            yield status_frame('🎉 工作流执行完毕！')
             
-            # 保存最终草稿到数据库（只保存最后一版）
-            if current_draft_content:
+            # 保存最终草稿到数据库（只保存最后一版），完整草稿以工作流最终状态为准
+            final_draft = (final_state or {}).get("draft") or current_draft_content
+            if final_draft:
                 try:
-                    await save_report(topic=task, content=current_draft_content, db=db, user_id=current_user.id)
-                    yield f"data: {json.dumps({'type': 'status', 'content': '💾 报告已保存到数据库'}, ensure_ascii=False)}\n\n"
+                    saved = await persist_report(topic=task, content=final_draft, user_id=current_user.id,
+                                                 task_type=(final_state or {}).get("task_type"))
+                    yield status_frame(saved_status(saved))
                 except Exception as db_e:
                     print(f"数据库保存失败: {db_e}")
                     import traceback
                     traceback.print_exc()
-                    yield f"data: {json.dumps({'type': 'error', 'content': f'数据库保存失败: {str(db_e)}'}, ensure_ascii=False)}\n\n"
+                    yield encode_event({'type': 'error', 'content': f'数据库保存失败: {str(db_e)}'})
 
-            yield "data: [DONE]\n\n"
+            yield DONE_FRAME
             
         except Exception as e:
             print(f"发生错误: {e}")
-            yield f"data: {json.dumps({'type': 'error', 'content': str(e)}, ensure_ascii=False)}\n\n"
+            pending = token_buffer.flush()
+            if pending:
+                yield pending
+            yield encode_event({'type': 'error', 'content': str(e)})
 
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+    async def admitted_events():
+        try:
+            async for frame in event_generator():
+                yield frame
+        finally:
+            # 运行结束、出错或被中止时归还名额（排队中则退出排队）
+            ticket.release()
+
+    run = run_registry.start(current_user.id, admitted_events())
+    return stream_run_response(run, after=0, announce=True)
+
+@router.get("/runs/{run_id}/stream")
+async def resume_chat_stream(
+    run_id: str,
+    last_event_id: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user_dependency)
+):
+    """
+    断线重连：从 Last-Event-ID 之后补发事件并继续推送，运行已结束时推送完剩余事件后结束
+    """
+    run = run_registry.get(run_id, current_user.id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="运行不存在或已过期")
+    metrics.incr("stream_runs.resumed")
+    return stream_run_response(run, after=parse_last_event_id(last_event_id))
+
+def stream_run_response(run: WorkflowRun, after: int, announce: bool = False) -> StreamingResponse:
+    async def run_events():
+        if announce:
+            # 告知客户端运行 id，用于断线重连（该事件不编号）
+            yield encode_event({"type": "run", "run_id": run.run_id})
+        async for frame in run.subscribe(after):
+            yield frame
+
+    return StreamingResponse(run_events(), media_type="text/event-stream", headers={"X-Run-Id": run.run_id})
 
 @router.get("/history")
 async def get_history_reports(
+    limit: int = Query(20, ge=1, le=100, description="每页条数"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
     current_user: User = Depends(get_current_user_dependency),
     db: AsyncSession = Depends(get_db)
 ):
     """
-    获取历史报告列表
+    分页获取历史报告列表（只返回摘要，完整内容通过详情接口获取）
     """
-    reports = await get_history_report_list(db, current_user.id)
+    try:
+        reports, next_cursor = await get_history_report_page(db, current_user.id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return {
         "success": True,
         "message": "历史报告列表获取成功",
@@ -131,11 +282,32 @@ async def get_history_reports(
             {
                 "id": report.id,
                 "topic": report.topic,
-                "content": report.content,
+                "content_length": report.content_length,
+                "preview": report.preview,
                 "created_at": report.created_at.isoformat() if report.created_at else None
             }
             for report in reports
-        ]
+        ],
+        "next_cursor": next_cursor
+    }
+
+@router.get("/search")
+async def search_history_reports(
+    q: str = Query(..., min_length=1, max_length=200, description="检索关键词"),
+    limit: int = Query(10, ge=1, le=50, description="每页条数"),
+    offset: int = Query(0, ge=0, le=1000, description="跳过的条数"),
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    按标题和正文全文检索历史报告，按相关度排序并返回高亮摘要
+    """
+    reports, has_more = await search_reports(db, current_user.id, q, limit, offset)
+    return {
+        "success": True,
+        "message": "报告检索成功",
+        "data": reports,
+        "next_offset": offset + limit if has_more else None
     }
 
 @router.get("/history/{report_id}")
@@ -147,16 +319,15 @@ async def get_report_detail(
     """
     获取单个报告的详细信息
     """
-    reports = await get_history_report_list(db, current_user.id)
-    for report in reports:
-        if report.id == report_id:
-            return {
-                "success": True,
-                "data": {
-                    "id": report.id,
-                    "topic": report.topic,
-                    "content": report.content,
-                    "created_at": report.created_at.isoformat() if report.created_at else None
-                }
-            }
-    return {"success": False, "message": "报告不存在"}
+    report = await get_report_by_id(db, current_user.id, report_id)
+    if report is None:
+        return {"success": False, "message": "报告不存在"}
+    return {
+        "success": True,
+        "data": {
+            "id": report.id,
+            "topic": report.topic,
+            "content": report_content(report),
+            "created_at": report.created_at.isoformat() if report.created_at else None
+        }
+    }
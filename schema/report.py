@@ -2,3 +2,5 @@ from pydantic import BaseModel
 
 class ChatRequest(BaseModel):
     query: str
+    # 为 True 时跳过报告缓存，重新执行完整工作流
+    force_refresh: bool = False
@@ -0,0 +1,152 @@
+"""
+并发报告吞吐量基准测试（使用桩 LLM 和桩搜索，不访问外部服务）
+
+对比两种模式：
+- sync：LLM 与搜索只提供同步实现，每次调用都占用一个线程池线程（改造前的行为）
+- async：LLM 走原生 ainvoke，搜索走独立线程池的异步包装（改造后的行为）
+
+用法：
+    python scripts/bench_async_nodes.py --reports 200 --llm-latency 0.5 --search-latency 0.3
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 让模块导入不依赖真实的 .env 配置
+os.environ.setdefault("deepseek-model-name", "stub")
+os.environ.setdefault("deepseek-api-key", "stub")
+os.environ.setdefault("zhipu-api-key", "stub-api-key")
+os.environ.setdefault("TASK_TYPE_CACHE_BACKEND", "memory")
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.tools import StructuredTool
+
+import graph.workflow as workflow_module
+import nodes.classifier
+import nodes.code_generator
+import nodes.data_analyst
+import nodes.research
+import nodes.reviewer
+import nodes.write
+import utils.agent_tools as agent_tools
+
+# 所有持有共享 llm 引用的模块
+LLM_MODULES = [
+    nodes.classifier,
+    nodes.code_generator,
+    nodes.data_analyst,
+    nodes.reviewer,
+    nodes.write,
+]
+
+
+def _stub_reply(messages) -> str:
+    """根据提示词内容返回固定回复"""
+    text = "\n".join(str(m.content) for m in messages)
+    if "只返回类型名称" in text:
+        return "standard"
+    if "主编" in text:
+        return "APPROVE"
+    return "# 基准测试文章\n\n" + "内容。" * 200
+
+
+class SyncStubChatModel(BaseChatModel):
+    """只有同步实现的桩模型，ainvoke 会退化为线程池调用"""
+    latency: float = 0.5
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=_stub_reply(messages)))])
+
+
+class AsyncStubChatModel(SyncStubChatModel):
+    """带原生异步实现的桩模型"""
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=_stub_reply(messages)))])
+
+
+class StubSearchClient:
+    """模拟 ZhipuAiClient.web_search 的同步阻塞调用"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.web_search = SimpleNamespace(web_search=self._search)
+
+    def _search(self, search_query: str, **kwargs):
+        time.sleep(self.latency)
+        return SimpleNamespace(search_result=[
+            SimpleNamespace(content=f"{search_query} 相关资料 {i}") for i in range(10)
+        ])
+
+
+def install_stubs(mode: str, llm_latency: float, search_latency: float):
+    model_cls = AsyncStubChatModel if mode == "async" else SyncStubChatModel
+    stub_llm = model_cls(latency=llm_latency)
+    for module in LLM_MODULES:
+        module.llm = stub_llm
+    nodes.classifier.task_type_cache.clear()
+
+    agent_tools.client = StubSearchClient(search_latency)
+    agent_tools.search_cache.clear()
+    if mode == "async":
+        nodes.research.tavily_search = agent_tools.tavily_search
+    else:
+        nodes.research.tavily_search = StructuredTool.from_function(
+            func=agent_tools.web_search, name="tavily_search", description="同步搜索"
+        )
+
+
+async def run_one(i: int):
+    initial_state = {
+        "task": f"基准测试任务 {i}",
+        "revision_count": 0,
+        "search_results": [],
+        "messages": []
+    }
+    async for _ in workflow_module.app.astream_events(initial_state, version="v2"):
+        pass
+
+
+async def run_bench(reports: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(run_one(i) for i in range(reports)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并发报告吞吐量基准测试")
+    parser.add_argument("--reports", type=int, default=200, help="并发报告数量")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="单次 LLM 调用耗时（秒）")
+    parser.add_argument("--search-latency", type=float, default=0.3, help="单次搜索耗时（秒）")
+    parser.add_argument("--mode", choices=["sync", "async", "both"], default="both")
+    args = parser.parse_args()
+
+    # 屏蔽节点中的调试输出
+    devnull = open(os.devnull, "w")
+    modes = ["sync", "async"] if args.mode == "both" else [args.mode]
+    for mode in modes:
+        # 每种模式使用新的事件循环，避免共享默认线程池
+        install_stubs(mode, args.llm_latency, args.search_latency)
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            elapsed = asyncio.run(run_bench(args.reports))
+        finally:
+            sys.stdout = stdout
+        print(f"[{mode:5}] {args.reports} 个并发报告，耗时 {elapsed:.2f}s，吞吐量 {args.reports / elapsed:.1f} 报告/秒")
+
+
+if __name__ == "__main__":
+    main()
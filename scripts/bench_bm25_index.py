@@ -0,0 +1,90 @@
+"""
+BM25 索引微基准测试：在大规模合成搜索结果上对比 NumPy 向量化打分与逐文档纯 Python 打分
+
+用法：
+    python scripts/bench_bm25_index.py --results 2000 --queries 50
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.bm25_index import build_search_index, tokenize
+
+VOCAB_CN = list("人工智能机器学习深度神经网络数据分析模型训练推理算法优化系统架构性能安全隐私市场趋势应用场景技术发展")
+VOCAB_EN = ["python", "rust", "gpu", "transformer", "llm", "api", "cloud", "database", "latency", "cache"]
+
+
+def make_result(rng: random.Random, sentences: int) -> str:
+    parts = []
+    for _ in range(sentences):
+        words = "".join(rng.choice(VOCAB_CN) for _ in range(rng.randint(12, 30)))
+        parts.append(f"{words} {rng.choice(VOCAB_EN)}。")
+    return "".join(parts)
+
+
+class NaiveBM25:
+    """逐文档计算 BM25 得分的纯 Python 实现，作为对照（统计量预先计算）"""
+
+    def __init__(self, documents: list[list[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.n = len(documents)
+        self.avgdl = sum(len(doc) for doc in documents) / self.n
+        self.df = Counter(term for doc in documents for term in set(doc))
+        self.tfs = [(Counter(doc), len(doc)) for doc in documents]
+
+    def scores(self, query: str) -> list[float]:
+        query_terms = Counter(tokenize(query))
+        scores = []
+        for tf, length in self.tfs:
+            score = 0.0
+            for term, count in query_terms.items():
+                if term not in tf:
+                    continue
+                idf = math.log(1 + (self.n - self.df[term] + 0.5) / (self.df[term] + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * length / self.avgdl)
+                score += count * idf * tf[term] * (self.k1 + 1) / (tf[term] + norm)
+            scores.append(score)
+        return scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BM25 索引微基准测试")
+    parser.add_argument("--results", type=int, default=2000, help="搜索结果条数")
+    parser.add_argument("--sentences", type=int, default=20, help="每条搜索结果的句子数")
+    parser.add_argument("--queries", type=int, default=50, help="查询次数")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results = [make_result(rng, args.sentences) for _ in range(args.results)]
+    queries = [make_result(rng, 1) for _ in range(args.queries)]
+
+    start = time.perf_counter()
+    index = build_search_index(results)
+    build_seconds = time.perf_counter() - start
+    print(f"搜索结果 {args.results} 条，切块后 {len(index)} 个片段，词表 {len(index.vocab)}，建索引耗时 {build_seconds * 1000:.0f} ms")
+
+    start = time.perf_counter()
+    for query in queries:
+        index.search(query, top_k=8)
+    vectorized_ms = (time.perf_counter() - start) * 1000 / args.queries
+    print(f"NumPy 向量化查询: {vectorized_ms:.2f} ms/次")
+
+    naive = NaiveBM25([tokenize(doc) for doc in index.documents])
+    start = time.perf_counter()
+    for query in queries:
+        scores = naive.scores(query)
+        sorted(range(len(scores)), key=lambda i: -scores[i])[:8]
+    naive_ms = (time.perf_counter() - start) * 1000 / args.queries
+    print(f"纯 Python 逐文档查询: {naive_ms:.2f} ms/次（{naive_ms / vectorized_ms:.0f}x）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+登录风暴基准测试：大量并发登录时，测量同一事件循环中 SSE 推送 token 的延迟抖动
+
+对比两种模式：
+- sync：bcrypt 在事件循环中同步执行（改造前的行为）
+- pool：bcrypt 在独立的有界线程池中执行（改造后的行为）
+
+推送端模拟 SSE 流，每隔 --token-interval 毫秒推送一个 token，记录实际间隔相对预期的延迟。
+
+用法：
+    python scripts/bench_login_storm.py --logins 100 --concurrency 20
+    python scripts/bench_login_storm.py --rounds 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from config.db_conf import Base
+import crud.user as crud_user
+from models.users import Token, User
+from schema.user import LoginRequest, RegisterRequest
+import utils.security as security
+
+USERNAME = "storm_user"
+PASSWORD = "storm_password"
+
+
+async def _sync_verify_and_update(plain_password: str, hashed_password: str):
+    """改造前的行为：直接在事件循环中计算 bcrypt"""
+    return security.verify_and_update_password(plain_password, hashed_password)
+
+
+async def prepare(engine, session_factory):
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda c: Base.metadata.drop_all(c, tables=[Token.__table__, User.__table__]))
+        await conn.run_sync(lambda c: Base.metadata.create_all(c, tables=[User.__table__, Token.__table__]))
+    async with session_factory() as db:
+        await crud_user.create_user(RegisterRequest(username=USERNAME, password=PASSWORD), db)
+
+
+async def stream_probe(stop: asyncio.Event, interval: float) -> list[float]:
+    """模拟 SSE 推送，返回每个 token 相对预期时间的延迟（毫秒）"""
+    lateness = []
+    expected = time.perf_counter() + interval
+    while not stop.is_set():
+        await asyncio.sleep(max(0.0, expected - time.perf_counter()))
+        now = time.perf_counter()
+        lateness.append((now - expected) * 1000)
+        expected = now + interval
+    return lateness
+
+
+async def login_storm(session_factory, logins: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    request = LoginRequest(username=USERNAME, password=PASSWORD)
+
+    async def login_once():
+        async with semaphore:
+            async with session_factory() as db:
+                await crud_user.login_user(request, db)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(login_once() for _ in range(logins)))
+    return time.perf_counter() - start
+
+
+async def run_mode(mode: str, session_factory, args) -> tuple[list[float], float]:
+    crud_user.averify_and_update_password = (
+        _sync_verify_and_update if mode == "sync" else security.averify_and_update_password
+    )
+    stop = asyncio.Event()
+    probe = asyncio.create_task(stream_probe(stop, args.token_interval / 1000))
+    await asyncio.sleep(0.1)  # 先让推送端进入稳定状态
+    elapsed = await login_storm(session_factory, args.logins, args.concurrency)
+    stop.set()
+    return await probe, elapsed
+
+
+def report(label: str, lateness: list[float], elapsed: float, logins: int):
+    ordered = sorted(lateness)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f"{label:6} 登录 {logins} 次耗时 {elapsed:6.2f}s ({logins / elapsed:6.1f}/s)  "
+          f"token 延迟 p50={statistics.median(lateness):8.2f} ms  p99={p99:8.2f} ms  max={ordered[-1]:8.2f} ms  "
+          f"推送 {len(lateness)} 个")
+
+
+async def main(args):
+    # SQLite 同一时刻只允许一个写事务，并发登录写 token 时需要更长的锁等待
+    connect_args = {"timeout": 30} if args.database_url.startswith("sqlite") else {}
+    engine = create_async_engine(args.database_url, connect_args=connect_args)
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    await prepare(engine, session_factory)
+    print(f"bcrypt rounds={security.PASSWORD_HASH_ROUNDS}  pool workers={security.PASSWORD_HASH_WORKERS}  "
+          f"推送间隔={args.token_interval} ms")
+    for mode in ("sync", "pool"):
+        lateness, elapsed = await run_mode(mode, session_factory, args)
+        report(mode, lateness, elapsed, args.logins)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="登录风暴下的 SSE 推送抖动基准测试")
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///bench_auth.db",
+                        help="基准测试使用的数据库（会重建 users/tokens 表，请勿指向生产库）")
+    parser.add_argument("--logins", type=int, default=50, help="登录次数")
+    parser.add_argument("--concurrency", type=int, default=20, help="并发登录数")
+    parser.add_argument("--token-interval", type=float, default=20, help="SSE 推送间隔（毫秒）")
+    parser.add_argument("--rounds", type=int, help="bcrypt 成本因子，覆盖 PASSWORD_HASH_ROUNDS")
+    parsed = parser.parse_args()
+    if parsed.rounds:
+        security.PASSWORD_HASH_ROUNDS = parsed.rounds
+        security.bcrypt_context.update(bcrypt__rounds=parsed.rounds)
+    asyncio.run(main(parsed))
@@ -0,0 +1,108 @@
+"""
+SSE 推送基准测试：对比逐 token 推送与按时间窗口合并推送的 CPU 耗时、帧数和传输字节数
+
+用合成的 token 流（按 --token-interval 毫秒的平均间隔到达，使用模拟时钟，不实际等待）
+模拟长文写作，分别测量：
+- legacy：每个 token 单独 json.dumps 并推送一帧（改造前的行为）
+- per-token：每个 token 单独推送，使用当前配置的 JSON 编码器
+- coalesced：按 --window 毫秒 / --max-bytes 字节合并后推送
+
+网络开销按每帧单独写出估算：HTTP chunked 编码头尾约 10 字节，加上每个 TCP 包的协议头（--packet-overhead）。
+
+用法：
+    python scripts/bench_sse_frames.py --tokens 5000 --streams 20
+    python scripts/bench_sse_frames.py --window 50 --max-bytes 2048
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import sse
+from utils.sse import TokenCoalescer
+
+VOCAB_CN = list("人工智能机器学习深度神经网络数据分析模型训练推理算法优化系统架构性能安全隐私市场趋势应用场景技术发展")
+VOCAB_EN = ["Python", " Rust", " GPU", " transformer", " LLM", " API", " cloud", " database", " latency", "\n\n## ", "，", "。"]
+CHUNK_OVERHEAD = 10
+
+
+def make_tokens(rng: random.Random, count: int, interval_ms: float) -> list[tuple[float, str]]:
+    """生成 (到达时间, token) 序列；到达间隔服从指数分布，模拟模型输出速度的波动"""
+    tokens = []
+    now = 0.0
+    for _ in range(count):
+        now += rng.expovariate(1000 / interval_ms)
+        if rng.random() < 0.7:
+            text = "".join(rng.choice(VOCAB_CN) for _ in range(rng.randint(1, 3)))
+        else:
+            text = rng.choice(VOCAB_EN)
+        tokens.append((now, text))
+    return tokens
+
+
+def run_legacy(tokens) -> list[str]:
+    return [f"data: {json.dumps({'type': 'token', 'content': text}, ensure_ascii=False)}\n\n" for _, text in tokens]
+
+
+def run_per_token(tokens) -> list[str]:
+    return [sse.token_frame(text) for _, text in tokens]
+
+
+def run_coalesced(tokens, window_ms: float, max_bytes: int) -> list[str]:
+    clock = [0.0]
+    coalescer = TokenCoalescer(window_ms, max_bytes, clock=lambda: clock[0])
+    frames = []
+    for arrived_at, text in tokens:
+        clock[0] = arrived_at
+        frame = coalescer.add(text)
+        if frame:
+            frames.append(frame)
+    frame = coalescer.flush()
+    if frame:
+        frames.append(frame)
+    return frames
+
+
+def measure(name: str, func, streams: list, packet_overhead: int):
+    started = time.process_time()
+    results = [func(tokens) for tokens in streams]
+    cpu_ms = (time.process_time() - started) * 1000 / len(streams)
+    frames = sum(len(result) for result in results) / len(streams)
+    payload = sum(len(frame.encode("utf-8")) for result in results for frame in result) / len(streams)
+    wire = payload + frames * (CHUNK_OVERHEAD + packet_overhead)
+    print(f"{name:<12}{cpu_ms:>12.2f}{frames:>10.0f}{payload / 1024:>14.1f}{wire / 1024:>14.1f}")
+    return results
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    streams = [make_tokens(rng, args.tokens, args.token_interval) for _ in range(args.streams)]
+    print(f"JSON 编码器: {'orjson' if sse.dumps is sse._dumps_orjson else 'json'}，"
+          f"每个流 {args.tokens} 个 token，平均间隔 {args.token_interval}ms，共 {args.streams} 个流")
+    print("模式          CPU/流(ms)   帧数/流   正文KB/流  估算传输KB/流")
+    legacy = measure("legacy", run_legacy, streams, args.packet_overhead)
+    measure("per-token", run_per_token, streams, args.packet_overhead)
+    coalesced = measure("coalesced", lambda tokens: run_coalesced(tokens, args.window, args.max_bytes),
+                        streams, args.packet_overhead)
+
+    # 校验合并后前端拼出的正文不变
+    def text_of(frames):
+        return "".join(json.loads(frame[len("data: "):])["content"] for frame in frames)
+    assert all(text_of(a) == text_of(b) for a, b in zip(legacy, coalesced)), "合并后正文不一致"
+    print("✅ 合并前后正文一致")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SSE token 合并推送基准测试")
+    parser.add_argument("--tokens", type=int, default=5000, help="每个流的 token 数")
+    parser.add_argument("--streams", type=int, default=20, help="模拟的流数")
+    parser.add_argument("--token-interval", type=float, default=20, help="token 平均到达间隔（毫秒）")
+    parser.add_argument("--window", type=float, default=sse.SSE_COALESCE_MS, help="合并窗口（毫秒）")
+    parser.add_argument("--max-bytes", type=int, default=sse.SSE_COALESCE_BYTES, help="单帧最大缓冲字节数")
+    parser.add_argument("--packet-overhead", type=int, default=66, help="每个 TCP 包的协议头字节数")
+    parser.add_argument("--seed", type=int, default=42)
+    main(parser.parse_args())
@@ -0,0 +1,80 @@
+"""
+为已有报告建立全文检索索引（新保存的报告会自动写入索引）：
+- MySQL：在 reports(topic, content) 上创建 ngram 全文索引（大表上耗时较长，建议在低峰期执行）
+- SQLite：重建 FTS5 索引表，并按批写入已有报告
+- memory：进程内索引在首次检索时自动构建，无需执行本脚本
+
+用法：
+    python scripts/build_report_search_index.py
+    python scripts/build_report_search_index.py --batch 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select, text
+
+from config.db_conf import AsyncSessionLocal, engine
+from crud.report_search import FTS_TABLE, count_fts_documents, create_fts_table, create_mysql_fulltext_index
+from models.report import Report
+from utils.report_search import rebuild_fts_index
+
+
+async def build_sqlite_index(batch: int):
+    async with AsyncSessionLocal() as db:
+        await create_fts_table(db)
+        # 清空后重建，保证与 reports 表一致
+        await db.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')"))
+        await db.commit()
+
+    total = 0
+    last_id = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Report.id, Report.topic, Report.content, Report.content_compressed)
+                .where(Report.id > last_id)
+                .order_by(Report.id)
+                .limit(batch)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            total += await rebuild_fts_index(db, rows)
+        last_id = rows[-1].id
+        print(f"已写入 {total} 条报告")
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+        await db.commit()
+        print(f"FTS5 索引重建完成，共 {await count_fts_documents(db)} 条")
+
+
+async def build_mysql_index():
+    async with AsyncSessionLocal() as db:
+        if await create_mysql_fulltext_index(db):
+            print("已创建全文索引")
+        else:
+            print("全文索引已存在，无需创建")
+
+
+async def main(args):
+    start = time.perf_counter()
+    dialect = engine.dialect.name
+    if dialect == "sqlite":
+        await build_sqlite_index(args.batch)
+    elif dialect == "mysql":
+        await build_mysql_index()
+    else:
+        print(f"{dialect} 不支持数据库全文索引，将使用进程内索引")
+    print(f"耗时 {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="报告全文检索索引构建")
+    parser.add_argument("--batch", type=int, default=500, help="SQLite 每批写入的报告数")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,108 @@
+"""
+离线评估本地预分类器：回放 reports.topic 中的历史任务，
+统计与 LLM 分类结果的一致率，以及可节省的分类延迟
+
+用法：
+    python scripts/eval_pre_classifier.py --limit 500
+    python scripts/eval_pre_classifier.py --reference cache   # 只使用已缓存的分类结果，不调用 LLM
+
+注意：线上被本地直接路由的任务不会调用 LLM，也就不会写入分类缓存，cache 模式下这些任务没有参考分类，
+无法发现本地路由的误判；评估误判率请使用默认的 llm 模式
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select
+
+from config.db_conf import AsyncSessionLocal
+from crud.task_type_cache import get_task_type
+from models.report import Report
+from utils.task_classifier import pre_classify, PRE_CLASSIFIER_THRESHOLD
+from utils.task_type_cache import make_task_key, normalize_task
+
+
+async def load_topics(limit: int) -> list[str]:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Report.topic).distinct().order_by(Report.topic).limit(limit)
+        )
+        return [topic for topic in result.scalars().all() if topic]
+
+
+async def reference_label(topic: str, reference: str):
+    """返回 (参考分类, LLM 耗时)；cache 模式下未缓存的任务返回 None"""
+    if reference == "cache":
+        async with AsyncSessionLocal() as db:
+            return await get_task_type(db, make_task_key(normalize_task(topic))), None
+    from nodes.classifier import classify_task_type
+    start = time.perf_counter()
+    label = await classify_task_type(topic)
+    return label, time.perf_counter() - start
+
+
+async def evaluate(limit: int, threshold: float, reference: str):
+    topics = await load_topics(limit)
+    if not topics:
+        print("reports 表中没有可回放的任务")
+        return
+
+    confident = agree = labelled = 0
+    local_seconds = 0.0
+    llm_latencies = []
+    confusion = Counter()
+
+    for topic in topics:
+        start = time.perf_counter()
+        predicted, confidence = pre_classify(topic)
+        local_seconds += time.perf_counter() - start
+
+        label, llm_latency = await reference_label(topic, reference)
+        if llm_latency is not None:
+            llm_latencies.append(llm_latency)
+        if confidence < threshold:
+            continue
+        confident += 1
+        if label is None:
+            continue
+        labelled += 1
+        confusion[(label, predicted)] += 1
+        if label == predicted:
+            agree += 1
+
+    total = len(topics)
+    print(f"回放任务数: {total}，阈值: {threshold}")
+    print(f"本地直接路由: {confident} ({confident / total:.1%})")
+    if labelled:
+        print(f"本地路由与参考分类一致率: {agree}/{labelled} ({agree / labelled:.1%})")
+    if confident > labelled:
+        print(f"[WARN] {confident - labelled} 个本地路由的任务没有参考分类，未参与一致率统计"
+              f"{'（cache 模式下线上本地路由的任务不会写入缓存，请使用 --reference llm）' if reference == 'cache' else ''}")
+    print(f"本地分类平均耗时: {local_seconds / total * 1000:.3f} ms")
+    if llm_latencies:
+        avg_llm = sum(llm_latencies) / len(llm_latencies)
+        print(f"LLM 分类平均耗时: {avg_llm * 1000:.0f} ms")
+        print(f"预计节省分类延迟: {confident * avg_llm:.1f} s（每个本地路由任务约 {avg_llm * 1000:.0f} ms）")
+    if confusion:
+        print("混淆统计 (参考 -> 本地):")
+        for (label, predicted), count in sorted(confusion.items()):
+            print(f"  {label:8} -> {predicted:8} {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地预分类器离线评估")
+    parser.add_argument("--limit", type=int, default=500, help="最多回放的任务数")
+    parser.add_argument("--threshold", type=float, default=PRE_CLASSIFIER_THRESHOLD, help="置信度阈值")
+    parser.add_argument("--reference", choices=["llm", "cache"], default="llm",
+                        help="参考分类来源：llm 实时调用，cache 读取 task_type_cache 表")
+    args = parser.parse_args()
+    asyncio.run(evaluate(args.limit, args.threshold, args.reference))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+压缩已有报告正文（新保存的报告按 REPORT_COMPRESSION 配置自动压缩）：
+- 为 reports 表补建 content_compressed 列
+- 按批将明文正文压缩写入 content_compressed，并清空 content
+- 使用 --decompress 可将压缩的正文还原为明文（回滚）
+
+用法：
+    python scripts/migrate_report_compression.py --method zstd
+    python scripts/migrate_report_compression.py --method zlib --level 9 --batch 200
+    python scripts/migrate_report_compression.py --decompress
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, select, text, update
+
+from config.db_conf import AsyncSessionLocal, engine
+from models.report import Report
+from utils.report_codec import decode_content, encode_content
+
+COLUMN_NAME = "content_compressed"
+
+
+def _existing_columns(conn) -> set:
+    return {column["name"] for column in inspect(conn).get_columns(Report.__tablename__)}
+
+
+async def migrate_schema():
+    async with engine.begin() as conn:
+        if COLUMN_NAME in await conn.run_sync(_existing_columns):
+            print(f"列 {COLUMN_NAME} 已存在，无需迁移")
+            return
+        column_type = Report.__table__.c[COLUMN_NAME].type.compile(dialect=engine.dialect)
+        await conn.execute(text(f"ALTER TABLE {Report.__tablename__} ADD COLUMN {COLUMN_NAME} {column_type}"))
+        print(f"已添加列 {COLUMN_NAME}")
+
+
+async def compress_rows(method: str, level: int, batch: int):
+    """按主键分批压缩明文正文，每批单独提交"""
+    scanned = compressed = raw_bytes = stored_bytes = 0
+    last_id = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Report.id, Report.content)
+                .where(Report.id > last_id, Report.content_compressed.is_(None))
+                .order_by(Report.id)
+                .limit(batch)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            for report_id, content in rows:
+                content = content or ""
+                size = len(content.encode("utf-8"))
+                blob = encode_content(content, method, level)
+                raw_bytes += size
+                stored_bytes += len(blob) if blob else size
+                if blob:
+                    await db.execute(
+                        update(Report).where(Report.id == report_id).values(content="", content_compressed=blob)
+                    )
+                    compressed += 1
+            await db.commit()
+        scanned += len(rows)
+        last_id = rows[-1].id
+        print(f"已处理 {scanned} 条报告，压缩 {compressed} 条")
+    ratio = stored_bytes / raw_bytes if raw_bytes else 1.0
+    print(f"完成：明文 {raw_bytes / 1024:.1f} KB → 存储 {stored_bytes / 1024:.1f} KB（{ratio:.1%}）")
+
+
+async def decompress_rows(batch: int):
+    """按主键分批将压缩正文还原为明文"""
+    restored = 0
+    last_id = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Report.id, Report.content_compressed)
+                .where(Report.id > last_id, Report.content_compressed.is_not(None))
+                .order_by(Report.id)
+                .limit(batch)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            for report_id, blob in rows:
+                await db.execute(
+                    update(Report).where(Report.id == report_id)
+                    .values(content=decode_content(blob), content_compressed=None)
+                )
+            await db.commit()
+        restored += len(rows)
+        last_id = rows[-1].id
+        print(f"已还原 {restored} 条报告")
+    print(f"完成，共还原 {restored} 条")
+
+
+async def migrate(args):
+    await migrate_schema()
+    if args.decompress:
+        await decompress_rows(args.batch)
+    else:
+        await compress_rows(args.method, args.level, args.batch)
+    # 大量更新后表空间不会自动收缩，MySQL 可执行 OPTIMIZE TABLE reports 回收空间
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="reports 表正文压缩迁移")
+    parser.add_argument("--method", choices=["zlib", "zstd"], default="zstd", help="压缩方式")
+    parser.add_argument("--level", type=int, default=None, help="压缩级别，默认使用 REPORT_COMPRESSION_LEVEL")
+    parser.add_argument("--batch", type=int, default=500, help="每批处理的报告数")
+    parser.add_argument("--decompress", action="store_true", help="将压缩的正文还原为明文")
+    asyncio.run(migrate(parser.parse_args()))
@@ -0,0 +1,96 @@
+"""
+为已有数据库的 reports 表补建历史分页和报告复用所需的列和索引（新建的库由 init_db 自动创建）：
+- content_length / preview / task_type / topic_key / content_compressed / write_id 列，并按批回填已有报告
+- (user_id, created_at) 复合索引、topic_key 索引、created_at 索引、write_id 唯一索引
+
+用法：
+    python scripts/migrate_report_history.py
+    python scripts/migrate_report_history.py --batch 500
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import and_, inspect, or_, select, text, update
+
+from config.db_conf import AsyncSessionLocal, engine
+from crud.report import make_preview, make_topic_key, report_content
+from models.report import Report
+
+INDEX_NAMES = ["ix_reports_user_id_created_at", "ix_reports_topic_key", "ix_reports_created_at", "ix_reports_write_id"]
+NEW_COLUMNS = ["content_length", "preview", "task_type", "topic_key", "content_compressed", "write_id"]
+
+
+def _existing_schema(conn) -> tuple[set, set]:
+    inspector = inspect(conn)
+    columns = {column["name"] for column in inspector.get_columns(Report.__tablename__)}
+    indexes = {index["name"] for index in inspector.get_indexes(Report.__tablename__)}
+    return columns, indexes
+
+
+async def migrate_schema():
+    async with engine.begin() as conn:
+        columns, indexes = await conn.run_sync(_existing_schema)
+        for name in NEW_COLUMNS:
+            if name in columns:
+                print(f"列 {name} 已存在，无需迁移")
+                continue
+            column_type = Report.__table__.c[name].type.compile(dialect=engine.dialect)
+            await conn.execute(text(f"ALTER TABLE {Report.__tablename__} ADD COLUMN {name} {column_type}"))
+            print(f"已添加列 {name}")
+        for index_name in INDEX_NAMES:
+            if index_name in indexes:
+                print(f"索引 {index_name} 已存在，无需迁移")
+                continue
+            index = next(index for index in Report.__table__.indexes if index.name == index_name)
+            await conn.run_sync(index.create)
+            print(f"已创建索引 {index_name}")
+
+
+async def backfill(batch: int):
+    """按主键分批回填摘要列和标题键，每批单独提交"""
+    total = 0
+    last_id = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Report.id, Report.topic, Report.task_type, Report.content, Report.content_compressed)
+                .where(Report.id > last_id, or_(
+                    Report.preview.is_(None),
+                    and_(Report.topic_key.is_(None), Report.task_type.is_not(None))
+                ))
+                .order_by(Report.id)
+                .limit(batch)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            for row in rows:
+                content = report_content(row)
+                await db.execute(
+                    update(Report).where(Report.id == row.id)
+                    .values(
+                        content_length=len(content),
+                        preview=make_preview(content),
+                        topic_key=make_topic_key(row.topic or "", row.task_type)
+                    )
+                )
+            await db.commit()
+        total += len(rows)
+        last_id = rows[-1].id
+        print(f"已回填 {total} 条报告")
+    print(f"回填完成，共 {total} 条")
+
+
+async def migrate(batch: int):
+    await migrate_schema()
+    await backfill(batch)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="reports 表历史分页迁移")
+    parser.add_argument("--batch", type=int, default=1000, help="每批回填的报告数")
+    asyncio.run(migrate(parser.parse_args().batch))
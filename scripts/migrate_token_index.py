@@ -0,0 +1,39 @@
+"""
+为已有数据库的 tokens 表补建索引（token 唯一索引、expires_at 索引；新建的库由 init_db 自动创建）
+
+用法：
+    python scripts/migrate_token_index.py
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect
+
+from config.db_conf import engine
+from models.users import Token
+
+INDEX_NAMES = ["ix_tokens_token", "ix_tokens_expires_at"]
+
+
+def _existing_indexes(conn) -> set:
+    return {index["name"] for index in inspect(conn).get_indexes(Token.__tablename__)}
+
+
+async def migrate():
+    async with engine.begin() as conn:
+        existing = await conn.run_sync(_existing_indexes)
+        for index_name in INDEX_NAMES:
+            if index_name in existing:
+                print(f"索引 {index_name} 已存在，无需迁移")
+                continue
+            index = next(index for index in Token.__table__.indexes if index.name == index_name)
+            # 若存在重复 token，唯一索引会创建失败，需要先清理重复数据
+            await conn.run_sync(index.create)
+            print(f"已创建索引 {index_name}")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
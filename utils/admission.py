@@ -0,0 +1,166 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Optional
+
+import dotenv
+
+from utils import metrics
+
+dotenv.load_dotenv()
+
+# 同时执行的工作流总数上限
+WORKFLOW_MAX_CONCURRENCY = int(os.getenv("WORKFLOW_MAX_CONCURRENCY", "8"))
+# 每个用户同时执行的工作流上限
+WORKFLOW_MAX_PER_USER = int(os.getenv("WORKFLOW_MAX_PER_USER", "2"))
+# 排队总数上限及每个用户的排队上限，超过时直接拒绝（429）
+WORKFLOW_MAX_QUEUE = int(os.getenv("WORKFLOW_MAX_QUEUE", "100"))
+WORKFLOW_MAX_QUEUE_PER_USER = int(os.getenv("WORKFLOW_MAX_QUEUE_PER_USER", "10"))
+# 排队期间推送排队位置的检查间隔（秒）
+WORKFLOW_QUEUE_STATUS_INTERVAL = float(os.getenv("WORKFLOW_QUEUE_STATUS_INTERVAL", "2"))
+
+
+class AdmissionRejected(Exception):
+    """排队已满"""
+
+
+class AdmissionTicket:
+    """一次工作流运行的准入凭证：排队等待执行名额，运行结束后调用 release 归还"""
+
+    def __init__(self, controller: "AdmissionController", user_id: int):
+        self.controller = controller
+        self.user_id = user_id
+        self.enqueued_at = time.perf_counter()
+        self.released = False
+        self._future = asyncio.get_running_loop().create_future()
+
+    @property
+    def granted(self) -> bool:
+        return self._future.done() and not self._future.cancelled()
+
+    def position(self) -> int:
+        """排队位置（1 表示下一个执行），已获得名额时为 0"""
+        return 0 if self.granted else self.controller.position(self)
+
+    async def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待名额，超时返回 False（仍在排队中）"""
+        try:
+            await asyncio.wait_for(asyncio.shield(self._future), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def release(self):
+        """归还名额或退出排队，可重复调用"""
+        self.controller.release(self)
+
+
+class AdmissionController:
+    """
+    工作流准入控制：限制总并发和每个用户的并发，超出的请求进入公平队列；
+    各用户轮流获得名额，同一用户的请求按先后顺序执行，避免单个用户的大量请求占满全部名额
+    """
+
+    def __init__(self, max_concurrency: int = WORKFLOW_MAX_CONCURRENCY, max_per_user: int = WORKFLOW_MAX_PER_USER,
+                 max_queue: int = WORKFLOW_MAX_QUEUE, max_queue_per_user: int = WORKFLOW_MAX_QUEUE_PER_USER):
+        self.max_concurrency = max_concurrency
+        self.max_per_user = max_per_user
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        # user_id -> 排队中的凭证；字典顺序即轮转顺序，用户获得名额后移到末尾
+        self._waiting: dict[int, deque[AdmissionTicket]] = {}
+        self._active: dict[int, int] = {}
+        self._active_total = 0
+        self._queued = 0
+
+    def enqueue(self, user_id: int, enforce_limit: bool = True) -> AdmissionTicket:
+        """
+        申请执行名额，有空闲名额时立即获得，否则进入排队
+
+        Args:
+            enforce_limit: 为 False 时不检查排队上限（调用方自身已限制并发，如后台任务）
+
+        Raises:
+            AdmissionRejected: 排队已满
+        """
+        if enforce_limit and (
+            self._queued >= self.max_queue
+            or len(self._waiting.get(user_id, ())) >= self.max_queue_per_user
+        ):
+            metrics.incr("admission.rejected")
+            raise AdmissionRejected()
+        ticket = AdmissionTicket(self, user_id)
+        self._waiting.setdefault(user_id, deque()).append(ticket)
+        self._queued += 1
+        self._dispatch()
+        return ticket
+
+    def _dispatch(self):
+        """按用户轮转分配空闲名额"""
+        while self._active_total < self.max_concurrency and self._waiting:
+            for user_id, tickets in self._waiting.items():
+                if self._active.get(user_id, 0) < self.max_per_user:
+                    break
+            else:
+                return  # 排队的用户都已达到个人并发上限
+            ticket = tickets.popleft()
+            # 获得名额的用户移到轮转末尾
+            del self._waiting[user_id]
+            if tickets:
+                self._waiting[user_id] = tickets
+            self._queued -= 1
+            self._active[user_id] = self._active.get(user_id, 0) + 1
+            self._active_total += 1
+            ticket._future.set_result(None)
+            metrics.incr("admission.admitted")
+            metrics.observe("admission.queue_wait_ms", (time.perf_counter() - ticket.enqueued_at) * 1000)
+
+    def position(self, ticket: AdmissionTicket) -> int:
+        """按轮转顺序估算排在该凭证之前的请求数（不考虑个人并发上限造成的跳过）"""
+        tickets = self._waiting.get(ticket.user_id)
+        if not tickets or ticket not in tickets:
+            return 0
+        rank = tickets.index(ticket)
+        ahead = 0
+        before_self = True
+        for user_id, others in self._waiting.items():
+            if user_id == ticket.user_id:
+                before_self = False
+            # 前 rank 轮中每个用户各执行一个，本轮中轮转顺序在前的用户再执行一个
+            ahead += min(len(others), rank)
+            if before_self and len(others) > rank:
+                ahead += 1
+        return ahead + 1
+
+    def release(self, ticket: AdmissionTicket):
+        if ticket.released:
+            return
+        ticket.released = True
+        if ticket.granted:
+            self._active[ticket.user_id] -= 1
+            if not self._active[ticket.user_id]:
+                del self._active[ticket.user_id]
+            self._active_total -= 1
+        else:
+            tickets = self._waiting[ticket.user_id]
+            tickets.remove(ticket)
+            if not tickets:
+                del self._waiting[ticket.user_id]
+            self._queued -= 1
+            ticket._future.cancel()
+            metrics.incr("admission.abandoned")
+        self._dispatch()
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active_total,
+            "queued": self._queued,
+            "max_concurrency": self.max_concurrency,
+            "max_per_user": self.max_per_user,
+            "max_queue": self.max_queue,
+            "queued_users": len(self._waiting),
+        }
+
+
+admission = AdmissionController()
@@ -1,28 +1,40 @@
-from langchain_core.tools import tool
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.tools import StructuredTool
 from zai import ZhipuAiClient
 import os
 import dotenv
+from utils import metrics
+from utils.search_cache import make_search_key, search_cache
 dotenv.load_dotenv()
 
 client = ZhipuAiClient(api_key=os.getenv("zhipu-api-key"))
 
+# zai SDK 只提供同步客户端，异步调用时放到独立的有界线程池中执行，
+# 避免搜索请求占满事件循环默认线程池
+SEARCH_MAX_WORKERS = int(os.getenv("SEARCH_MAX_WORKERS", "16"))
+_search_executor = ThreadPoolExecutor(max_workers=SEARCH_MAX_WORKERS, thread_name_prefix="web-search")
 
-@tool
-def tavily_search(query: str) -> list[str]:
+# 搜索参数，同时参与缓存键的计算
+SEARCH_ENGINE = os.getenv("SEARCH_ENGINE", "search_std")
+SEARCH_COUNT = int(os.getenv("SEARCH_COUNT", "10"))  # 返回结果的条数，范围1-50，默认10
+SEARCH_RECENCY_FILTER = os.getenv("SEARCH_RECENCY_FILTER", "noLimit")  # 搜索指定日期范围内的内容
+
+
+def _search_upstream(query: str) -> list[str]:
     """
-    使用数据进行搜索。
-    在生产环境中，应在此处实现真实的搜索逻辑。
+    调用智谱搜索接口，失败时返回空列表
     """
     try:
         print(f"[DEBUG] 开始搜索: {query}")
         print(f"[DEBUG] API Key: {os.getenv('zhipu-api-key')[:10]}...")
-        
+
         response = client.web_search.web_search(
-            search_engine="search_std",
+            search_engine=SEARCH_ENGINE,
             search_query=query,
-            count=10,  # 返回结果的条数，范围1-50，默认10
+            count=SEARCH_COUNT,
             search_domain_filter=None,  # 只访问指定域名的内容
-            search_recency_filter="noLimit",  # 搜索指定日期范围内的内容
+            search_recency_filter=SEARCH_RECENCY_FILTER,
             content_size="low"  # 控制网页摘要的字数，默认medium
         )
         result = []
@@ -35,3 +47,45 @@ def tavily_search(query: str) -> list[str]:
         import traceback
         traceback.print_exc()
         return []
+
+
+def _search_key(query: str) -> str:
+    return make_search_key(query, SEARCH_ENGINE, SEARCH_COUNT, SEARCH_RECENCY_FILTER)
+
+
+def web_search(query: str) -> list[str]:
+    """
+    使用数据进行搜索。
+    同步版本只使用内存缓存，不做请求合并
+    """
+    key = _search_key(query)
+    results = search_cache.get(key)
+    if results is not None:
+        metrics.incr("search_cache.memory_hits")
+        return list(results)
+    metrics.incr("search_cache.misses")
+    metrics.incr("search_cache.upstream_calls")
+    results = _search_upstream(query)
+    search_cache.set(key, results)
+    return results
+
+
+async def aweb_search(query: str) -> list[str]:
+    """
+    web_search 的异步版本，不阻塞事件循环；
+    命中缓存时直接返回，相同查询同时到达时只发起一次上游请求
+    """
+    loop = asyncio.get_running_loop()
+
+    async def fetch():
+        return await loop.run_in_executor(_search_executor, _search_upstream, query)
+
+    return await search_cache.get_or_fetch(_search_key(query), query, fetch)
+
+
+tavily_search = StructuredTool.from_function(
+    func=web_search,
+    coroutine=aweb_search,
+    name="tavily_search",
+    description="使用数据进行搜索。",
+)
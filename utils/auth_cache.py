@@ -0,0 +1,56 @@
+import os
+from datetime import datetime
+from typing import Optional
+
+import dotenv
+
+from utils import metrics
+from utils.cache import TTLCache
+
+dotenv.load_dotenv()
+
+# token → 用户信息的进程内缓存，命中时鉴权不再访问数据库
+AUTH_CACHE_ENABLED = os.getenv("AUTH_CACHE_ENABLED", "true").lower() == "true"
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+
+_auth_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+
+
+def get_cached_user(token: str) -> Optional[dict]:
+    """
+    读取缓存的用户信息，token 已过期时删除缓存并视为未命中
+    """
+    if not AUTH_CACHE_ENABLED:
+        return None
+    cached = _auth_cache.get(token)
+    if cached is None or cached["expires_at"] < datetime.now():
+        if cached is not None:
+            _auth_cache.delete(token)
+        metrics.incr("auth_cache.misses")
+        return None
+    metrics.incr("auth_cache.hits")
+    return cached
+
+
+def cache_user(token: str, user_id: int, username: str, expires_at: datetime):
+    """缓存 token 对应的用户，缓存时间不超过 token 剩余有效期"""
+    if not AUTH_CACHE_ENABLED:
+        return
+    remaining = (expires_at - datetime.now()).total_seconds()
+    if remaining <= 0:
+        return
+    _auth_cache.set(
+        token,
+        {"user_id": user_id, "username": username, "expires_at": expires_at},
+        ttl=min(AUTH_CACHE_TTL, remaining),
+    )
+
+
+def invalidate_token(token: str):
+    """token 失效（如注销）时清除缓存"""
+    _auth_cache.delete(token)
+
+
+def clear_auth_cache():
+    _auth_cache.clear()
@@ -0,0 +1,140 @@
+import hashlib
+import re
+from collections import Counter
+
+import numpy as np
+
+from utils.cache import TTLCache
+from utils.text_dedup import text_hash
+
+_CJK_PATTERN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+")
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+_SENTENCE_PATTERN = re.compile(r"(?<=[。！？!?；;\n])")
+
+# 按搜索结果缓存已构建的索引，同一次运行的多个节点、多轮修订共用
+_index_cache = TTLCache(maxsize=64, ttl=1800)
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    分词：英文/数字按单词切分，中日韩文本按相邻二元组切分
+    """
+    lowered = text.lower()
+    tokens = _WORD_PATTERN.findall(lowered)
+    for run in _CJK_PATTERN.findall(lowered):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def chunk_text(text: str, max_chars: int = 400) -> list[str]:
+    """按句子边界将长文本切分为不超过 max_chars 的片段"""
+    if len(text) <= max_chars:
+        return [text]
+    chunks = []
+    current = ""
+    for sentence in _SENTENCE_PATTERN.split(text):
+        if not sentence:
+            continue
+        if current and len(current) + len(sentence) > max_chars:
+            chunks.append(current)
+            current = ""
+        # 单句超长时硬切
+        while len(sentence) > max_chars:
+            chunks.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        current += sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class BM25Index:
+    """
+    进程内 BM25 索引，倒排表以 NumPy 数组存储，查询时向量化计算得分
+    """
+
+    def __init__(self, documents: list[str], k1: float = 1.5, b: float = 0.75):
+        self.documents = list(documents)
+        self.k1 = k1
+        self.b = b
+        self.vocab: dict[str, int] = {}
+
+        doc_ids, term_ids, tfs = [], [], []
+        doc_lengths = np.zeros(len(self.documents), dtype=np.float64)
+        for doc_id, document in enumerate(self.documents):
+            tokens = tokenize(document)
+            doc_lengths[doc_id] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                doc_ids.append(doc_id)
+                term_ids.append(self.vocab.setdefault(term, len(self.vocab)))
+                tfs.append(tf)
+
+        doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        term_ids = np.asarray(term_ids, dtype=np.int32)
+        tfs = np.asarray(tfs, dtype=np.float64)
+
+        n_docs = len(self.documents)
+        avgdl = float(doc_lengths.mean()) if n_docs else 0.0
+        avgdl = avgdl or 1.0
+        df = np.bincount(term_ids, minlength=len(self.vocab)).astype(np.float64)
+        idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+        # 预先计算每个 (词, 文档) 对的得分贡献，查询时只需求和
+        norm = self.k1 * (1 - self.b + self.b * doc_lengths[doc_ids] / avgdl)
+        contributions = idf[term_ids] * tfs * (self.k1 + 1) / (tfs + norm)
+
+        # 按词排序，构建 CSR 形式的倒排表
+        order = np.argsort(term_ids, kind="stable")
+        self._postings_docs = doc_ids[order]
+        self._postings_scores = contributions[order]
+        self._indptr = np.concatenate(([0], np.cumsum(np.bincount(term_ids, minlength=len(self.vocab)))))
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def scores(self, query: str) -> np.ndarray:
+        """计算查询对所有文档的 BM25 得分"""
+        query_terms = Counter(term for term in tokenize(query) if term in self.vocab)
+        if not query_terms or not self.documents:
+            return np.zeros(len(self.documents))
+        docs, weights = [], []
+        for term, count in query_terms.items():
+            term_id = self.vocab[term]
+            start, end = self._indptr[term_id], self._indptr[term_id + 1]
+            docs.append(self._postings_docs[start:end])
+            weights.append(self._postings_scores[start:end] * count)
+        return np.bincount(np.concatenate(docs), weights=np.concatenate(weights), minlength=len(self.documents))
+
+    def rank(self, query: str) -> list[int]:
+        """按得分从高到低返回所有文档下标，得分相同时保持原有顺序"""
+        return np.argsort(-self.scores(query), kind="stable").tolist()
+
+    def search(self, query: str, top_k: int = 8) -> list[str]:
+        """返回得分最高的 top_k 个文档；查询与所有文档都不相关时按原有顺序返回"""
+        scores = self.scores(query)
+        ranked = np.argsort(-scores, kind="stable")[:top_k]
+        hits = [self.documents[i] for i in ranked if scores[i] > 0]
+        return hits or self.documents[:top_k]
+
+
+def build_search_index(search_results: list[str], chunk_chars: int = 400) -> BM25Index:
+    """将搜索结果切块、去掉完全重复的片段后建立索引"""
+    chunks = {}
+    for result in search_results:
+        for chunk in chunk_text(result, chunk_chars):
+            chunks.setdefault(text_hash(chunk), chunk)
+    return BM25Index(list(chunks.values()))
+
+
+def get_search_index(search_results: list[str], chunk_chars: int = 400) -> BM25Index:
+    """获取搜索结果对应的索引，已构建过时直接复用"""
+    digest = hashlib.sha256("\x00".join(search_results).encode("utf-8")).hexdigest()
+    key = (digest, chunk_chars)
+    index = _index_cache.get(key)
+    if index is None:
+        index = build_search_index(search_results, chunk_chars)
+        _index_cache.set(key, index)
+    return index
@@ -62,6 +62,20 @@ def clean_article_output(article: str) -> str:
     return article
 
 
+def has_unclosed_code_fence(article: str) -> bool:
+    """
+    检查文章中是否存在未闭合的代码块
+    
+    Args:
+        article: 文章内容
+        
+    Returns:
+        ``` 围栏行数为奇数时返回 True
+    """
+    fences = re.findall(r'^\s*```', article, flags=re.MULTILINE)
+    return len(fences) % 2 == 1
+
+
 def clean_search_query(query: str) -> str:
     """
     清理搜索查询，提取核心关键词
@@ -0,0 +1,185 @@
+import asyncio
+import math
+import os
+import re
+from typing import Optional
+
+import dotenv
+
+from utils import metrics
+from utils.bm25_index import BM25Index, get_search_index
+from utils.text_dedup import dedupe_texts
+
+dotenv.load_dotenv()
+
+# 本地分词器（tiktoken 编码名），加载失败时退化为按字符估算
+CONTEXT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER", "cl100k_base")
+
+# 各节点参考资料的 token 预算
+CONTEXT_BUDGETS = {
+    "writer": int(os.getenv("CONTEXT_BUDGET_WRITER", "3000")),
+    "reviewer": int(os.getenv("CONTEXT_BUDGET_REVIEWER", "1500")),
+    "code_generator": int(os.getenv("CONTEXT_BUDGET_CODE_GENERATOR", "2000")),
+    "data_analyst": int(os.getenv("CONTEXT_BUDGET_DATA_ANALYST", "3000")),
+}
+
+# 参考资料选取方式：bm25（按节点查询从索引中检索片段）| static（使用预先打包的结果）
+CONTEXT_RETRIEVAL = os.getenv("CONTEXT_RETRIEVAL", "bm25")
+CONTEXT_TOP_K = int(os.getenv("CONTEXT_TOP_K", "8"))
+CONTEXT_CHUNK_CHARS = int(os.getenv("CONTEXT_CHUNK_CHARS", "400"))
+
+# 剩余预算不足该值时不再截断补入下一段
+MIN_PASSAGE_TOKENS = 50
+
+_CJK_PATTERN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]")
+
+_encoder = None
+_encoder_loaded = False
+
+
+def load_tokenizer():
+    """
+    加载 tiktoken 分词器；本地没有缓存编码文件时会联网下载，可能阻塞较长时间，
+    应用中通过 preload_tokenizer 在启动时放到线程中执行
+    """
+    global _encoder, _encoder_loaded
+    if _encoder_loaded:
+        return _encoder
+    try:
+        import tiktoken
+        _encoder = tiktoken.get_encoding(CONTEXT_TOKENIZER)
+    except ImportError:
+        print("[WARN] 未安装 tiktoken，token 数改用字符估算")
+    except Exception as exc:
+        print(f"[WARN] 加载分词器 {CONTEXT_TOKENIZER} 失败，改用字符估算: {type(exc).__name__}")
+    _encoder_loaded = True
+    return _encoder
+
+
+async def preload_tokenizer():
+    """应用启动时在线程中加载分词器，不阻塞事件循环"""
+    await asyncio.to_thread(load_tokenizer)
+
+
+def _get_encoder():
+    """返回已加载的分词器；尚未加载时按字符估算，不在节点中（事件循环上）同步加载"""
+    return _encoder
+
+
+def count_tokens(text: str) -> int:
+    """统计文本 token 数"""
+    encoder = _get_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    # 估算：中日韩字符按 1 token，其余按 4 字符 1 token
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """将文本截断到不超过 max_tokens 个 token"""
+    if max_tokens <= 0:
+        return ""
+    encoder = _get_encoder()
+    if encoder is not None:
+        tokens = encoder.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else encoder.decode(tokens[:max_tokens])
+    if count_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if count_tokens(text[:mid]) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low]
+
+
+def rank_passages(passages: list[str], query: str) -> list[str]:
+    """按与查询的 BM25 相关度排序，得分相同时保持搜索引擎原有顺序"""
+    if not query or not passages:
+        return list(passages)
+    index = BM25Index(passages)
+    return [passages[i] for i in index.rank(query)]
+
+
+def prepare_passages(search_results: list[str], query: str = "") -> list[str]:
+    """去除重复的搜索结果并按与查询的相关度排序"""
+    return rank_passages(dedupe_texts(search_results), query)
+
+
+def pack_passages(passages: list[str], budget: int) -> str:
+    """按顺序拼接段落，直到用完 token 预算；0 或负数表示不限制"""
+    if budget <= 0:
+        return "\n".join(passages)
+
+    packed = []
+    used = 0
+    for passage in passages:
+        tokens = count_tokens(passage) + 1  # 分隔换行
+        if used + tokens <= budget:
+            packed.append(passage)
+            used += tokens
+            continue
+        remaining = budget - used
+        if remaining >= MIN_PASSAGE_TOKENS:
+            packed.append(truncate_to_tokens(passage, remaining - 1))
+        break
+    return "\n".join(packed)
+
+
+def pack_context(search_results: list[str], budget: int, query: str = "") -> str:
+    """
+    将搜索结果去重、排序并截断到 token 预算内
+
+    Args:
+        search_results: 原始搜索结果
+        budget: token 预算，0 或负数表示不限制
+        query: 用于排序的查询（通常是任务描述）
+
+    Returns:
+        拼接后的参考资料文本
+    """
+    return pack_passages(prepare_passages(search_results, query), budget)
+
+
+def pack_node_contexts(search_results: list[str], task: str) -> dict:
+    """
+    为每个节点按各自预算打包参考资料，去重和排序只做一次；
+    bm25 模式下各节点都按自己的查询检索，用不到预先打包的结果，只预先构建检索索引供后续节点复用
+    """
+    if CONTEXT_RETRIEVAL == "bm25":
+        get_search_index(search_results, CONTEXT_CHUNK_CHARS)
+        return {}
+
+    passages = prepare_passages(search_results, task)
+    contexts = {}
+    for node_name, budget in CONTEXT_BUDGETS.items():
+        contexts[node_name] = pack_passages(passages, budget)
+        metrics.observe(f"context_packer.{node_name}_tokens", count_tokens(contexts[node_name]))
+    metrics.observe("context_packer.raw_tokens", count_tokens("\n".join(search_results)))
+    return contexts
+
+
+def retrieve_context(search_results: list[str], query: str, budget: int, top_k: int = CONTEXT_TOP_K) -> str:
+    """从搜索结果索引中检索与查询最相关的 top_k 个片段，并截断到 token 预算内"""
+    index = get_search_index(search_results, CONTEXT_CHUNK_CHARS)
+    return pack_passages(index.search(query, top_k), budget)
+
+
+def get_node_context(state: dict, node_name: str, query: str = "", budget: Optional[int] = None) -> str:
+    """
+    获取节点的参考资料：
+    - bm25 模式且提供了节点查询时，按查询从索引中检索相关片段
+    - 否则读取已打包的结果；状态中没有时（如单独调用节点）现场打包
+    """
+    if budget is None:
+        budget = CONTEXT_BUDGETS.get(node_name, 0)
+    if CONTEXT_RETRIEVAL == "bm25" and query:
+        return retrieve_context(state.get("search_results", []), query, budget)
+
+    packed = state.get("packed_context") or {}
+    if node_name in packed:
+        return packed[node_name]
+    return pack_context(state.get("search_results", []), budget, state.get("task", ""))
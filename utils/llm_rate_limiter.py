@@ -0,0 +1,230 @@
+import asyncio
+import email.utils
+import heapq
+import itertools
+import os
+import random
+import time
+from typing import Optional
+
+import dotenv
+import openai
+from langgraph.config import get_config
+
+from utils import metrics
+
+dotenv.load_dotenv()
+
+# 每分钟请求数和 token 数上限，0 表示不限制
+LLM_RPM = float(os.getenv("LLM_RPM", "120"))
+LLM_TPM = float(os.getenv("LLM_TPM", "0"))
+# 估算 token 数：提示词按字符数折算，输出先按固定值预留，调用结束后按实际用量修正
+LLM_CHARS_PER_TOKEN = float(os.getenv("LLM_CHARS_PER_TOKEN", "2"))
+LLM_OUTPUT_TOKEN_ESTIMATE = int(os.getenv("LLM_OUTPUT_TOKEN_ESTIMATE", "1000"))
+# 限流、超时、5xx 等可重试错误的最大重试次数和退避间隔（秒）
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_RETRY_BASE = float(os.getenv("LLM_RETRY_BASE", "1"))
+LLM_RETRY_MAX = float(os.getenv("LLM_RETRY_MAX", "30"))
+# 收到 429 后速率减半，之后每次成功调用恢复该比例，直到配置的速率
+LLM_RATE_RECOVERY = float(os.getenv("LLM_RATE_RECOVERY", "0.05"))
+LLM_MIN_RATE_FACTOR = 0.1
+
+# 节点优先级，数值越小越优先；交互式的写作输出优先于后台的分类、审核调用
+LLM_NODE_PRIORITIES = {
+    "writer": 0,
+    "code_generator": 1,
+    "data_analyst": 1,
+    "reviewer": 2,
+    "classifier": 3,
+}
+for item in filter(None, os.getenv("LLM_NODE_PRIORITIES", "").split(",")):
+    node, _, value = item.partition(":")
+    LLM_NODE_PRIORITIES[node.strip()] = int(value)
+LLM_DEFAULT_PRIORITY = 2
+
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)
+
+
+class TokenBucket:
+    """按分钟速率匀速补充的令牌桶，容量为一分钟的配额；速率为 0 时不限制"""
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.level = per_minute
+        self.updated_at = time.monotonic()
+
+    @property
+    def limited(self) -> bool:
+        return self.per_minute > 0
+
+    def _refill(self, factor: float):
+        now = time.monotonic()
+        self.level = min(self.per_minute, self.level + (now - self.updated_at) * self.per_minute * factor / 60)
+        self.updated_at = now
+
+    def wait_time(self, amount: float, factor: float) -> float:
+        """还需等待多久（秒）才能取出 amount 个令牌"""
+        if not self.limited:
+            return 0.0
+        self._refill(factor)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60 / (self.per_minute * factor)
+
+    def consume(self, amount: float):
+        if self.limited:
+            self.level -= amount
+
+
+class LLMRateLimiter:
+    """
+    所有节点共用的 LLM 调用限流器：请求数和 token 数两个令牌桶，等待的调用按优先级排队；
+    收到 429 时暂停所有调用至 Retry-After 指定的时间，并临时降低速率，成功调用后逐步恢复
+    """
+
+    def __init__(self, rpm: float = LLM_RPM, tpm: float = LLM_TPM):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.rate_factor = 1.0
+        self.paused_until = 0.0
+        # 等待中的调用：[优先级, 序号]，序号保证同优先级先到先得
+        self._waiters: list[list[int]] = []
+        self._counter = itertools.count()
+        self._changed: Optional[asyncio.Condition] = None
+
+    def count_tokens(self, text_chars: int) -> int:
+        """按字符数估算 token 数"""
+        return int(text_chars / LLM_CHARS_PER_TOKEN)
+
+    def estimate_tokens(self, prompt_chars: int) -> int:
+        """调用前预留的 token 数：提示词估算值加上输出预留值"""
+        return self.count_tokens(prompt_chars) + LLM_OUTPUT_TOKEN_ESTIMATE
+
+    def _wait_time(self, tokens: int) -> float:
+        return max(
+            self.paused_until - time.monotonic(),
+            self.requests.wait_time(1, self.rate_factor),
+            self.tokens.wait_time(tokens, self.rate_factor),
+        )
+
+    async def acquire(self, tokens: int, priority: int = LLM_DEFAULT_PRIORITY) -> int:
+        """
+        等待配额并预留 tokens 个 token，返回实际预留的数量（调用结束后用 adjust_tokens 修正）
+        """
+        if self.tokens.limited:
+            tokens = min(tokens, int(self.tokens.per_minute))
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        entry = [priority, next(self._counter)]
+        started_at = time.perf_counter()
+        async with self._changed:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    timeout = None
+                    if self._waiters[0] is entry:
+                        timeout = self._wait_time(tokens)
+                        if timeout <= 0:
+                            break
+                    try:
+                        await asyncio.wait_for(self._changed.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                # 无论取得配额还是被取消，都移出等待队列并唤醒下一个
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._changed.notify_all()
+            self.requests.consume(1)
+            self.tokens.consume(tokens)
+
+        waited_ms = (time.perf_counter() - started_at) * 1000
+        if waited_ms >= 1:
+            metrics.incr("llm.throttled")
+            metrics.observe("llm.throttle_wait_ms", waited_ms)
+        return tokens
+
+    def adjust_tokens(self, delta: int):
+        """按实际用量修正预留的 token 数（正数补扣，负数退还）"""
+        self.tokens.consume(delta)
+
+    def penalize(self, pause: float):
+        """收到 429：暂停所有调用 pause 秒，并将速率减半"""
+        self.paused_until = max(self.paused_until, time.monotonic() + pause)
+        self.rate_factor = max(LLM_MIN_RATE_FACTOR, self.rate_factor / 2)
+
+    def reward(self):
+        self.rate_factor = min(1.0, self.rate_factor + LLM_RATE_RECOVERY)
+
+    def stats(self) -> dict:
+        return {
+            "rpm": self.requests.per_minute,
+            "tpm": self.tokens.per_minute,
+            "rate_factor": round(self.rate_factor, 3),
+            "waiting": len(self._waiters),
+            "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 1),
+        }
+
+
+def node_priority(run_manager=None) -> int:
+    """
+    根据当前 LangGraph 节点名确定优先级：优先取回调元数据，
+    流式调用时回调管理器不会传给模型，改从 LangGraph 当前运行配置中读取
+    """
+    metadata = run_manager.metadata if run_manager is not None else None
+    if not metadata:
+        try:
+            metadata = get_config().get("metadata")
+        except RuntimeError:  # 不在 LangGraph 节点中调用
+            metadata = None
+    node = (metadata or {}).get("langgraph_node")
+    return LLM_NODE_PRIORITIES.get(node, LLM_DEFAULT_PRIORITY)
+
+
+def parse_retry_after(exc: Exception) -> Optional[float]:
+    """从错误响应头读取 Retry-After（秒数或 HTTP 日期），没有时返回 None"""
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_delay(exc: Exception, attempt: int) -> Optional[float]:
+    """
+    判断调用失败后是否重试，返回等待时间（秒）；不可重试或已达到重试上限时返回 None
+    429 优先使用 Retry-After，其他错误按指数退避，均带随机抖动
+    """
+    if not isinstance(exc, RETRYABLE_ERRORS) or attempt >= LLM_MAX_RETRIES:
+        metrics.incr("llm.failures")
+        return None
+    backoff = min(LLM_RETRY_MAX, LLM_RETRY_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+    if isinstance(exc, openai.RateLimitError):
+        metrics.incr("llm.rate_limited")
+        retry_after = parse_retry_after(exc)
+        delay = retry_after + random.uniform(0, LLM_RETRY_BASE) if retry_after is not None else backoff
+        # 其他调用也一起暂停，避免继续触发限流
+        llm_limiter.penalize(delay)
+    else:
+        delay = backoff
+    metrics.incr("llm.retries")
+    print(f"[WARN] LLM 调用失败（第 {attempt + 1} 次），{delay:.1f}s 后重试: {exc}")
+    return delay
+
+
+llm_limiter = LLMRateLimiter()
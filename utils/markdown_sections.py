@@ -0,0 +1,83 @@
+import re
+
+_HEADING_PATTERN = re.compile(r"^#{1,6}\s")
+_FENCE_PATTERN = re.compile(r"^\s*```")
+_EDIT_PATTERN = re.compile(r"<<<SECTION\s+(\d+|NEW)>>>\s*\n(.*?)\n?<<<END>>>", re.DOTALL)
+
+
+def split_sections(markdown: str) -> list[str]:
+    """
+    按标题行将 Markdown 切分为章节，每个章节包含标题行及其正文；
+    第一个标题之前的内容单独作为一个章节，代码块中的 # 不视为标题
+    """
+    sections = []
+    current = []
+    in_fence = False
+    for line in markdown.splitlines(keepends=True):
+        if _FENCE_PATTERN.match(line):
+            in_fence = not in_fence
+        elif not in_fence and _HEADING_PATTERN.match(line) and current:
+            sections.append("".join(current))
+            current = []
+        current.append(line)
+    if current:
+        sections.append("".join(current))
+    return sections
+
+
+def section_title(section: str) -> str:
+    first_line = section.strip().splitlines()[0] if section.strip() else ""
+    return first_line if _HEADING_PATTERN.match(first_line) else "（开头）"
+
+
+def format_numbered_sections(sections: list[str]) -> str:
+    """将章节编号后拼接，供 LLM 引用"""
+    return "\n".join(f"<<<SECTION {i}>>>\n{section.rstrip()}\n<<<END>>>" for i, section in enumerate(sections))
+
+
+def format_outline(sections: list[str]) -> str:
+    return "\n".join(f"{i}. {section_title(section)}" for i, section in enumerate(sections))
+
+
+def parse_section_edits(text: str) -> list[tuple[str, str]]:
+    """
+    解析 LLM 输出的章节修改，返回 [(章节编号或 NEW, 新内容)]
+    """
+    return [(match.group(1), match.group(2).strip("\n")) for match in _EDIT_PATTERN.finditer(text)]
+
+
+def _first_line(text: str) -> str:
+    return text.strip().splitlines()[0].strip() if text.strip() else ""
+
+
+def apply_section_edits(markdown: str, edits: list[tuple[str, str]]) -> tuple[str, list[str]]:
+    """
+    将章节修改应用到原文，编号越界的修改忽略，NEW 追加到末尾
+
+    Returns:
+        (修改后的全文, 实际发生变化的章节内容列表)
+
+    Raises:
+        ValueError: 修改没有以原章节标题开头（NEW 没有以标题开头），回填后会并入上一章节，由调用方整篇重写
+    """
+    sections = split_sections(markdown)
+    changed = []
+    appended = []
+    for target, content in edits:
+        section = content.rstrip("\n") + "\n\n"
+        if target == "NEW":
+            if not _HEADING_PATTERN.match(_first_line(content)):
+                raise ValueError("新增章节缺少标题")
+            appended.append(section)
+            changed.append(content)
+            continue
+        index = int(target)
+        if not 0 <= index < len(sections):
+            continue
+        heading = section_title(sections[index])
+        if heading != "（开头）" and _first_line(content) != heading.strip():
+            raise ValueError(f"章节 {index} 的修改没有以原标题「{heading.strip()}」开头")
+        if sections[index].strip() != content.strip():
+            sections[index] = section
+            changed.append(content)
+    return "".join(sections + appended).rstrip("\n") + "\n", changed
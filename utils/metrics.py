@@ -0,0 +1,40 @@
+from collections import defaultdict
+from typing import Dict
+
+
+# 进程内指标：计数器与耗时/数值观测
+_counters: Dict[str, float] = defaultdict(float)
+_observations: Dict[str, dict] = {}
+
+
+def incr(name: str, value: float = 1):
+    """计数器累加"""
+    _counters[name] += value
+
+
+def observe(name: str, value: float):
+    """记录一次观测值（如耗时），汇总为 count/sum/max"""
+    stat = _observations.get(name)
+    if stat is None:
+        stat = _observations[name] = {"count": 0, "sum": 0.0, "max": 0.0}
+    stat["count"] += 1
+    stat["sum"] += value
+    stat["max"] = max(stat["max"], value)
+
+
+def get_counter(name: str) -> float:
+    return _counters.get(name, 0)
+
+
+def snapshot() -> dict:
+    """导出当前所有指标"""
+    observations = {
+        name: {**stat, "avg": stat["sum"] / stat["count"] if stat["count"] else 0.0}
+        for name, stat in _observations.items()
+    }
+    return {"counters": dict(_counters), "observations": observations}
+
+
+def reset():
+    _counters.clear()
+    _observations.clear()
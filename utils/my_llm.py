@@ -1,12 +1,83 @@
-import os 
+import asyncio
+import os
 import dotenv
 from langchain_openai import ChatOpenAI
 
+from utils.llm_rate_limiter import llm_limiter, node_priority, retry_delay
+
 dotenv.load_dotenv()
 
 
-llm = ChatOpenAI(model=os.getenv("deepseek-model-name"),
-                 api_key=os.getenv("deepseek-api-key"),
-                 base_url=os.getenv("deepseek-api-base"),
-                 temperature=0.5)
+def _prompt_chars(messages) -> int:
+    return sum(len(message.content) if isinstance(message.content, str) else len(str(message.content))
+               for message in messages)
+
+
+def _usage_tokens(message) -> int:
+    usage = getattr(message, "usage_metadata", None)
+    return usage.get("total_tokens", 0) if usage else 0
+
+
+class RateLimitedChatOpenAI(ChatOpenAI):
+    """
+    经过共享限流器的 ChatOpenAI：调用前按节点优先级等待配额，限流、超时和 5xx 错误自动退避重试
+    （客户端自带的重试关闭，统一在这里处理）
+    """
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        priority = node_priority(run_manager)
+        attempt = 0
+        while True:
+            reserved = await llm_limiter.acquire(llm_limiter.estimate_tokens(_prompt_chars(messages)), priority)
+            try:
+                result = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            except Exception as exc:
+                llm_limiter.adjust_tokens(-reserved)
+                delay = retry_delay(exc, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            llm_limiter.reward()
+            message = result.generations[0].message if result.generations else None
+            used = _usage_tokens(message) if message is not None else 0
+            if used:
+                llm_limiter.adjust_tokens(used - reserved)
+            return result
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        priority = node_priority(run_manager)
+        prompt_chars = _prompt_chars(messages)
+        attempt = 0
+        while True:
+            reserved = await llm_limiter.acquire(llm_limiter.estimate_tokens(prompt_chars), priority)
+            output_chars = 0
+            used = 0
+            try:
+                async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                    output_chars += len(chunk.text)
+                    used = _usage_tokens(chunk.message) or used
+                    yield chunk
+            except Exception as exc:
+                # 已经输出过内容时不能重试，否则前端会收到重复内容
+                if output_chars:
+                    raise
+                llm_limiter.adjust_tokens(-reserved)
+                delay = retry_delay(exc, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            llm_limiter.reward()
+            # 流式输出通常不返回用量，按字符数估算
+            llm_limiter.adjust_tokens((used or llm_limiter.count_tokens(prompt_chars + output_chars)) - reserved)
+            return
+
 
+llm = RateLimitedChatOpenAI(model=os.getenv("deepseek-model-name"),
+                            api_key=os.getenv("deepseek-api-key"),
+                            base_url=os.getenv("deepseek-api-base"),
+                            temperature=0.5,
+                            max_retries=0)
@@ -0,0 +1,104 @@
+import json
+import os
+from collections import Counter
+
+import dotenv
+
+from utils import metrics
+from utils.bm25_index import tokenize
+from utils.content_cleaner import has_unclosed_code_fence
+from utils.markdown_sections import split_sections, section_title
+
+dotenv.load_dotenv()
+
+# 是否在调用 Reviewer LLM 之前做本地质量检查
+QUALITY_GATE_ENABLED = os.getenv("QUALITY_GATE_ENABLED", "true").lower() == "true"
+
+# 各任务类型的检查规则：
+# - min_*：低于该值直接退回修改（不调用 LLM）
+# - approve_*：全部达到时直接通过（不调用 LLM）
+# - require_code：是否必须包含代码块
+QUALITY_GATE_RULES = {
+    "standard": {"min_length": 300, "min_headings": 1, "approve_length": 1500, "approve_headings": 4,
+                 "approve_coverage": 0.6, "require_code": False},
+    "code": {"min_length": 200, "min_headings": 1, "approve_length": 1200, "approve_headings": 3,
+             "approve_coverage": 0.5, "require_code": True},
+    "data": {"min_length": 300, "min_headings": 2, "approve_length": 1500, "approve_headings": 4,
+             "approve_coverage": 0.6, "require_code": False},
+}
+# 支持通过 JSON 覆盖部分规则，如 {"code": {"approve_length": 2000}}
+for _task_type, _overrides in json.loads(os.getenv("QUALITY_GATE_RULES", "{}")).items():
+    QUALITY_GATE_RULES.setdefault(_task_type, dict(QUALITY_GATE_RULES["standard"])).update(_overrides)
+
+# 参与覆盖率计算的参考资料高频词数量
+SOURCE_TERMS_TOP_N = 30
+
+
+def source_terms(search_results: list[str], top_n: int = SOURCE_TERMS_TOP_N) -> list[str]:
+    """取在至少两条参考资料中出现过的高频词"""
+    document_frequency = Counter()
+    for result in search_results:
+        document_frequency.update(set(tokenize(result)))
+    return [term for term, df in document_frequency.most_common(top_n) if df >= 2]
+
+
+def source_coverage(draft: str, search_results: list[str]):
+    """草稿覆盖参考资料高频词的比例，参考资料不足时返回 None"""
+    terms = source_terms(search_results)
+    if not terms:
+        return None
+    draft_terms = set(tokenize(draft))
+    return sum(1 for term in terms if term in draft_terms) / len(terms)
+
+
+def evaluate_draft(draft: str, task_type: str, search_results: list[str]) -> dict:
+    """
+    本地检查草稿质量
+
+    Returns:
+        {"decision": "approve" | "reject" | "review", "critique": str, "checks": dict}
+    """
+    rules = QUALITY_GATE_RULES.get(task_type) or QUALITY_GATE_RULES["standard"]
+    headings = [section_title(section) for section in split_sections(draft)]
+    headings = [title for title in headings if title.startswith("#")]
+    coverage = source_coverage(draft, search_results)
+    checks = {
+        "length": len(draft.strip()),
+        "headings": len(headings),
+        "unclosed_fence": has_unclosed_code_fence(draft),
+        "has_code": "```" in draft,
+        "coverage": round(coverage, 3) if coverage is not None else None,
+    }
+
+    problems = []
+    if checks["length"] < rules["min_length"]:
+        problems.append(f"文章过短（{checks['length']} 字），请扩充到至少 {rules['min_length']} 字，充实论述和细节。")
+    if checks["headings"] < rules["min_headings"]:
+        problems.append(f"缺少章节结构，请使用 markdown 标题组织文章（至少 {rules['min_headings']} 个标题）。")
+    if checks["unclosed_fence"]:
+        problems.append("存在未闭合的代码块，请检查 ``` 是否成对出现。")
+    if rules["require_code"] and not checks["has_code"]:
+        problems.append("代码类任务需要在文章中用 markdown 代码块展示代码实现。")
+    if problems:
+        return {"decision": "reject", "critique": "\n".join(problems), "checks": checks}
+
+    if (checks["length"] >= rules["approve_length"]
+            and checks["headings"] >= rules["approve_headings"]
+            and coverage is not None and coverage >= rules["approve_coverage"]):
+        return {"decision": "approve", "critique": "APPROVE", "checks": checks}
+
+    return {"decision": "review", "critique": "", "checks": checks}
+
+
+def gate_stats() -> dict:
+    approved = metrics.get_counter("quality_gate.approved")
+    rejected = metrics.get_counter("quality_gate.rejected")
+    reviewed = metrics.get_counter("quality_gate.reviewed")
+    total = approved + rejected + reviewed
+    return {
+        "approved": approved,
+        "rejected": rejected,
+        "reviewed": reviewed,
+        "reviewer_calls_avoided": approved + rejected,
+        "avoided_ratio": (approved + rejected) / total if total else 0.0,
+    }
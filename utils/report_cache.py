@@ -0,0 +1,99 @@
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Optional
+
+import dotenv
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from crud.report import find_report_by_topic_key, get_recent_report_topics, get_report, make_topic_key
+from utils import metrics
+from utils.cache import TTLCache
+from utils.text_dedup import jaccard, shingles
+
+dotenv.load_dotenv()
+
+# 是否在执行工作流前复用已有的相同/相似报告
+REPORT_CACHE_ENABLED = os.getenv("REPORT_CACHE_ENABLED", "true").lower() == "true"
+# 复用范围：user（仅当前用户自己的报告）| global（所有用户的报告，会把其他用户的报告内容返回给当前用户，需显式开启）
+REPORT_CACHE_SCOPE = os.getenv("REPORT_CACHE_SCOPE", "user")
+# global 范围下复用其他用户的报告时，是否为当前用户保存一份（出现在其历史记录中）
+REPORT_CACHE_COPY_SHARED = os.getenv("REPORT_CACHE_COPY_SHARED", "false").lower() == "true"
+# 只复用该时间（小时）内生成的报告
+REPORT_CACHE_MAX_AGE_HOURS = float(os.getenv("REPORT_CACHE_MAX_AGE_HOURS", "72"))
+# 标题片段集合 Jaccard 相似度不低于该值时视为相似任务，设为 0 只做精确匹配
+REPORT_CACHE_SIMILARITY = float(os.getenv("REPORT_CACHE_SIMILARITY", "0.8"))
+# 相似匹配时参与比较的最近报告数
+REPORT_CACHE_CANDIDATES = int(os.getenv("REPORT_CACHE_CANDIDATES", "500"))
+# 候选标题在进程内缓存的时间（秒），避免每个请求都查询最近报告
+REPORT_CACHE_CANDIDATE_TTL = float(os.getenv("REPORT_CACHE_CANDIDATE_TTL", "60"))
+
+# 标题较短，按 2 字符切片比较
+SHINGLE_SIZE = 2
+
+_NUMBER_PATTERN = re.compile(r"\d+")
+
+# (范围（user_id 或 None）, 任务类型) -> [(报告 id, 片段集合, 数字集合, 生成时间)]
+_candidate_cache = TTLCache(maxsize=1024, ttl=REPORT_CACHE_CANDIDATE_TTL)
+
+
+def _numbers(text: str) -> frozenset:
+    """任务中的数字（年份、版本号等），数字不同的任务即使措辞相似也不复用"""
+    return frozenset(_NUMBER_PATTERN.findall(text))
+
+
+async def _get_candidates(db: AsyncSession, since: datetime, task_type: str, user_id: Optional[int]) -> list:
+    candidates = _candidate_cache.get((user_id, task_type))
+    if candidates is None:
+        rows = await get_recent_report_topics(db, since, REPORT_CACHE_CANDIDATES, task_type, user_id)
+        candidates = [
+            (row.id, shingles(row.topic, SHINGLE_SIZE), _numbers(row.topic), row.created_at)
+            for row in rows
+        ]
+        _candidate_cache.set((user_id, task_type), candidates)
+    return candidates
+
+
+async def find_cached_report(db: AsyncSession, task: str, user_id: int, task_type: Optional[str]) -> Optional[dict]:
+    """
+    查找可以直接复用的同类型报告：先按任务类型和归一化标题精确匹配，再按标题相似度匹配
+
+    Args:
+        task_type: 任务类型（code/data/standard），为空时不复用
+
+    Returns:
+        {"report": Report, "match": "exact" | "similar", "similarity": float}，没有可复用的报告时返回 None
+    """
+    if not REPORT_CACHE_ENABLED or not task_type:
+        return None
+    since = datetime.now() - timedelta(hours=REPORT_CACHE_MAX_AGE_HOURS)
+    scope_user_id = user_id if REPORT_CACHE_SCOPE == "user" else None
+
+    report = await find_report_by_topic_key(db, make_topic_key(task, task_type), since, scope_user_id)
+    if report is not None:
+        metrics.incr("report_cache.exact_hits")
+        return {"report": report, "match": "exact", "similarity": 1.0}
+
+    if REPORT_CACHE_SIMILARITY > 0:
+        current = shingles(task, SHINGLE_SIZE)
+        numbers = _numbers(task)
+        best_id, best_score = None, 0.0
+        for report_id, candidate, candidate_numbers, created_at in await _get_candidates(db, since, task_type, scope_user_id):
+            if created_at < since or candidate_numbers != numbers:
+                continue
+            score = jaccard(current, candidate)
+            if score > best_score:
+                best_id, best_score = report_id, score
+        if best_id is not None and best_score >= REPORT_CACHE_SIMILARITY:
+            report = await get_report(db, best_id)
+            if report is not None:
+                metrics.incr("report_cache.similar_hits")
+                return {"report": report, "match": "similar", "similarity": round(best_score, 3)}
+
+    metrics.incr("report_cache.misses")
+    return None
+
+
+def invalidate_candidates():
+    """有新报告保存时清空候选标题缓存，使其能被后续请求匹配到"""
+    _candidate_cache.clear()
@@ -0,0 +1,60 @@
+import os
+import zlib
+
+import dotenv
+
+dotenv.load_dotenv()
+
+# 报告正文压缩方式：none（明文存储）| zlib | zstd（需安装 zstandard，未安装时退化为 zlib）
+REPORT_COMPRESSION = os.getenv("REPORT_COMPRESSION", "none").lower()
+REPORT_COMPRESSION_LEVEL = int(os.getenv("REPORT_COMPRESSION_LEVEL", "6"))
+# 正文小于该字节数时不压缩，压缩头和字典开销不划算
+REPORT_COMPRESSION_MIN_BYTES = int(os.getenv("REPORT_COMPRESSION_MIN_BYTES", "512"))
+
+# 压缩数据第一个字节为格式版本，便于以后更换算法时兼容旧数据
+FORMAT_ZLIB = 1
+FORMAT_ZSTD = 2
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+    if REPORT_COMPRESSION == "zstd":
+        print("[WARN] 未安装 zstandard，报告压缩改用 zlib")
+
+
+def _compress(data: bytes, method: str, level: int) -> bytes:
+    if method == "zstd" and zstandard is not None:
+        return bytes([FORMAT_ZSTD]) + zstandard.ZstdCompressor(level=level).compress(data)
+    return bytes([FORMAT_ZLIB]) + zlib.compress(data, level)
+
+
+def encode_content(content: str, method: str = None, level: int = None):
+    """
+    按配置压缩报告正文
+
+    Returns:
+        压缩后的字节（首字节为格式版本）；未开启压缩、正文过短或压缩后没有变小时返回 None，按明文存储
+    """
+    method = (method or REPORT_COMPRESSION).lower()
+    if method not in ("zlib", "zstd"):
+        return None
+    data = content.encode("utf-8")
+    if len(data) < REPORT_COMPRESSION_MIN_BYTES:
+        return None
+    # zlib 级别范围为 0-9，zstd 为 1-22
+    level = level if level is not None else REPORT_COMPRESSION_LEVEL
+    blob = _compress(data, method, min(level, 9) if method == "zlib" or zstandard is None else level)
+    return blob if len(blob) < len(data) else None
+
+
+def decode_content(blob: bytes) -> str:
+    """解压报告正文"""
+    version, payload = blob[0], blob[1:]
+    if version == FORMAT_ZLIB:
+        return zlib.decompress(payload).decode("utf-8")
+    if version == FORMAT_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("报告正文使用 zstd 压缩，需要安装 zstandard 才能读取")
+        return zstandard.ZstdDecompressor().decompress(payload).decode("utf-8")
+    raise ValueError(f"未知的报告压缩格式: {version}")
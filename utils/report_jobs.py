@@ -0,0 +1,261 @@
+import asyncio
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+import dotenv
+
+from config.db_conf import AsyncSessionLocal
+from crud.report import report_content, save_report
+from crud.report_job import (
+    cancel_job,
+    claim_expired_jobs,
+    count_queued_jobs,
+    create_job,
+    finish_job,
+    get_job,
+    mark_job_running,
+    release_jobs,
+    renew_job_leases,
+)
+from graph.workflow import app as workflow_app
+from models.report_job import JOB_FAILED, JOB_SUCCEEDED, ReportJob
+from utils import metrics
+from utils.admission import admission
+from nodes.classifier import determine_task_type_local
+from utils.report_cache import REPORT_CACHE_COPY_SHARED, REPORT_CACHE_ENABLED, find_cached_report, invalidate_candidates
+
+dotenv.load_dotenv()
+
+# 同时执行的后台任务数
+REPORT_JOB_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", "2"))
+# 排队任务数上限（所有进程合计，按数据库统计），超过时拒绝提交
+REPORT_JOB_MAX_PENDING = int(os.getenv("REPORT_JOB_MAX_PENDING", "1000"))
+# 任务租约时长（秒），持有进程每隔 REPORT_JOB_HEARTBEAT_INTERVAL 秒续约一次，
+# 同时接管租约已过期（持有进程已退出）的任务；租约时长应为续约间隔的数倍
+REPORT_JOB_LEASE_SECONDS = float(os.getenv("REPORT_JOB_LEASE_SECONDS", "120"))
+REPORT_JOB_HEARTBEAT_INTERVAL = float(os.getenv("REPORT_JOB_HEARTBEAT_INTERVAL", "30"))
+
+
+class JobQueueFull(Exception):
+    """排队任务已满"""
+
+
+class ReportJobRunner:
+    """
+    后台报告生成任务执行器：任务先写入 report_jobs 表，由提交任务的进程持有租约并放入本地队列，
+    再由固定数量的 worker 依次执行；持有进程定期续约，租约过期（进程已退出）的任务由其他进程或
+    下次启动的进程接管，仍在运行的进程持有的任务不会被重复执行
+    """
+
+    def __init__(self):
+        # 本进程的持有者标识，写入任务的 owner 列
+        self.owner = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"[-64:]
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: list[asyncio.Task] = []
+        self._heartbeat: Optional[asyncio.Task] = None
+        # 本进程持有的任务（本地排队中或运行中）
+        self._owned: set[str] = set()
+        # job_id -> 正在执行该任务的 asyncio.Task，用于取消
+        self._running: dict[str, asyncio.Task] = {}
+
+    @property
+    def started(self) -> bool:
+        return bool(self._workers)
+
+    @staticmethod
+    def _lease_expires_at() -> datetime:
+        return datetime.now() + timedelta(seconds=REPORT_JOB_LEASE_SECONDS)
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        recovered = await self._claim_expired()
+        if recovered:
+            print(f"♻️ 恢复 {recovered} 个未完成的后台任务")
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(REPORT_JOB_WORKERS)]
+        self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+
+    async def _claim_expired(self) -> int:
+        """接管租约已过期的任务并放入本地队列，返回接管的任务数"""
+        async with AsyncSessionLocal() as db:
+            claimed = await claim_expired_jobs(db, self.owner, self._lease_expires_at(), datetime.now())
+        for job_id in claimed:
+            # 本进程的租约曾因续约失败而过期、又被自己接管的任务已在本地队列中或正在运行，不重复放入
+            if job_id not in self._owned:
+                self._owned.add(job_id)
+                self._queue.put_nowait(job_id)
+        if claimed:
+            metrics.incr("report_jobs.reclaimed", len(claimed))
+        return len(claimed)
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(REPORT_JOB_HEARTBEAT_INTERVAL)
+            try:
+                owned = set(self._owned)
+                async with AsyncSessionLocal() as db:
+                    active = await renew_job_leases(db, list(owned), self.owner, self._lease_expires_at())
+                # 续约失败的任务已在其他进程被取消或已被接管，本进程不再继续执行
+                for job_id in owned - active:
+                    execution = self._running.get(job_id)
+                    if execution is not None:
+                        execution.cancel()
+                claimed = await self._claim_expired()
+                if claimed:
+                    print(f"♻️ 接管 {claimed} 个租约过期的后台任务")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                metrics.incr("report_jobs.heartbeat_errors")
+                print(f"[WARN] 后台任务续约失败: {e}")
+
+    async def submit(self, user_id: int, task: str, force_refresh: bool = False) -> ReportJob:
+        """提交任务并立即返回，排队已满时抛出 JobQueueFull"""
+        if not self.started:
+            raise RuntimeError("后台任务执行器未启动")
+        async with AsyncSessionLocal() as db:
+            if await count_queued_jobs(db) >= REPORT_JOB_MAX_PENDING:
+                metrics.incr("report_jobs.rejected")
+                raise JobQueueFull()
+            job = await create_job(db, user_id, task, force_refresh, self.owner, self._lease_expires_at())
+        self._owned.add(job.id)
+        self._queue.put_nowait(job.id)
+        metrics.incr("report_jobs.submitted")
+        return job
+
+    async def cancel(self, job_id: str, user_id: int) -> bool:
+        """
+        取消任务：排队中的任务不再执行，本进程运行中的任务立即中止；
+        其他进程运行中的任务由该进程在下次续约时发现并中止
+        """
+        async with AsyncSessionLocal() as db:
+            cancelled = await cancel_job(db, job_id, user_id)
+        running = self._running.get(job_id)
+        if cancelled and running is not None:
+            running.cancel()
+        if cancelled:
+            metrics.incr("report_jobs.cancelled")
+        return cancelled
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run_job(job_id)
+            except Exception as e:
+                print(f"[WARN] 后台任务 {job_id} 状态更新失败: {e}")
+            finally:
+                self._owned.discard(job_id)
+                self._queue.task_done()
+
+    async def _run_job(self, job_id: str):
+        async with AsyncSessionLocal() as db:
+            if not await mark_job_running(db, job_id, self.owner):
+                return  # 排队期间已被取消或已被其他进程接管
+            job = await get_job(db, job_id)
+        metrics.observe("report_jobs.queue_ms", (time.time() - job.created_at.timestamp()) * 1000)
+
+        started_at = time.perf_counter()
+        execution = asyncio.create_task(self._execute(job))
+        self._running[job_id] = execution
+        try:
+            # 用 wait 而不是直接 await，区分任务被用户取消和 worker 自身被取消（应用关闭）
+            await asyncio.wait({execution})
+        except asyncio.CancelledError:
+            execution.cancel()
+            raise
+        finally:
+            self._running.pop(job_id, None)
+        metrics.observe("report_jobs.run_ms", (time.perf_counter() - started_at) * 1000)
+
+        if execution.cancelled():
+            return  # 取消时已写入状态；续约失败而中止的任务由接管的进程执行
+        error = execution.exception()
+        async with AsyncSessionLocal() as db:
+            if error is None:
+                await finish_job(db, job_id, JOB_SUCCEEDED, report_id=execution.result())
+                metrics.incr("report_jobs.succeeded")
+            else:
+                print(f"[WARN] 后台任务 {job_id} 执行失败: {error}")
+                await finish_job(db, job_id, JOB_FAILED, error=str(error))
+                metrics.incr("report_jobs.failed")
+
+    async def _execute(self, job: ReportJob) -> int:
+        """执行任务，返回生成（或复用）的报告 id"""
+        # 与流式接口共用工作流执行名额，取得名额后再查找可复用的报告；
+        # 后台任务数已由 worker 数限制，不受排队上限约束
+        ticket = admission.enqueue(job.user_id, enforce_limit=False)
+        try:
+            await ticket.wait()
+            task_type = None
+            if REPORT_CACHE_ENABLED and not job.force_refresh:
+                # 只用本地预分类和分类缓存识别任务类型，无法确定时不复用，由分类节点调用 LLM
+                task_type = await determine_task_type_local(job.task)
+                async with AsyncSessionLocal() as db:
+                    cache_hit = await find_cached_report(db, job.task, job.user_id, task_type)
+                if cache_hit:
+                    report = cache_hit["report"]
+                    if report.user_id == job.user_id:
+                        return report.id
+                    # 任务结果必须是当前用户自己的报告：未开启复制时不复用其他用户的报告，照常执行工作流
+                    if REPORT_CACHE_COPY_SHARED:
+                        async with AsyncSessionLocal() as db:
+                            copied = await save_report(topic=job.task, content=report_content(report), db=db,
+                                                       user_id=job.user_id, task_type=report.task_type)
+                        return copied.id
+
+            initial_state = {
+                "task": job.task,
+                "revision_count": 0,
+                "search_results": [],
+                "messages": []
+            }
+            if task_type:
+                initial_state["task_type"] = task_type
+            final_state = await workflow_app.ainvoke(initial_state)
+        finally:
+            ticket.release()
+        draft = (final_state or {}).get("draft")
+        if not draft:
+            raise RuntimeError("工作流没有生成报告")
+        # 任务结果需要关联报告 id，这里直接写库，不经过异步写入队列
+        async with AsyncSessionLocal() as db:
+            report = await save_report(topic=job.task, content=draft, db=db, user_id=job.user_id,
+                                       task_type=final_state.get("task_type"))
+        invalidate_candidates()
+        return report.id
+
+    async def stop(self):
+        """应用关闭时中止 worker，并释放本进程持有的未完成任务，由其他进程或下次启动时重新执行"""
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            await asyncio.gather(self._heartbeat, return_exceptions=True)
+            self._heartbeat = None
+        owned = list(self._owned)
+        if self._running:
+            print(f"[WARN] {len(self._running)} 个后台任务未完成，将由其他实例或下次启动时重新执行")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        try:
+            async with AsyncSessionLocal() as db:
+                await release_jobs(db, owned, self.owner)
+        except Exception as e:
+            print(f"[WARN] 释放后台任务失败，将在租约过期后被接管: {e}")
+        self._owned.clear()
+
+    def stats(self) -> dict:
+        return {
+            "owner": self.owner,
+            "workers": len(self._workers),
+            "queued": self._queue.qsize() if self._queue else 0,
+            "running": len(self._running),
+            "owned": len(self._owned),
+        }
+
+
+report_job_runner = ReportJobRunner()
@@ -0,0 +1,225 @@
+import asyncio
+import os
+import re
+import time
+
+import dotenv
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.db_conf import engine
+from crud.report_search import (
+    create_fts_table,
+    get_max_report_id,
+    get_reports_for_highlight,
+    get_user_report_documents,
+    insert_fts_document,
+    mysql_fulltext_exists,
+    search_fts,
+    search_mysql_fulltext,
+)
+from utils import metrics
+from utils.bm25_index import BM25Index, tokenize
+from utils.cache import TTLCache
+from utils.report_codec import REPORT_COMPRESSION, decode_content
+
+dotenv.load_dotenv()
+
+# 检索后端：auto（按数据库选择）| mysql（FULLTEXT）| sqlite（FTS5）| memory（进程内倒排索引）
+REPORT_SEARCH_BACKEND = os.getenv("REPORT_SEARCH_BACKEND", "auto").lower()
+# 标题命中的权重（相对正文）
+REPORT_SEARCH_TOPIC_WEIGHT = float(os.getenv("REPORT_SEARCH_TOPIC_WEIGHT", "2.0"))
+# 高亮摘要的最大字符数
+REPORT_SEARCH_SNIPPET_CHARS = int(os.getenv("REPORT_SEARCH_SNIPPET_CHARS", "160"))
+# 进程内索引最多缓存的用户数及有效期（秒）
+REPORT_SEARCH_MEMORY_USERS = int(os.getenv("REPORT_SEARCH_MEMORY_USERS", "256"))
+REPORT_SEARCH_MEMORY_TTL = int(os.getenv("REPORT_SEARCH_MEMORY_TTL", "1800"))
+
+# 高亮标记，使用 markdown 加粗，前端可直接渲染
+HIGHLIGHT_PRE = "**"
+HIGHLIGHT_POST = "**"
+
+_active_backend = None
+# user_id -> (索引时的最大报告 id, 报告 id 数组, BM25Index)
+_memory_indexes = TTLCache(maxsize=REPORT_SEARCH_MEMORY_USERS, ttl=REPORT_SEARCH_MEMORY_TTL)
+
+
+def query_terms(query: str) -> list[str]:
+    """将查询切分为去重后的检索词（与索引使用相同的分词）"""
+    return list(dict.fromkeys(tokenize(query)))
+
+
+def index_terms(text: str) -> str:
+    """将文本分词后以空格拼接，写入 FTS5 索引（中文按二元组切分）"""
+    return " ".join(tokenize(text))
+
+
+async def resolve_backend(db: AsyncSession) -> str:
+    """确定实际使用的检索后端，结果在进程内缓存"""
+    global _active_backend
+    if _active_backend is not None:
+        return _active_backend
+
+    dialect = engine.dialect.name
+    backend = REPORT_SEARCH_BACKEND
+    if backend == "auto":
+        backend = {"mysql": "mysql", "sqlite": "sqlite"}.get(dialect, "memory")
+    if backend == "mysql":
+        conn = await db.connection()
+        if dialect != "mysql" or not await conn.run_sync(mysql_fulltext_exists):
+            print("[WARN] 未找到 MySQL 全文索引（可执行 scripts/build_report_search_index.py 创建），报告检索改用进程内索引")
+            backend = "memory"
+        elif REPORT_COMPRESSION != "none":
+            # 压缩存储的正文不在 content 列中，全文索引只能覆盖标题
+            print("[WARN] 报告正文已开启压缩，MySQL 全文索引无法覆盖正文，报告检索改用进程内索引")
+            backend = "memory"
+    elif backend == "sqlite" and dialect != "sqlite":
+        backend = "memory"
+    if backend == "sqlite":
+        await create_fts_table(db)
+
+    _active_backend = backend
+    print(f"🔎 报告检索后端: {backend}")
+    return backend
+
+
+async def ensure_search_index(db: AsyncSession):
+    """应用启动时确定检索后端并创建所需的索引表"""
+    await resolve_backend(db)
+
+
+async def index_report(db: AsyncSession, report_id: int, user_id: int, topic: str, content: str):
+    """
+    新报告写入检索索引（在保存报告的事务中调用，由调用方提交）：
+    FTS5 需要显式写入；MySQL 全文索引由数据库维护；进程内索引在检索时发现有新报告会自动重建
+    """
+    try:
+        if await resolve_backend(db) == "sqlite":
+            await insert_fts_document(db, report_id, index_terms(topic), index_terms(content))
+    except Exception as exc:
+        metrics.incr("report_search.index_errors")
+        print(f"[WARN] 报告写入检索索引失败: {exc}")
+
+
+def _document_text(row) -> tuple[str, str]:
+    content = decode_content(row.content_compressed) if row.content_compressed else (row.content or "")
+    return row.topic or "", content
+
+
+def _build_memory_index(rows) -> tuple[np.ndarray, BM25Index]:
+    documents = []
+    for row in rows:
+        topic, content = _document_text(row)
+        # 标题按权重重复，提高标题命中的得分
+        documents.append("\n".join([topic] * max(1, round(REPORT_SEARCH_TOPIC_WEIGHT)) + [content]))
+    return np.asarray([row.id for row in rows], dtype=np.int64), BM25Index(documents)
+
+
+async def _search_memory(db: AsyncSession, user_id: int, query: str, limit: int,
+                         offset: int) -> list[tuple[int, float]]:
+    max_id = await get_max_report_id(db, user_id)
+    cached = _memory_indexes.get(user_id)
+    if cached is None or cached[0] != max_id:
+        rows = await get_user_report_documents(db, user_id)
+        # 分词和建索引是 CPU 密集操作，放到线程中执行，避免阻塞事件循环
+        report_ids, index = await asyncio.to_thread(_build_memory_index, rows)
+        cached = (max_id, report_ids, index)
+        _memory_indexes.set(user_id, cached)
+        metrics.incr("report_search.memory_index_builds")
+    _, report_ids, index = cached
+    scores = index.scores(query)
+    ranked = np.argsort(-scores, kind="stable")
+    ranked = ranked[scores[ranked] > 0][offset:offset + limit]
+    return [(int(report_ids[i]), float(scores[i])) for i in ranked]
+
+
+def highlight(text: str, terms: list[str], max_chars: int = REPORT_SEARCH_SNIPPET_CHARS) -> str:
+    """
+    截取命中检索词最集中的一段文本，并用高亮标记包裹命中部分
+
+    Args:
+        text: 原文
+        terms: 检索词（小写）
+        max_chars: 摘要最大字符数，0 表示不截取
+    """
+    text = " ".join(text.split())
+    lowered = text.lower()
+    hit = np.zeros(len(text) + 1, dtype=bool)
+    for term in terms:
+        for found in re.finditer(re.escape(term), lowered):
+            hit[found.start():found.end()] = True
+
+    start, end = 0, len(text)
+    if max_chars and len(text) > max_chars:
+        # 选择命中字符最多的窗口
+        positions = np.flatnonzero(hit[:len(text)])
+        if len(positions):
+            window_hits = np.searchsorted(positions, positions + max_chars) - np.arange(len(positions))
+            start = max(0, int(positions[int(np.argmax(window_hits))]) - max_chars // 8)
+        start = min(start, len(text) - max_chars)
+        end = start + max_chars
+
+    parts = []
+    i = start
+    while i < end:
+        j = i
+        while j < end and hit[j] == hit[i]:
+            j += 1
+        parts.append(f"{HIGHLIGHT_PRE}{text[i:j]}{HIGHLIGHT_POST}" if hit[i] else text[i:j])
+        i = j
+    return ("…" if start > 0 else "") + "".join(parts) + ("…" if end < len(text) else "")
+
+
+async def search_reports(db: AsyncSession, user_id: int, query: str, limit: int = 10, offset: int = 0):
+    """
+    检索用户的历史报告
+
+    Returns:
+        (当前页结果列表, 是否还有下一页)
+    """
+    started_at = time.perf_counter()
+    terms = query_terms(query)
+    if not terms:
+        return [], False
+
+    backend = await resolve_backend(db)
+    # 多取一条用于判断是否还有下一页
+    if backend == "sqlite":
+        fts_query = " OR ".join(f'"{term}"' for term in terms)
+        hits = await search_fts(db, user_id, fts_query, limit + 1, offset, REPORT_SEARCH_TOPIC_WEIGHT)
+    elif backend == "mysql":
+        hits = await search_mysql_fulltext(db, user_id, query, limit + 1, offset)
+    else:
+        hits = await _search_memory(db, user_id, query, limit + 1, offset)
+    has_more = len(hits) > limit
+    hits = hits[:limit]
+
+    rows = {row.id: row for row in await get_reports_for_highlight(db, user_id, [report_id for report_id, _ in hits])}
+    items = []
+    for report_id, score in hits:
+        row = rows.get(report_id)
+        if row is None:
+            continue
+        topic, content = _document_text(row)
+        items.append({
+            "id": report_id,
+            "topic": topic,
+            "topic_highlight": highlight(topic, terms, 0),
+            "snippet": highlight(content, terms),
+            "score": round(score, 6),
+            "created_at": row.created_at.isoformat() if row.created_at else None,
+        })
+
+    metrics.incr(f"report_search.{backend}_queries")
+    metrics.observe("report_search.query_ms", (time.perf_counter() - started_at) * 1000)
+    return items, has_more
+
+
+async def rebuild_fts_index(db: AsyncSession, rows) -> int:
+    """将一批报告写入 FTS5 索引并提交，返回写入条数"""
+    for row in rows:
+        topic, content = _document_text(row)
+        await insert_fts_document(db, row.id, index_terms(topic), index_terms(content))
+    await db.commit()
+    return len(rows)
+
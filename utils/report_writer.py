@@ -0,0 +1,283 @@
+import asyncio
+import glob
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Optional
+
+import dotenv
+from sqlalchemy import exc as sa_exc
+
+from config.db_conf import AsyncSessionLocal
+from crud.report import save_report, save_reports_batch
+from utils import metrics
+from utils.report_cache import invalidate_candidates
+
+try:
+    import fcntl
+except ImportError:  # Windows 下不支持文件锁，只能单进程运行
+    fcntl = None
+
+dotenv.load_dotenv()
+
+# 报告写入方式：queue（写入本地预写日志后异步批量入库）| direct（在请求中直接写库）
+REPORT_WRITE_MODE = os.getenv("REPORT_WRITE_MODE", "queue")
+# 攒够该条数或等待超过该时间（秒）后批量写入
+REPORT_WRITE_BATCH_SIZE = int(os.getenv("REPORT_WRITE_BATCH_SIZE", "50"))
+REPORT_WRITE_FLUSH_INTERVAL = float(os.getenv("REPORT_WRITE_FLUSH_INTERVAL", "0.5"))
+# 写库失败后的重试间隔（秒），按指数增长到上限为止，直到写入成功
+REPORT_WRITE_RETRY_BASE = float(os.getenv("REPORT_WRITE_RETRY_BASE", "0.5"))
+REPORT_WRITE_RETRY_MAX = float(os.getenv("REPORT_WRITE_RETRY_MAX", "30"))
+# 应用关闭时等待队列写完的最长时间（秒），未写入的报告保留在预写日志中，下次启动时重放
+REPORT_WRITE_DRAIN_TIMEOUT = float(os.getenv("REPORT_WRITE_DRAIN_TIMEOUT", "10"))
+REPORT_WRITE_QUEUE_SIZE = int(os.getenv("REPORT_WRITE_QUEUE_SIZE", "10000"))
+# 预写日志目录，每个进程一个文件；容器部署时应挂载到持久化卷
+REPORT_SPOOL_DIR = os.getenv("REPORT_SPOOL_DIR", "data/report_spool")
+# 每条写入后是否 fsync，关闭后性能更好但机器掉电时可能丢失最近的报告
+REPORT_SPOOL_FSYNC = os.getenv("REPORT_SPOOL_FSYNC", "true").lower() == "true"
+
+
+class ReportSpool:
+    """
+    本地预写日志：报告入队前先追加到文件，写库成功后追加确认记录；
+    全部确认后清空文件，进程异常退出时由下次启动的进程重放未确认的报告
+    """
+
+    def __init__(self, directory: str, fsync: bool = True):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.fsync = fsync
+        self.path = os.path.join(directory, f"spool-{os.getpid()}-{uuid.uuid4().hex[:8]}.jsonl")
+        # 已写入日志、尚未确认入库的报告
+        self.pending: set[str] = set()
+        self._lock = threading.Lock()
+        self._file = open(self.path, "a+", encoding="utf-8")
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _write(self, record: dict):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def append(self, entry: dict):
+        with self._lock:
+            self._write(entry)
+            self.pending.add(entry["write_id"])
+
+    def ack(self, write_ids: list[str]):
+        """确认已入库；没有未确认的报告时直接清空文件，避免日志无限增长"""
+        with self._lock:
+            self.pending.difference_update(write_ids)
+            if self.pending:
+                self._write({"ack": write_ids})
+            else:
+                self._file.seek(0)
+                self._file.truncate()
+                self._file.flush()
+
+    def dead_letter(self, entry: dict):
+        """无法入库的报告（如数据不合法）移到死信文件并确认，避免阻塞后续写入"""
+        with open(os.path.join(self.directory, "dead-letter.jsonl.dead"), "a", encoding="utf-8") as file:
+            file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.ack([entry["write_id"]])
+
+    def close(self):
+        """关闭日志，全部入库时删除文件，否则保留给下次启动的进程重放"""
+        with self._lock:
+            self._file.close()
+            if not self.pending:
+                os.remove(self.path)
+
+    @staticmethod
+    def read_pending(path: str) -> list[dict]:
+        """读取日志中未确认的报告，末尾写了一半的行忽略"""
+        entries = {}
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if "ack" in record:
+                    for write_id in record["ack"]:
+                        entries.pop(write_id, None)
+                else:
+                    entries[record["write_id"]] = record
+        return list(entries.values())
+
+    def claim_orphans(self) -> list[dict]:
+        """接管其他已退出进程遗留的日志，返回其中未确认的报告"""
+        pending = []
+        for path in glob.glob(os.path.join(self.directory, "*.jsonl")):
+            if path == self.path:
+                continue
+            with open(path, "a+", encoding="utf-8") as file:
+                if fcntl is not None:
+                    try:
+                        fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue  # 仍在运行的进程持有的日志
+                entries = self.read_pending(path)
+                # 先转存到自己的日志中，再删除旧文件
+                for entry in entries:
+                    self.append(entry)
+                os.remove(path)
+            pending.extend(entries)
+        return pending
+
+
+class ReportWriter:
+    """报告异步批量写入队列"""
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._spool: Optional[ReportSpool] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=REPORT_WRITE_QUEUE_SIZE)
+        self._spool = ReportSpool(REPORT_SPOOL_DIR, REPORT_SPOOL_FSYNC)
+        recovered = await asyncio.to_thread(self._spool.claim_orphans)
+        for entry in recovered:
+            await self._queue.put(entry)
+        if recovered:
+            metrics.incr("report_writer.recovered", len(recovered))
+            print(f"♻️ 从预写日志恢复 {len(recovered)} 份未入库的报告")
+        self._task = asyncio.create_task(self._run())
+
+    async def submit(self, topic: str, content: str, user_id: int, task_type: str = None):
+        """提交报告：写入预写日志后立即返回，由后台任务批量入库"""
+        entry = {
+            "write_id": uuid.uuid4().hex,
+            "topic": topic,
+            "content": content,
+            "user_id": user_id,
+            "task_type": task_type,
+            "created_at": datetime.now().isoformat(),
+        }
+        await asyncio.to_thread(self._spool.append, entry)
+        await self._queue.put(entry)
+        metrics.incr("report_writer.enqueued")
+
+    async def _next_batch(self) -> list[dict]:
+        """等到第一条报告后，继续收集到批量上限或等待超时为止"""
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + REPORT_WRITE_FLUSH_INTERVAL
+        while len(batch) < REPORT_WRITE_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _write_batch(self, batch: list[dict]):
+        started_at = time.perf_counter()
+        entries = [{**entry, "created_at": datetime.fromisoformat(entry["created_at"])} for entry in batch]
+        async with AsyncSessionLocal() as db:
+            written = await save_reports_batch(db, entries)
+        await asyncio.to_thread(self._spool.ack, [entry["write_id"] for entry in batch])
+        invalidate_candidates()
+        metrics.incr("report_writer.batches")
+        metrics.incr("report_writer.written", written)
+        metrics.observe("report_writer.batch_size", len(batch))
+        metrics.observe("report_writer.write_ms", (time.perf_counter() - started_at) * 1000)
+
+    async def _write_with_retry(self, batch: list[dict]):
+        attempt = 0
+        while True:
+            try:
+                await self._write_batch(batch)
+                return
+            except asyncio.CancelledError:
+                raise
+            except (sa_exc.IntegrityError, sa_exc.DataError) as exc:
+                # 数据本身有问题，重试无效：多条时逐条写入找出问题报告，单条时移入死信文件
+                if len(batch) > 1:
+                    for entry in batch:
+                        await self._write_with_retry([entry])
+                    return
+                metrics.incr("report_writer.dead_letters")
+                print(f"[ERROR] 报告无法入库，已移入死信文件: {exc}")
+                await asyncio.to_thread(self._spool.dead_letter, batch[0])
+                return
+            except Exception as exc:
+                # 报告已在预写日志中，持续重试直到数据库恢复；带随机抖动，避免多个进程同时重试
+                delay = min(REPORT_WRITE_RETRY_MAX, REPORT_WRITE_RETRY_BASE * 2 ** attempt)
+                delay *= random.uniform(0.5, 1.0)
+                attempt += 1
+                metrics.incr("report_writer.retries")
+                print(f"[WARN] 批量保存 {len(batch)} 份报告失败（第 {attempt} 次），{delay:.1f}s 后重试: {exc}")
+                await asyncio.sleep(delay)
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            await self._write_with_retry(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    async def stop(self):
+        """应用关闭时尽量写完队列中的报告，超时未写完的保留在预写日志中"""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), REPORT_WRITE_DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            print(f"[WARN] 仍有 {len(self._spool.pending)} 份报告未入库，已保留在预写日志中，下次启动时写入")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await asyncio.to_thread(self._spool.close)
+
+    def stats(self) -> dict:
+        return {
+            "mode": REPORT_WRITE_MODE,
+            "running": self.running,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "pending": len(self._spool.pending) if self._spool else 0,
+        }
+
+
+report_writer = ReportWriter()
+
+
+async def start_report_writer():
+    if REPORT_WRITE_MODE == "queue":
+        await report_writer.start()
+
+
+async def stop_report_writer():
+    await report_writer.stop()
+
+
+async def persist_report(topic: str, content: str, user_id: int, task_type: str = None) -> bool:
+    """
+    保存生成的报告：队列模式下写入预写日志后立即返回；
+    未启用队列（direct 模式或未经 lifespan 启动）时直接写库
+
+    Returns:
+        是否已写入数据库；队列模式下返回 False（只是提交保存，入库前还可能因磁盘故障等原因丢失）
+    """
+    if report_writer.running:
+        await report_writer.submit(topic, content, user_id, task_type)
+        return False
+    async with AsyncSessionLocal() as db:
+        await save_report(topic=topic, content=content, db=db, user_id=user_id, task_type=task_type)
+    invalidate_candidates()
+    return True
@@ -0,0 +1,139 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+import dotenv
+
+from config.db_conf import AsyncSessionLocal
+from crud.search_cache import get_search_results, save_search_results
+from utils import metrics
+from utils.cache import TTLCache
+
+dotenv.load_dotenv()
+
+# 缓存后端：memory（仅内存）| db（内存 + 数据库两级）| none（不缓存）
+SEARCH_CACHE_BACKEND = os.getenv("SEARCH_CACHE_BACKEND", "memory")
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "512"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "600"))
+
+
+def make_search_key(query: str, search_engine: str, count: int, search_recency_filter: str) -> str:
+    """根据归一化查询和搜索参数生成缓存键"""
+    normalized = " ".join(query.lower().split())
+    raw = json.dumps([normalized, search_engine, count, search_recency_filter], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SearchCache:
+    """
+    搜索结果缓存：内存 LRU + TTL，可选数据库二级缓存，
+    并对同一时刻的相同查询做合并（single-flight），只发起一次上游请求
+    """
+
+    def __init__(self, backend: str, maxsize: int, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        # 搜索可能在线程池中同步调用，内存层需要加锁
+        self._lock = threading.Lock()
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend != "none"
+
+    def get(self, key: str) -> Optional[list[str]]:
+        """只查内存层"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            return self._memory.get(key)
+
+    def set(self, key: str, results: list[str]):
+        if not self.enabled or not results:
+            return
+        with self._lock:
+            self._memory.set(key, list(results))
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+
+    async def get_or_fetch(self, key: str, query: str, fetch: Callable[[], Awaitable[list[str]]]) -> list[str]:
+        """
+        依次查询内存、进行中的相同请求、数据库，都未命中时调用 fetch 并写回缓存
+        """
+        results = self.get(key)
+        if results is not None:
+            metrics.incr("search_cache.memory_hits")
+            return list(results)
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            metrics.incr("search_cache.coalesced")
+            return list(await asyncio.shield(inflight))
+
+        task = asyncio.ensure_future(self._load(key, query, fetch))
+        if self.enabled:
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return list(await asyncio.shield(task))
+
+    async def _load(self, key: str, query: str, fetch: Callable[[], Awaitable[list[str]]]) -> list[str]:
+        if self.backend == "db":
+            results = await self._db_get(key)
+            if results:
+                metrics.incr("search_cache.db_hits")
+                self.set(key, results)
+                return results
+
+        metrics.incr("search_cache.misses")
+        metrics.incr("search_cache.upstream_calls")
+        results = await fetch()
+        # 搜索失败时返回空列表，不缓存
+        if results:
+            self.set(key, results)
+            if self.backend == "db":
+                await self._db_set(key, query, results)
+        return results
+
+    async def _db_get(self, key: str) -> Optional[list[str]]:
+        min_created_at = datetime.now() - timedelta(seconds=self.ttl) if self.ttl > 0 else None
+        try:
+            async with AsyncSessionLocal() as db:
+                return await get_search_results(db, key, min_created_at)
+        except Exception as exc:
+            print(f"[WARN] 读取搜索缓存失败: {exc}")
+            metrics.incr("search_cache.db_errors")
+            return None
+
+    async def _db_set(self, key: str, query: str, results: list[str]):
+        try:
+            async with AsyncSessionLocal() as db:
+                await save_search_results(db, key, query, results)
+        except Exception as exc:
+            print(f"[WARN] 写入搜索缓存失败: {exc}")
+            metrics.incr("search_cache.db_errors")
+
+    def stats(self) -> dict:
+        hits = metrics.get_counter("search_cache.memory_hits") + metrics.get_counter("search_cache.db_hits")
+        coalesced = metrics.get_counter("search_cache.coalesced")
+        misses = metrics.get_counter("search_cache.misses")
+        requests = hits + coalesced + misses
+        return {
+            "backend": self.backend,
+            "size": len(self._memory),
+            "hits": hits,
+            "coalesced": coalesced,
+            "misses": misses,
+            "upstream_calls": metrics.get_counter("search_cache.upstream_calls"),
+            "hit_ratio": (hits + coalesced) / requests if requests else 0.0,
+            "upstream_calls_saved": hits + coalesced,
+        }
+
+
+search_cache = SearchCache(SEARCH_CACHE_BACKEND, SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL)
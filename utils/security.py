@@ -1,10 +1,54 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import dotenv
 from passlib.context import CryptContext
 
+from utils import metrics
+
+dotenv.load_dotenv()
+
+# bcrypt 成本因子（2 的幂次轮数），调高后旧密码会在下次登录时自动重新哈希
+PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", "12"))
+# bcrypt 每次计算耗时上百毫秒，异步调用时放到独立的有界线程池中执行（bcrypt 计算期间释放 GIL），
+# 避免阻塞事件循环，拖慢同一进程中的 SSE 推送
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
 
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=PASSWORD_HASH_ROUNDS)
 
 def hash_password(password: str) -> str:
     return bcrypt_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt_context.verify(plain_password, hashed_password)
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """校验密码，成本因子与当前配置不一致时同时返回新的哈希"""
+    return bcrypt_context.verify_and_update(plain_password, hashed_password)
+
+
+async def _run_in_pool(name: str, func, *args):
+    loop = asyncio.get_running_loop()
+    submitted_at = time.perf_counter()
+
+    def timed():
+        started_at = time.perf_counter()
+        metrics.observe(f"password.{name}_queue_ms", (started_at - submitted_at) * 1000)
+        try:
+            return func(*args)
+        finally:
+            metrics.observe(f"password.{name}_ms", (time.perf_counter() - started_at) * 1000)
+
+    return await loop.run_in_executor(_password_executor, timed)
+
+async def ahash_password(password: str) -> str:
+    return await _run_in_pool("hash", hash_password, password)
+
+async def averify_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run_in_pool("verify", verify_password, plain_password, hashed_password)
+
+async def averify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    return await _run_in_pool("verify", verify_and_update_password, plain_password, hashed_password)
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import os
+import time
+from functools import lru_cache
+from typing import AsyncIterator, Optional
+
+import dotenv
+
+dotenv.load_dotenv()
+
+# token 合并窗口（毫秒）：同一窗口内的 token 合并为一帧推送，设为 0 时每个 token 单独推送
+SSE_COALESCE_MS = float(os.getenv("SSE_COALESCE_MS", "40"))
+# 缓冲的 token 达到该字节数时立即推送，不等窗口结束
+SSE_COALESCE_BYTES = int(os.getenv("SSE_COALESCE_BYTES", "1024"))
+# JSON 编码器：auto（已安装 orjson 时使用）| orjson | json
+SSE_JSON_ENCODER = os.getenv("SSE_JSON_ENCODER", "auto").lower()
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    if SSE_JSON_ENCODER == "orjson":
+        print("[WARN] 未安装 orjson，SSE 事件改用标准库 json 编码")
+
+DONE_FRAME = "data: [DONE]\n\n"
+
+
+def _dumps_json(payload: dict) -> str:
+    return json.dumps(payload, ensure_ascii=False)
+
+
+def _dumps_orjson(payload: dict) -> str:
+    # orjson 默认直接输出 UTF-8，与 ensure_ascii=False 一致
+    return orjson.dumps(payload).decode()
+
+
+dumps = _dumps_orjson if orjson is not None and SSE_JSON_ENCODER != "json" else _dumps_json
+
+
+def encode_event(payload: dict) -> str:
+    """编码为一帧 SSE 数据"""
+    return f"data: {dumps(payload)}\n\n"
+
+
+@lru_cache(maxsize=256)
+def status_frame(content: str) -> str:
+    """状态事件帧；状态文案大多是固定的，编码结果缓存复用"""
+    return encode_event({"type": "status", "content": content})
+
+
+def token_frame(content: str) -> str:
+    return encode_event({"type": "token", "content": content})
+
+
+class TokenCoalescer:
+    """
+    将 LLM 流式输出的 token 按时间窗口或字节数合并为一帧推送，减少 JSON 编码、写入和网络包的次数
+
+    窗口从缓冲第一个 token 时开始计时，下一个 token 到达时检查；上游停顿时由 with_flush_deadline
+    在窗口到期时提醒调用方 flush，缓冲的 token 最多滞留一个窗口。
+    其他事件推送前应先调用 flush，保证前端收到的内容顺序不变
+    """
+
+    def __init__(self, window_ms: float = SSE_COALESCE_MS, max_bytes: int = SSE_COALESCE_BYTES,
+                 clock=time.monotonic):
+        self.window = window_ms / 1000
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self._parts: list[str] = []
+        self._bytes = 0
+        self._started_at = 0.0
+
+    def add(self, content: str) -> Optional[str]:
+        """缓冲一个 token，窗口到期或超过字节上限时返回合并后的帧，否则返回 None"""
+        if self.window <= 0:
+            return token_frame(content)
+        if not self._parts:
+            self._started_at = self.clock()
+        self._parts.append(content)
+        self._bytes += len(content.encode("utf-8"))
+        if self._bytes >= self.max_bytes or self.clock() - self._started_at >= self.window:
+            return self.flush()
+        return None
+
+    def time_to_flush(self) -> Optional[float]:
+        """距离当前窗口到期的秒数，没有缓冲时返回 None"""
+        if not self._parts:
+            return None
+        return max(0.0, self.window - (self.clock() - self._started_at))
+
+    def flush(self) -> Optional[str]:
+        """取出缓冲中的全部 token，没有缓冲时返回 None"""
+        if not self._parts:
+            return None
+        frame = token_frame("".join(self._parts))
+        self._parts.clear()
+        self._bytes = 0
+        return frame
+
+
+async def with_flush_deadline(events: AsyncIterator, coalescer: TokenCoalescer) -> AsyncIterator[Optional[dict]]:
+    """
+    迭代事件流；缓冲中有 token 且窗口到期时仍没有新事件，产出 None 提醒调用方 flush
+    等待中的下一个事件不会因超时被取消，流结束或调用方中止时才取消
+    """
+    iterator = events.__aiter__()
+    pending: Optional[asyncio.Future] = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            done, _ = await asyncio.wait({pending}, timeout=coalescer.time_to_flush())
+            if not done:
+                yield None
+                continue
+            finished, pending = pending, None
+            try:
+                event = finished.result()
+            except StopAsyncIteration:
+                return
+            yield event
+    finally:
+        if pending is not None:
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
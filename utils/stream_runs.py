@@ -0,0 +1,188 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import deque
+from typing import AsyncIterator, Optional
+
+import dotenv
+
+from utils import metrics
+from utils.sse import encode_event
+
+dotenv.load_dotenv()
+
+# 每次运行在内存中保留的最近事件数，断线重连时从中补发
+STREAM_RUN_BUFFER_EVENTS = int(os.getenv("STREAM_RUN_BUFFER_EVENTS", "1000"))
+# 运行结束后保留多久（秒），在此期间仍可重连取回事件
+STREAM_RUN_RETENTION = float(os.getenv("STREAM_RUN_RETENTION", "600"))
+# 超出内存缓冲的事件写入该目录，为空时不写磁盘（超出部分无法补发）
+STREAM_RUN_SPILL_DIR = os.getenv("STREAM_RUN_SPILL_DIR", "")
+
+
+class WorkflowRun:
+    """
+    一次工作流运行：在后台任务中执行，与客户端连接解耦；
+    产生的每帧事件按顺序编号，保留在有界环形缓冲中，客户端可从任意编号之后重新订阅
+    """
+
+    def __init__(self, user_id: int, buffer_size: int = STREAM_RUN_BUFFER_EVENTS, spill_dir: str = STREAM_RUN_SPILL_DIR):
+        self.run_id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.last_seq = 0
+        self.done = False
+        self.finished_at: Optional[float] = None
+        self._buffer: deque[tuple[int, str]] = deque()
+        self._buffer_size = buffer_size
+        self._changed = asyncio.Condition()
+        self._spill_path = os.path.join(spill_dir, f"{self.run_id}.sse") if spill_dir else None
+        self._spill_file = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, source: AsyncIterator[str]):
+        """在后台任务中消费事件源，客户端断开不影响运行"""
+        self._task = asyncio.create_task(self._consume(source))
+
+    async def _consume(self, source: AsyncIterator[str]):
+        try:
+            async for frame in source:
+                await self._append(frame)
+        except asyncio.CancelledError:
+            await self._append(encode_event({"type": "error", "content": "服务正在关闭，运行已中止"}))
+            raise
+        except Exception as e:
+            print(f"[WARN] 工作流运行 {self.run_id} 异常结束: {e}")
+            await self._append(encode_event({"type": "error", "content": str(e)}))
+        finally:
+            async with self._changed:
+                self.done = True
+                self.finished_at = time.monotonic()
+                self._changed.notify_all()
+            if self._spill_file is not None:
+                self._spill_file.close()
+
+    async def _append(self, frame: str):
+        async with self._changed:
+            self.last_seq += 1
+            self._buffer.append((self.last_seq, f"id: {self.last_seq}\n{frame}"))
+            if len(self._buffer) > self._buffer_size:
+                self._evict()
+            self._changed.notify_all()
+
+    def _evict(self):
+        seq, frame = self._buffer.popleft()
+        metrics.incr("stream_runs.evicted_events")
+        if self._spill_path is None:
+            return
+        # 单帧很小且不 fsync，直接追加写入
+        if self._spill_file is None:
+            os.makedirs(os.path.dirname(self._spill_path), exist_ok=True)
+            self._spill_file = open(self._spill_path, "a", encoding="utf-8")
+        self._spill_file.write(frame)
+        self._spill_file.flush()
+
+    def _read_spilled(self, after: int, before: int) -> list[tuple[int, str]]:
+        """读取磁盘上编号在 (after, before) 之间的事件"""
+        frames = []
+        with open(self._spill_path, encoding="utf-8") as file:
+            for frame in file.read().split("\n\n"):
+                if not frame.startswith("id: "):
+                    continue
+                seq = int(frame[4:frame.index("\n")])
+                if after < seq < before:
+                    frames.append((seq, frame + "\n\n"))
+        return frames
+
+    async def _frames_after(self, after: int) -> list[tuple[int, str]]:
+        # 先取内存快照，之后即使有事件被淘汰也不影响本次补发
+        frames = [item for item in self._buffer if item[0] > after]
+        first_in_memory = frames[0][0] if frames else self.last_seq + 1
+        if after + 1 >= first_in_memory:
+            return frames
+        if self._spill_path is not None and os.path.exists(self._spill_path):
+            spilled = await asyncio.to_thread(self._read_spilled, after, first_in_memory)
+            metrics.incr("stream_runs.spill_replays")
+            return spilled + frames
+        metrics.incr("stream_runs.replay_gaps")
+        # 以状态事件提示缺口，客户端继续接收后续事件
+        gap = encode_event({"type": "status", "content": f"⚠️ 第 {after + 1}-{first_in_memory - 1} 条事件已过期，无法补发"})
+        return [(after, gap)] + frames
+
+    async def subscribe(self, after: int = 0) -> AsyncIterator[str]:
+        """从编号 after 之后开始推送事件，运行结束且全部推送完后返回"""
+        last = after
+        while True:
+            for seq, frame in await self._frames_after(last):
+                yield frame
+                last = max(last, seq)
+            async with self._changed:
+                if self.done and last >= self.last_seq:
+                    return
+                await self._changed.wait_for(lambda: self.last_seq > last or self.done)
+
+    async def cancel(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def remove_spill(self):
+        if self._spill_path is not None and os.path.exists(self._spill_path):
+            os.remove(self._spill_path)
+
+
+class RunRegistry:
+    """进程内的运行表，结束超过保留时间的运行在新建或查找时清理"""
+
+    def __init__(self, retention: float = STREAM_RUN_RETENTION):
+        self.retention = retention
+        self._runs: dict[str, WorkflowRun] = {}
+
+    def _purge(self):
+        now = time.monotonic()
+        for run_id, run in list(self._runs.items()):
+            if run.done and now - run.finished_at > self.retention:
+                del self._runs[run_id]
+                run.remove_spill()
+
+    def start(self, user_id: int, source: AsyncIterator[str]) -> WorkflowRun:
+        self._purge()
+        run = WorkflowRun(user_id)
+        self._runs[run.run_id] = run
+        run.start(source)
+        metrics.incr("stream_runs.started")
+        return run
+
+    def get(self, run_id: str, user_id: int) -> Optional[WorkflowRun]:
+        """按 id 查找运行，只能查到自己的运行"""
+        self._purge()
+        run = self._runs.get(run_id)
+        if run is None or run.user_id != user_id:
+            return None
+        return run
+
+    async def shutdown(self):
+        """应用关闭时中止仍在运行的工作流"""
+        for run in list(self._runs.values()):
+            await run.cancel()
+            run.remove_spill()
+        self._runs.clear()
+
+    def stats(self) -> dict:
+        return {
+            "runs": len(self._runs),
+            "active": sum(1 for run in self._runs.values() if not run.done),
+        }
+
+
+run_registry = RunRegistry()
+
+
+def parse_last_event_id(value: Optional[str]) -> int:
+    """解析 Last-Event-ID，无效时从头推送"""
+    try:
+        return max(0, int(value)) if value else 0
+    except ValueError:
+        return 0
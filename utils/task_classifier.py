@@ -0,0 +1,76 @@
+import os
+import re
+from typing import Tuple
+
+import dotenv
+
+dotenv.load_dotenv()
+
+# 本地预分类置信度阈值，低于该值时回退到 LLM 分类
+PRE_CLASSIFIER_THRESHOLD = float(os.getenv("PRE_CLASSIFIER_THRESHOLD", "0.75"))
+# 最高分类型至少命中的不同关键词数；单个关键词容易误判（如"程序员的职业发展"），不直接路由
+PRE_CLASSIFIER_MIN_SIGNALS = int(os.getenv("PRE_CLASSIFIER_MIN_SIGNALS", "2"))
+
+# 英文关键词前后不能紧跟字母或数字，避免 trust 命中 rust、Javanese 命中 java；中文字符不影响边界
+_LATIN_BOUNDARY = r"(?<![a-z0-9])(?:{})(?![a-z0-9])"
+
+# (正则, 权重)：强信号权重 3，弱信号权重 1
+TASK_TYPE_PATTERNS = {
+    "code": [
+        (_LATIN_BOUNDARY.format(r"python|java|javascript|typescript|c\+\+|c#|golang|rust|php|sql|shell|html|css|leetcode|debug"), 3),
+        (r"代码|编程|算法|源码|脚本|程序|爬虫|正则表达式|数据结构|单元测试|报错", 3),
+        (r"函数|接口|类|模块|实现|排序|递归|调试|部署|框架|" + _LATIN_BOUNDARY.format("api"), 1),
+    ],
+    "data": [
+        (r"数据分析|统计|可视化|图表|报表|同比|环比|增长率|占比|市场规模|销量|数据集", 3),
+        (r"数据|趋势|分析|预测|指标|分布|对比|走势|排名", 1),
+    ],
+    "standard": [
+        (r"写一篇|文章|作文|散文|故事|读后感|科普|综述|介绍一下|总结一下|演讲稿|诗", 3),
+        (r"介绍|总结|撰写|关于|什么是|为什么|如何看待", 1),
+    ],
+}
+
+_COMPILED_PATTERNS = {
+    task_type: [(re.compile(pattern, re.IGNORECASE), weight) for pattern, weight in patterns]
+    for task_type, patterns in TASK_TYPE_PATTERNS.items()
+}
+
+
+def match_task(task: str) -> dict:
+    """统计各任务类型命中的关键词权重和命中的不同关键词"""
+    results = {}
+    for task_type, patterns in _COMPILED_PATTERNS.items():
+        score = 0
+        keywords = set()
+        for pattern, weight in patterns:
+            matched = {match.group(0).lower() for match in pattern.finditer(task)}
+            if matched:
+                score += weight
+                keywords |= matched
+        results[task_type] = (score, keywords)
+    return results
+
+
+def score_task(task: str) -> dict:
+    """统计各任务类型命中的关键词权重"""
+    return {task_type: score for task_type, (score, _) in match_task(task).items()}
+
+
+def pre_classify(task: str) -> Tuple[str, float]:
+    """
+    基于关键词的本地任务类型预分类，不调用 LLM
+
+    Returns:
+        (任务类型, 置信度)，置信度取值 0~1，由最高分与次高分的差距决定；
+        最高分类型命中的不同关键词少于 PRE_CLASSIFIER_MIN_SIGNALS 个时置信度为 0
+    """
+    matches = match_task(task)
+    ranked = sorted(matches.items(), key=lambda item: item[1][0], reverse=True)
+    (best_type, (best, keywords)), (_, (second, _)) = ranked[0], ranked[1]
+    if best == 0:
+        return "standard", 0.0
+    if len(keywords) < PRE_CLASSIFIER_MIN_SIGNALS:
+        return best_type, 0.0
+    confidence = (best - second) / (best + 1)
+    return best_type, round(confidence, 3)
@@ -0,0 +1,138 @@
+import hashlib
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Optional
+
+import dotenv
+
+from config.db_conf import AsyncSessionLocal
+from crud.task_type_cache import get_task_type, save_task_type
+from utils import metrics
+from utils.cache import TTLCache
+
+dotenv.load_dotenv()
+
+# 缓存后端：db（内存 + 数据库两级）| memory（仅内存）| none（不缓存）
+TASK_TYPE_CACHE_BACKEND = os.getenv("TASK_TYPE_CACHE_BACKEND", "db")
+TASK_TYPE_CACHE_MEMORY_SIZE = int(os.getenv("TASK_TYPE_CACHE_MEMORY_SIZE", "1024"))
+TASK_TYPE_CACHE_MEMORY_TTL = float(os.getenv("TASK_TYPE_CACHE_MEMORY_TTL", "3600"))
+# 数据库条目有效期（秒），0 表示永久有效
+TASK_TYPE_CACHE_DB_TTL = float(os.getenv("TASK_TYPE_CACHE_DB_TTL", "0"))
+
+
+def normalize_task(task: str) -> str:
+    """
+    归一化任务描述：只合并空白、去掉结尾标点并统一大小写
+    不去掉"实现""分析""用"等词，它们决定了任务类型，去掉后不同类型的任务会落到同一个缓存键
+    """
+    return re.sub(r"\s+", " ", task).strip().rstrip('？?。.！!').rstrip().lower()
+
+
+def make_task_key(normalized_task: str) -> str:
+    return hashlib.sha256(normalized_task.encode("utf-8")).hexdigest()
+
+
+class MemoryTaskTypeBackend:
+    """进程内 LRU + TTL 缓存"""
+    name = "memory"
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, task: str, task_type: str):
+        self._cache.set(key, task_type)
+
+    def clear(self):
+        self._cache.clear()
+
+
+class DatabaseTaskTypeBackend:
+    """数据库缓存，跨进程、跨容器共享，重启后仍然有效"""
+    name = "db"
+
+    def __init__(self, ttl: float = 0):
+        self.ttl = ttl
+
+    async def get(self, key: str) -> Optional[str]:
+        min_created_at = datetime.now() - timedelta(seconds=self.ttl) if self.ttl > 0 else None
+        try:
+            async with AsyncSessionLocal() as db:
+                return await get_task_type(db, key, min_created_at)
+        except Exception as exc:
+            print(f"[WARN] 读取任务类型缓存失败: {exc}")
+            metrics.incr("task_type_cache.db_errors")
+            return None
+
+    async def set(self, key: str, task: str, task_type: str):
+        try:
+            async with AsyncSessionLocal() as db:
+                await save_task_type(db, key, task, task_type)
+        except Exception as exc:
+            print(f"[WARN] 写入任务类型缓存失败: {exc}")
+            metrics.incr("task_type_cache.db_errors")
+
+    def clear(self):
+        pass
+
+
+class ClassificationCache:
+    """
+    任务类型分类缓存，按顺序查询各级后端，命中后回填前面的层级
+    """
+
+    def __init__(self, backends: list):
+        self.backends = backends
+
+    async def get(self, task: str) -> Optional[str]:
+        normalized = normalize_task(task)
+        key = make_task_key(normalized)
+        for i, backend in enumerate(self.backends):
+            task_type = await backend.get(key)
+            if task_type:
+                metrics.incr(f"task_type_cache.{backend.name}_hits")
+                for upper in self.backends[:i]:
+                    await upper.set(key, normalized, task_type)
+                return task_type
+        metrics.incr("task_type_cache.misses")
+        return None
+
+    async def set(self, task: str, task_type: str):
+        normalized = normalize_task(task)
+        key = make_task_key(normalized)
+        for backend in self.backends:
+            await backend.set(key, normalized, task_type)
+
+    def clear(self):
+        """清空进程内缓存层"""
+        for backend in self.backends:
+            backend.clear()
+
+    def stats(self) -> dict:
+        hits = {
+            backend.name: metrics.get_counter(f"task_type_cache.{backend.name}_hits")
+            for backend in self.backends
+        }
+        misses = metrics.get_counter("task_type_cache.misses")
+        total = sum(hits.values()) + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": (total - misses) / total if total else 0.0,
+        }
+
+
+def build_classification_cache(backend: str = TASK_TYPE_CACHE_BACKEND) -> ClassificationCache:
+    """根据配置构建缓存层级"""
+    backends = []
+    if backend in ("db", "memory"):
+        backends.append(MemoryTaskTypeBackend(TASK_TYPE_CACHE_MEMORY_SIZE, TASK_TYPE_CACHE_MEMORY_TTL))
+    if backend == "db":
+        backends.append(DatabaseTaskTypeBackend(TASK_TYPE_CACHE_DB_TTL))
+    return ClassificationCache(backends)
+
+
+task_type_cache = build_classification_cache()
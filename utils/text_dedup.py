@@ -0,0 +1,57 @@
+import hashlib
+import re
+
+
+def normalize_text(text: str) -> str:
+    """去掉空白和标点并统一大小写，用于判断重复"""
+    return re.sub(r"[\W_]+", "", text).lower()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.md5(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def shingles(text: str, k: int = 5) -> set:
+    """
+    将文本切分为长度为 k 的字符片段集合（中文没有天然分词边界，按字符切分）
+    """
+    normalized = normalize_text(text)
+    if len(normalized) <= k:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + k] for i in range(len(normalized) - k + 1)}
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def dedupe_texts(texts: list[str], threshold: float = 0.8, k: int = 5) -> list[str]:
+    """
+    去除完全重复和近似重复的文本，保留先出现的一条
+
+    Args:
+        texts: 待去重的文本列表
+        threshold: 片段集合 Jaccard 相似度不低于该值视为近似重复
+        k: 片段长度
+
+    Returns:
+        去重后的文本列表，保持原有顺序
+    """
+    seen_hashes = set()
+    kept_shingles = []
+    result = []
+    for text in texts:
+        if not text or not text.strip():
+            continue
+        digest = text_hash(text)
+        if digest in seen_hashes:
+            continue
+        current = shingles(text, k)
+        if any(jaccard(current, previous) >= threshold for previous in kept_shingles):
+            continue
+        seen_hashes.add(digest)
+        kept_shingles.append(current)
+        result.append(text)
+    return result
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Optional
+
+import dotenv
+from sqlalchemy import text
+
+from config.db_conf import AsyncSessionLocal, engine
+from crud.user import delete_expired_tokens
+from utils import metrics
+
+dotenv.load_dotenv()
+
+TOKEN_REAPER_ENABLED = os.getenv("TOKEN_REAPER_ENABLED", "true").lower() == "true"
+# 两次清理之间的间隔（秒）
+TOKEN_REAPER_INTERVAL = float(os.getenv("TOKEN_REAPER_INTERVAL", "3600"))
+# 每批删除的行数，分批提交以避免长时间持有锁
+TOKEN_REAPER_BATCH_SIZE = int(os.getenv("TOKEN_REAPER_BATCH_SIZE", "1000"))
+# 批次之间的停顿（秒），给在线请求让出数据库
+TOKEN_REAPER_BATCH_PAUSE = float(os.getenv("TOKEN_REAPER_BATCH_PAUSE", "0.1"))
+# 累计删除行数达到该值后压缩 tokens 表回收空间，0 表示不压缩
+TOKEN_REAPER_COMPACT_ROWS = int(os.getenv("TOKEN_REAPER_COMPACT_ROWS", "0"))
+
+_reaper_task: Optional[asyncio.Task] = None
+_rows_since_compact = 0
+
+
+async def reap_expired_tokens() -> int:
+    """分批删除所有已过期的token，返回本轮删除总行数"""
+    started_at = time.perf_counter()
+    now = datetime.now()
+    total = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            deleted = await delete_expired_tokens(db, TOKEN_REAPER_BATCH_SIZE, now)
+        total += deleted
+        metrics.incr("token_reaper.rows_reaped", deleted)
+        if deleted < TOKEN_REAPER_BATCH_SIZE:
+            break
+        await asyncio.sleep(TOKEN_REAPER_BATCH_PAUSE)
+    metrics.incr("token_reaper.runs")
+    metrics.observe("token_reaper.run_ms", (time.perf_counter() - started_at) * 1000)
+    return total
+
+
+async def compact_tokens_table():
+    """压缩 tokens 表（MySQL 使用 OPTIMIZE TABLE，SQLite 使用 VACUUM）"""
+    dialect = engine.dialect.name
+    if dialect == "mysql":
+        statement = "OPTIMIZE TABLE tokens"
+    elif dialect == "sqlite":
+        statement = "VACUUM"
+    else:
+        return
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text(statement))
+    metrics.incr("token_reaper.compactions")
+    print("🧹 tokens 表已压缩")
+
+
+async def _reaper_loop():
+    global _rows_since_compact
+    while True:
+        try:
+            deleted = await reap_expired_tokens()
+            if deleted:
+                print(f"🧹 已清理过期 token {deleted} 条")
+            _rows_since_compact += deleted
+            if TOKEN_REAPER_COMPACT_ROWS and _rows_since_compact >= TOKEN_REAPER_COMPACT_ROWS:
+                await compact_tokens_table()
+                _rows_since_compact = 0
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            metrics.incr("token_reaper.errors")
+            print(f"[WARN] 清理过期 token 失败: {exc}")
+        await asyncio.sleep(TOKEN_REAPER_INTERVAL)
+
+
+def start_token_reaper():
+    """在应用启动时开启后台清理任务"""
+    global _reaper_task
+    if TOKEN_REAPER_ENABLED and _reaper_task is None:
+        _reaper_task = asyncio.create_task(_reaper_loop())
+
+
+async def stop_token_reaper():
+    """在应用关闭时停止后台清理任务"""
+    global _reaper_task
+    if _reaper_task is None:
+        return
+    _reaper_task.cancel()
+    try:
+        await _reaper_task
+    except asyncio.CancelledError:
+        pass
+    _reaper_task = None